@@ -1,8 +1,22 @@
-import json
-from typing import TypedDict, List
+import asyncio
+import hashlib
+import logging
+import operator
+import time
+from typing import Annotated, AsyncIterator, Dict, TypedDict, List, Optional
 from langchain_core.prompts import PromptTemplate
-from langgraph.graph import StateGraph
+from langgraph.graph import StateGraph, START, END
 from config import settings
+from services.cache import build_cache
+from services.lazy import lazy
+from services.llm_cache import cached_llm
+from services.metrics import instrument_node, summary_chunks
+from services.serialization import compact_json
+from services.singleflight import single_flight
+from services.streaming import stream_graph_events
+from services.tokens import count_tokens, split_stable, split_text
+
+logger = logging.getLogger(__name__)
 
 
 # Define LangGraph State
@@ -14,15 +28,35 @@ class AgentState(TypedDict):
         document_content (str): The input document text to be processed.
         document_summary (str): The summarized content of the document.
         keywords (List[str]): A list of extracted keywords from the document.
+        chunk_summaries (List[str]): Per-chunk summaries for documents that were
+            too large for a single prompt (empty otherwise).
+        incremental (bool): Summarize chunk by chunk, reusing stored results for
+            chunks seen before (see incremental_node).
+        node_timings (Dict[str, float]): Wall time in seconds spent in each node.
+            The summary and keyword nodes run in parallel, so their timings are
+            merged into one dict when the branches join.
     """
 
     document_content: str
     document_summary: str
     keywords: List[str]
+    chunk_summaries: List[str]
+    incremental: bool
+    node_timings: Annotated[Dict[str, float], operator.or_]
+
 
+class DocumentAgentResult(TypedDict):
+    """
+    Output of the document summarizer agent.
+
+    Attributes:
+        document (str): The summarized content of the document.
+        keywords (List[str]): The extracted keywords.
+    """
+
+    document: str
+    keywords: List[str]
 
-# Initialize LLM
-llm = settings.llm
 
 # Define Prompt Templates
 summary_template = """
@@ -47,91 +81,453 @@ keywords_prompt = PromptTemplate(
     template=keywords_template, input_variables=["document"]
 )
 
-# Define LangChain Chains
-summary_chain = summary_prompt | llm
+# Prompt for combining chunk summaries into one summary (the "reduce" step).
+combine_template = """
+You are an expert summarizer. The following are summaries of consecutive parts of one document.
+Combine them into a single concise and accurate summary of the whole document.
+Partial Summaries:
+{summaries}
+
+Summary:
+"""
+combine_prompt = PromptTemplate(
+    template=combine_template, input_variables=["summaries"]
+)
+
+# Define LangChain Chains (built on first use, see services.lazy)
+@lazy
+def summary_chain():
+    return summary_prompt | cached_llm(settings.llm, "summary")
+
 
 # Create a chain for keyword extraction using LCEL.
-keywords_chain = keywords_prompt | llm
+@lazy
+def keywords_chain():
+    return keywords_prompt | cached_llm(settings.llm, "keywords")
+
+
+# Create a chain for merging partial summaries.
+@lazy
+def combine_chain():
+    return combine_prompt | cached_llm(settings.llm, "combine")
+
+# Upper bound on collapse rounds in the reduce step, in case the LLM keeps
+# returning summaries that do not fit into a single chunk.
+MAX_REDUCE_ROUNDS = 4
 
 
-# Define Graph Node Function
-async def process_document(state: AgentState) -> AgentState:
+def parse_keywords(keywords_str: str) -> List[str]:
     """
-    Processes the input document to generate a summary and extract keywords.
+    Splits the comma-separated keyword output of the LLM into a clean list.
+    """
+    return [kw.strip() for kw in keywords_str.strip().split(",") if kw.strip()]
+
+
+def merge_keywords(keyword_lists: List[List[str]], limit: int) -> List[str]:
+    """
+    Merges per-chunk keyword lists into one ranked list.
+
+    Keywords are compared case-insensitively and ranked by the number of chunks
+    they appear in; ties keep the order in which they first appeared.
 
     Args:
-        state (AgentState): The current state containing the document content.
+        keyword_lists (List[List[str]]): Keywords extracted from each chunk, in document order.
+        limit (int): Maximum number of keywords to return.
 
     Returns:
-        AgentState: The updated state with document_summary and keywords.
+        List[str]: The merged keywords, most frequent first.
     """
-    document = state["document_content"]
+    counts: Dict[str, int] = {}
+    first_seen: Dict[str, str] = {}
+    for keywords in keyword_lists:
+        seen_in_chunk = set()
+        for kw in keywords:
+            key = kw.casefold()
+            if key in seen_in_chunk:
+                continue
+            seen_in_chunk.add(key)
+            counts[key] = counts.get(key, 0) + 1
+            first_seen.setdefault(key, kw)
+    order = {key: index for index, key in enumerate(first_seen)}
+    ranked = sorted(counts, key=lambda key: (-counts[key], order[key]))
+    return [first_seen[key] for key in ranked[:limit]]
+
+
+# Define Graph Node Functions
+# Summary and keyword extraction do not depend on each other, so they run as
+# parallel branches of the graph and join back into a single state.
+async def summarize_node(state: AgentState) -> dict:
+    """
+    Generates a summary of the input document.
 
-    # Generate summary
+    Args:
+        state (AgentState): The current state containing the document content.
+
+    Returns:
+        dict: The state update with document_summary and this node's timing.
+    """
+    started = time.perf_counter()
     # LCEL chains use .ainvoke directly with the input dictionary.
-    summary_result = await summary_chain.ainvoke({"document": document})
+    summary_result = await summary_chain.ainvoke({"document": state["document_content"]})
     doc_summary = (
         summary_result.content.strip()
     )  # Access content attribute for ChatOpenAI output
+    elapsed = time.perf_counter() - started
+    logger.debug("summary_node finished in %.3fs", elapsed)
+
+    return {"document_summary": doc_summary, "node_timings": {"summary_node": elapsed}}
+
+
+async def extract_keywords_node(state: AgentState) -> dict:
+    """
+    Extracts a list of keywords from the input document.
 
-    # Extract keywords
-    keywords_result = await keywords_chain.ainvoke({"document": document})
+    Args:
+        state (AgentState): The current state containing the document content.
+
+    Returns:
+        dict: The state update with keywords and this node's timing.
+    """
+    started = time.perf_counter()
+    keywords_result = await keywords_chain.ainvoke(
+        {"document": state["document_content"]}
+    )
     # Split the comma-separated string into a list and clean up whitespace.
-    keywords_str = keywords_result.content.strip()
-    keywords = [kw.strip() for kw in keywords_str.split(",") if kw.strip()]
+    keywords = parse_keywords(keywords_result.content)
+    elapsed = time.perf_counter() - started
+    logger.debug("keywords_node finished in %.3fs", elapsed)
+
+    return {"keywords": keywords, "node_timings": {"keywords_node": elapsed}}
+
+
+async def map_chunks_node(state: AgentState) -> dict:
+    """
+    Map step for large documents: splits the document into token-bounded chunks
+    and summarizes and extracts keywords from every chunk concurrently, with at
+    most SUMMARY_MAX_CONCURRENCY LLM calls in flight.
+
+    Args:
+        state (AgentState): The current state containing the document content.
+
+    Returns:
+        dict: The state update with chunk_summaries, merged keywords and this node's timing.
+    """
+    started = time.perf_counter()
+    chunks = split_text(
+        state["document_content"],
+        settings.SUMMARY_CHUNK_TOKENS,
+        settings.SUMMARY_CHUNK_OVERLAP_TOKENS,
+    )
+    semaphore = asyncio.Semaphore(settings.SUMMARY_MAX_CONCURRENCY)
+
+    async def run_chain(chain, chunk: str) -> str:
+        async with semaphore:
+            result = await chain.ainvoke({"document": chunk})
+        return result.content.strip()
+
+    summary_tasks = [run_chain(summary_chain, chunk) for chunk in chunks]
+    keyword_tasks = [run_chain(keywords_chain, chunk) for chunk in chunks]
+    results = await asyncio.gather(*summary_tasks, *keyword_tasks)
+    chunk_summaries = results[: len(chunks)]
+    keywords = merge_keywords(
+        [parse_keywords(kw_str) for kw_str in results[len(chunks) :]],
+        settings.SUMMARY_MAX_KEYWORDS,
+    )
+    elapsed = time.perf_counter() - started
+    logger.debug("map_chunks_node processed %d chunks in %.3fs", len(chunks), elapsed)
 
-    # Update the state with the results
     return {
-        "document_content": document,
-        "document_summary": doc_summary,
+        "chunk_summaries": chunk_summaries,
         "keywords": keywords,
+        "node_timings": {"map_chunks_node": elapsed},
     }
 
 
-# Build the LangGraph Graph
-workflow = StateGraph(AgentState)
-
-# Add the single node to our graph.
-workflow.add_node("process_doc_node", process_document)
-
-# Set the entry point of the graph. When the graph starts, it will execute 'process_doc_node'.
-workflow.set_entry_point("process_doc_node")
+async def reduce_summaries_node(state: AgentState) -> dict:
+    """
+    Reduce step for large documents: combines the chunk summaries into a single
+    summary. If the summaries together do not fit into one chunk, they are first
+    collapsed in groups (concurrently) until they do.
 
-# Set the exit point of the graph.
-workflow.set_finish_point("process_doc_node")
+    Args:
+        state (AgentState): The current state containing chunk_summaries.
 
-# Compile the graph into an executable application.
-app = workflow.compile()
+    Returns:
+        dict: The state update with document_summary and this node's timing.
+    """
+    started = time.perf_counter()
+    summaries = state["chunk_summaries"]
+    semaphore = asyncio.Semaphore(settings.SUMMARY_MAX_CONCURRENCY)
+
+    async def combine(group: List[str]) -> str:
+        async with semaphore:
+            result = await combine_chain.ainvoke({"summaries": "\n\n".join(group)})
+        return result.content.strip()
+
+    rounds = 0
+    while (
+        len(summaries) > 1
+        and count_tokens("\n\n".join(summaries)) > settings.SUMMARY_CHUNK_TOKENS
+        and rounds < MAX_REDUCE_ROUNDS
+    ):
+        # Pack consecutive summaries into groups that each fit into one prompt.
+        groups: List[List[str]] = [[]]
+        group_tokens = 0
+        for summary in summaries:
+            summary_tokens = count_tokens(summary)
+            if groups[-1] and group_tokens + summary_tokens > settings.SUMMARY_CHUNK_TOKENS:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(summary)
+            group_tokens += summary_tokens
+        summaries = await asyncio.gather(*(combine(group) for group in groups))
+        rounds += 1
+
+    doc_summary = await combine(summaries) if len(summaries) > 1 else summaries[0]
+    elapsed = time.perf_counter() - started
+    logger.debug(
+        "reduce_summaries_node finished in %.3fs (%d collapse rounds)", elapsed, rounds
+    )
+
+    return {"document_summary": doc_summary, "node_timings": {"reduce_node": elapsed}}
+
+
+# Per-chunk summaries and keywords, and combined summaries, for incremental mode,
+# keyed by content hash. Entries are only valid for the prompts and model that
+# produced them, so those are part of the key.
+chunk_store = build_cache(
+    name="summary_chunks",
+    backend=settings.SUMMARY_CHUNK_CACHE_BACKEND,
+    ttl_seconds=settings.SUMMARY_CHUNK_CACHE_TTL_SECONDS,
+    max_entries=settings.SUMMARY_CHUNK_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SUMMARY_CHUNK_CACHE_MAX_BYTES,
+    sqlite_path=settings.SUMMARY_CHUNK_CACHE_PATH,
+)
 
 
-# Agent Invocation Function
-async def run_document_agent(document_text: str) -> str:
+def chunk_key(kind: str, content: str) -> str:
     """
-    Runs the document summarizer and keyword extractor agent.
+    Store key for an incremental-mode result ('chunk' or 'combine') of `content`.
+    """
+    version = compact_json(
+        [
+            getattr(settings.llm, "model_name", ""),
+            summary_template,
+            keywords_template,
+            combine_template,
+        ]
+    )
+    return hashlib.sha256(f"{kind}\x00{version}\x00{content}".encode("utf-8")).hexdigest()
+
+
+async def incremental_node(state: AgentState) -> dict:
+    """
+    Incremental mode for documents resubmitted after appends or edits. The
+    document is split at content-defined boundaries, so unchanged text yields
+    the same chunks as before; only chunks missing from chunk_store are sent to
+    the LLM. Chunk summaries are combined in groups of
+    SUMMARY_INCREMENTAL_GROUP_SIZE, level by level, and combined summaries are
+    stored too, so only groups containing a changed chunk are recombined.
 
     Args:
-        document_text (str): The text content of the document to process.
+        state (AgentState): The current state containing the document content.
 
     Returns:
-        str: A JSON string containing the document summary and extracted keywords.
+        dict: The state update with document_summary, chunk_summaries, keywords
+        and this node's timing.
+    """
+    started = time.perf_counter()
+    chunks = split_stable(
+        state["document_content"], settings.SUMMARY_INCREMENTAL_CHUNK_TOKENS
+    )
+    semaphore = asyncio.Semaphore(settings.SUMMARY_MAX_CONCURRENCY)
+
+    async def process_chunk(chunk: str) -> dict:
+        key = chunk_key("chunk", chunk)
+        stored = (
+            await asyncio.to_thread(chunk_store.get, key) if chunk_store is not None else None
+        )
+        if stored is not None:
+            summary_chunks.labels("reused").inc()
+            return stored
+        async with semaphore:
+            summary_result, keywords_result = await asyncio.gather(
+                summary_chain.ainvoke({"document": chunk}),
+                keywords_chain.ainvoke({"document": chunk}),
+            )
+        summary_chunks.labels("summarized").inc()
+        result = {
+            "summary": summary_result.content.strip(),
+            "keywords": parse_keywords(keywords_result.content),
+        }
+        if chunk_store is not None:
+            await asyncio.to_thread(chunk_store.set, key, result)
+        return result
+
+    async def combine(group: List[str]) -> str:
+        if len(group) == 1:
+            return group[0]
+        key = chunk_key("combine", compact_json(group))
+        stored = (
+            await asyncio.to_thread(chunk_store.get, key) if chunk_store is not None else None
+        )
+        if stored is not None:
+            return stored
+        async with semaphore:
+            result = await combine_chain.ainvoke({"summaries": "\n\n".join(group)})
+        summary = result.content.strip()
+        if chunk_store is not None:
+            await asyncio.to_thread(chunk_store.set, key, summary)
+        return summary
+
+    parts = await asyncio.gather(*(process_chunk(chunk) for chunk in chunks))
+    chunk_summaries = [part["summary"] for part in parts]
+    summaries = chunk_summaries
+    group_size = max(2, settings.SUMMARY_INCREMENTAL_GROUP_SIZE)
+    while len(summaries) > 1:
+        summaries = await asyncio.gather(
+            *(
+                combine(summaries[i : i + group_size])
+                for i in range(0, len(summaries), group_size)
+            )
+        )
+    keywords = merge_keywords(
+        [part["keywords"] for part in parts], settings.SUMMARY_MAX_KEYWORDS
+    )
+    elapsed = time.perf_counter() - started
+    logger.debug("incremental_node processed %d chunks in %.3fs", len(chunks), elapsed)
+
+    return {
+        "document_summary": summaries[0] if summaries else "",
+        "chunk_summaries": chunk_summaries,
+        "keywords": keywords,
+        "node_timings": {"incremental_node": elapsed},
+    }
+
+
+def route_by_document_size(state: AgentState):
+    """
+    Sends documents in incremental mode to incremental_node, documents that fit
+    into one prompt to the parallel summary/keyword branches, and larger
+    documents to the chunked map-reduce pipeline.
+    """
+    if state.get("incremental"):
+        return "incremental_node"
+    if count_tokens(state["document_content"]) <= settings.SUMMARY_CHUNK_TOKENS:
+        return ["summary_node", "keywords_node"]
+    return "map_chunks_node"
+
+
+# Build the LangGraph Graph
+@lazy
+def app():
+    """
+    The compiled summarizer graph, built on first use.
+    """
+    workflow = StateGraph(AgentState)
+
+    # Add the two independent nodes used for documents that fit into one prompt.
+    workflow.add_node(
+        "summary_node", instrument_node("document", "summary_node", summarize_node)
+    )
+    workflow.add_node(
+        "keywords_node", instrument_node("document", "keywords_node", extract_keywords_node)
+    )
+
+    # Add the map-reduce nodes used for large documents.
+    workflow.add_node(
+        "map_chunks_node", instrument_node("document", "map_chunks_node", map_chunks_node)
+    )
+    workflow.add_node(
+        "reduce_node", instrument_node("document", "reduce_node", reduce_summaries_node)
+    )
+
+    # Add the node used in incremental mode.
+    workflow.add_node(
+        "incremental_node", instrument_node("document", "incremental_node", incremental_node)
+    )
+
+    # Fan out: small documents start both nodes at once, large ones go to the map step.
+    workflow.add_conditional_edges(
+        START,
+        route_by_document_size,
+        ["summary_node", "keywords_node", "map_chunks_node", "incremental_node"],
+    )
+
+    # Join: the graph finishes once both branches have written their results.
+    workflow.add_edge("summary_node", END)
+    workflow.add_edge("keywords_node", END)
+    workflow.add_edge("map_chunks_node", "reduce_node")
+    workflow.add_edge("reduce_node", END)
+    workflow.add_edge("incremental_node", END)
+
+    # Compile the graph into an executable application.
+    return workflow.compile()
+
+
+def build_initial_state(
+    document_text: str, incremental: Optional[bool] = None
+) -> AgentState:
+    """
+    Creates the initial graph state for a document. incremental defaults to
+    settings.SUMMARY_INCREMENTAL.
     """
-    # Initial state for the graph.
-    initial_state = {
+    return {
         "document_content": document_text,
         "document_summary": "",
         "keywords": [],
+        "chunk_summaries": [],
+        "incremental": settings.SUMMARY_INCREMENTAL if incremental is None else incremental,
+        "node_timings": {},
     }
 
+
+def format_output(final_state: AgentState) -> DocumentAgentResult:
+    """
+    Extracts the agent output (summary and keywords) from the final graph state.
+    """
+    return {"document": final_state["document_summary"], "keywords": final_state["keywords"]}
+
+
+# Agent Invocation Function
+# Identical documents submitted at the same time share one run.
+@single_flight("document")
+async def run_document_agent(
+    document_text: str, incremental: Optional[bool] = None
+) -> DocumentAgentResult:
+    """
+    Runs the document summarizer and keyword extractor agent.
+
+    Args:
+        document_text (str): The text content of the document to process.
+        incremental (Optional[bool]): Reuse stored results for unchanged parts of
+            a resubmitted document. None follows settings.SUMMARY_INCREMENTAL.
+
+    Returns:
+        DocumentAgentResult: The document summary and extracted keywords.
+    """
     # Invoke the compiled graph.
-    # The 'stream' method can be used for more granular control or real-time updates
-    final_state = None
-    async for s in app.astream(initial_state):
-        final_state = s
-
-    # Extract the results from the final state.
-    summary = final_state["process_doc_node"]["document_summary"]
-    keywords = final_state["process_doc_node"]["keywords"]
-
-    # Format the output as a JSON string.
-    output_json = {"document": summary, "keywords": keywords}
-    return json.dumps(output_json, indent=2)
+    # ainvoke returns the joined state once both parallel branches have finished.
+    final_state = await app.ainvoke(build_initial_state(document_text, incremental))
+    logger.info("Node timings %s", final_state["node_timings"])
+
+    return format_output(final_state)
+
+
+def stream_document_agent(
+    document_text: str, incremental: Optional[bool] = None
+) -> AsyncIterator[dict]:
+    """
+    Runs the document summarizer agent and yields LLM tokens and node progress
+    events as they are produced, followed by the final result.
+
+    Args:
+        document_text (str): The text content of the document to process.
+        incremental (Optional[bool]): See run_document_agent.
+
+    Returns:
+        AsyncIterator[dict]: Stream events (see services.streaming.stream_graph_events).
+    """
+    return stream_graph_events(
+        app, build_initial_state(document_text, incremental), format_output
+    )
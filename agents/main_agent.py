@@ -1,10 +1,20 @@
-from agents.real_time_data_extractor import run_internet_agent
-from agents.document_summarizer import run_document_agent
-from agents.query_responder import run_query_responder_agent
+from agents.real_time_data_extractor import InternetAgentResult, run_internet_agent
+from agents.document_summarizer import DocumentAgentResult, run_document_agent
+from agents.query_responder import (
+    QueryAgentResult,
+    register_corpus,
+    run_corpus_query_agent,
+    run_query_responder_agent,
+)
 
-import json
+import asyncio
+import logging
 import os
-from typing import TypedDict, List, Optional, Union
+import random
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, TypedDict, List, Optional, Union
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import StateGraph, END
 from langchain_core.tools import tool
@@ -16,38 +26,52 @@ from langchain_core.messages import (
 )
 
 from config import settings
+from services.cache import build_cache
+from services.lazy import lazy
+from services.llm_cache import cached_llm
+from services.llm_scheduler import llm_priority
+from services.log import log_payload
+from services.metrics import (
+    current_route,
+    instrument_node,
+    session_tool_results,
+    tool_duration,
+)
+from services.prompt_budget import fit_text
+from services.routing import PreRouter
+from services.serialization import compact_json
+from services.sessions import session_store, tool_call_key
+from services.streaming import stream_graph_events
+
+logger = logging.getLogger(__name__)
 
 #  Environment Variable Setup (Crucial for all agents)
 if "OPENAI_API_KEY" not in os.environ:
-    print(
-        "WARNING: OPENAI_API_KEY environment variable not set. Please set it to use OpenAI models."
+    logger.warning(
+        "OPENAI_API_KEY environment variable not set. Please set it to use OpenAI models."
     )
 if "TAVILY_API_KEY" not in os.environ:
-    print(
-        "WARNING: TAVILY_API_KEY environment variable not set. Please set it to use the Tavily search tool (Agent 3)."
+    logger.warning(
+        "TAVILY_API_KEY environment variable not set. Please set it to use the Tavily search tool (Agent 3)."
     )
 
 
-#  Shared LLM Instance
-llm = settings.llm
-
-
 #  Define Tools for the Main Agent
 @tool(
     description="Summarizes a document and extracts keywords. Use this tool when the user provides a document or text and asks for a summary or keywords. Input should be the full document text."
 )
-async def summarize_document(document_text: str) -> str:
+async def summarize_document(document_text: str) -> DocumentAgentResult:
     """
     Summarizes a given document content and extracts a list of keywords.
     Input: A string representing the document content.
-    Output: A JSON string with 'document' (summary) and 'keywords' (list of strings).
+    Output: A dict with 'document' (summary) and 'keywords' (list of strings).
     Example: {"document": "Summary of text.", "keywords": ["keyword1", "keyword2"]}
     """
-    print(
-        f"Main Agent: Invoking summarize_document tool with document length {len(document_text)}."
+    logger.info(
+        "Invoking summarize_document tool with document length %d.", len(document_text)
     )
     result = await run_document_agent(document_text)
-    print(f"Summarize Document Tool Output: {result}")
+    log_payload(logger, "Summarize Document Tool Output", result)
     return result
 
 
@@ -56,41 +80,70 @@ async def summarize_document(document_text: str) -> str:
 )
 async def answer_query_from_documents(
     user_query: str, documents_list: List[str]
-) -> str:
+) -> QueryAgentResult:
     """
     Answers a user's question based on provided document content.
     Input:
         - user_query (str): The question to answer.
         - documents_list (List[str]): A list of strings, where each string is a document or a part of a document.
-    Output: A JSON string with 'query' and 'response'.
+    Output: A dict with 'query' and 'response'.
     Example: {"query": "What is x?", "response": "Answer for x."}
     """
-    print(
-        f"Main Agent: Invoking answer_query_from_documents tool with query '{user_query}' and {len(documents_list)} documents."
+    logger.info(
+        "Invoking answer_query_from_documents tool with %d documents.", len(documents_list)
     )
+    log_payload(logger, "Answer Query from Documents Tool Query", user_query)
     result = await run_query_responder_agent(user_query, documents_list)
-    print(f"Answer Query from Documents Tool Output: {result}")
+    log_payload(logger, "Answer Query from Documents Tool Output", result)
+    return result
+
+
+@tool(
+    description="Answers a user's question from a document corpus that was registered on the server earlier. Use this tool when the user refers to a corpus ID instead of pasting documents. Input requires the 'user_query' and the 'corpus_id' string."
+)
+async def answer_query_from_corpus(user_query: str, corpus_id: str) -> QueryAgentResult:
+    """
+    Answers a user's question from a registered document corpus.
+    Input:
+        - user_query (str): The question to answer.
+        - corpus_id (str): The ID returned when the corpus was registered.
+    Output: A dict with 'query' and 'response'.
+    Example: {"query": "What is x?", "response": "Answer for x."}
+    """
+    logger.info("Invoking answer_query_from_corpus tool on corpus '%s'.", corpus_id)
+    log_payload(logger, "Answer Query from Corpus Tool Query", user_query)
+    result = await run_corpus_query_agent(user_query, corpus_id)
+    log_payload(logger, "Answer Query from Corpus Tool Output", result)
     return result
 
 
 @tool(
     description="Fetches real-time, up-to-date information from the internet to answer a user's question. Use this tool when the user's question requires current information, external knowledge, or is not answerable from provided documents. Input is the 'user_query' string."
 )
-async def search_internet(user_query: str) -> str:
+async def search_internet(user_query: str) -> InternetAgentResult:
     """
     Fetches real-time, up-to-date information from the internet to answer a user's question.
     Input: A string representing the user's question that requires internet search.
-    Output: A JSON string with 'query', 'response', and 'source' (URL).
+    Output: A dict with 'query', 'response', and 'source' (URL).
     Example: {"query": "Latest news on AI?", "response": "AI is advancing rapidly...", "source": "https://example.com"}
     """
-    print(f"Main Agent: Invoking search_internet tool with query '{user_query}'.")
+    logger.info("Invoking search_internet tool.")
+    log_payload(logger, "Search Internet Tool Query", user_query)
     result = await run_internet_agent(user_query)
-    print(f"Search Internet Tool Output: {result}")
+    log_payload(logger, "Search Internet Tool Output", result)
     return result
 
 
 # List of all tools available to the main agent
-tools = [summarize_document, answer_query_from_documents, search_internet]
+tools = [
+    summarize_document,
+    answer_query_from_documents,
+    answer_query_from_corpus,
+    search_internet,
+]
+
+# Tool lookup by name for executing the router's tool calls
+tools_by_name = {t.name: t for t in tools}
 
 #  Main Graph Agent
 
@@ -106,18 +159,50 @@ class MainAgentState(TypedDict):
     selected_tool_name: Optional[
         str
     ]  # To store the name of the tool selected by the router
-    tool_raw_output: Optional[str]  # To store the raw JSON output from the tool
+    # Unformatted tool output: the result dict of the tool, or a list of
+    # {"tool", "output"} entries when several tools ran. Serialized only when it is
+    # placed into a prompt.
+    tool_raw_output: Union[Dict[str, Any], List[Dict[str, Any]], None]
     natural_language_response: Optional[str]
     justification: Optional[str]
+    response_mode: str  # "rewrite" (final LLM pass) or "fast" (deterministic formatting)
+    router_rationale: Optional[str]  # One-line reason the router gave for its tool choice
+    session_id: Optional[str]  # Conversation session of the request, if any
+    # Session state, carried over between the turns of a session by the
+    # checkpointer (see services.sessions): the earlier turns (prompt and answer,
+    # shortened), a summary of the turns before those, and recent tool outputs by
+    # tool call (see services.sessions.tool_call_key).
+    history: List[Union[HumanMessage, AIMessage]]
+    history_summary: Optional[str]
+    tool_results: Dict[str, Dict[str, Any]]
+
+
+class MainAgentResult(TypedDict):
+    """
+    Output of the main orchestrator agent.
+
+    Attributes:
+        query (str): The user's prompt.
+        response (str): The natural language answer.
+        justification (str): Why the tool(s) were chosen.
+    """
+
+    query: str
+    response: str
+    justification: str
 
 
-# Define Router LLM and Prompt for Tool Calling
-router_llm_with_tools = llm.bind_tools(tools)
+# Define Router LLM and Prompt for Tool Calling (chains are built on first use,
+# see services.lazy)
+@lazy
+def router_llm_with_tools():
+    return cached_llm(settings.llm, "router").bind_tools(tools)
+
 
 system_prompt = SystemMessage(
     content="""
     You are a powerful orchestrator agent named Auraa. Your primary role is to answer the user by analyzing the user's request and determining the most appropriate specialized tool to use.
-    You have access to the following tools: summarize_document, answer_query_from_documents, search_internet.
+    You have access to the following tools: summarize_document, answer_query_from_documents, answer_query_from_corpus, search_internet.
     When a tool is selected, you must call it with the correct arguments.
     If the user's request can be answered by one of the tools, you must use that tool.
     If no tool is suitable, respond directly to the user indicating you cannot fulfill the request.
@@ -131,20 +216,171 @@ router_prompt_for_tools = ChatPromptTemplate.from_messages(
     ]
 )
 
-router_agent_executor = router_prompt_for_tools | router_llm_with_tools
+
+@lazy
+def router_agent_executor():
+    return router_prompt_for_tools | router_llm_with_tools.unwrap()
+
+
+# In "fast" mode there is no final LLM pass to justify the tool choice, so the
+# router is asked to state its reason alongside the tool call instead.
+fast_mode_instruction = SystemMessage(
+    content="""
+    When you call a tool, also write a single line in your message content explaining why you chose that tool.
+    """
+)
+
+router_prompt_for_tools_fast = ChatPromptTemplate.from_messages(
+    [
+        system_prompt,
+        fast_mode_instruction,
+        MessagesPlaceholder(variable_name="messages"),
+    ]
+)
+
+
+@lazy
+def router_agent_executor_fast():
+    return router_prompt_for_tools_fast | router_llm_with_tools.unwrap()
+
+
+# Prompt for the final response generation and justification.
+# Built once and shared by every request.
+final_response_template = """
+    You are a helpful AI assistant named Auraa and a manager of specialized agents.
+    You have just processed a user's request.
+    Your task is to:
+    1.  Convert the raw JSON output (or direct response) into a natural, user-friendly answer. Ensure ALL information from the raw output without missing a single word is included in the natural language answer.
+    2.  If the json output contains any links or URLs, ensure they are included in the final answer.
+    3.  For summarization tool output start with the summary of the given document and then mention the keywords as well in the final natural_language_answer.
+    4.  Provide a clear and concise justification for why the specific tool was chosen to address the user's original query. This justification MUST be a single line.
+        If no tool was chosen (i.e., 'direct_response'), explain why a direct response was provided in a single line.
+
+    Original User Query: {user_prompt}
+    Tool Used: {selected_tool_name}
+    Raw Tool Output/Direct Response (JSON): {tool_raw_output}
+
+    Based on the above, provide your comprehensive response in the following format:
+
+    **Answer:**
+    [Natural language answer derived from the tool output, do not omit any of result except user_query, other than that keep everything in final response mentioning evrything use correct line terminations to make the response more effective. If the tool output indicates an error or no results, clearly state that. If it was a 'direct_response', provide the direct answer here.]
+
+    **Justification for Tool Selection:**
+    [Single-line explanation of why the '{selected_tool_name}' tool was chosen for the original query. If 'direct_response', explain why a direct response was given.]
+"""
+
+final_response_prompt = ChatPromptTemplate.from_template(final_response_template)
+
+
+@lazy
+def final_response_chain():
+    return final_response_prompt | cached_llm(settings.llm, "final_response")
+
+
+# Chooses the tool locally for prompts that follow a known pattern, so they skip
+# the router LLM round-trip (see services.routing).
+pre_router = PreRouter(
+    cache=build_cache(
+        name="routing",
+        backend=settings.ROUTING_CACHE_BACKEND,
+        ttl_seconds=settings.ROUTING_CACHE_TTL_SECONDS,
+        max_entries=settings.ROUTING_CACHE_MAX_ENTRIES,
+        max_bytes=16 * 1024 * 1024,
+        sqlite_path=settings.ROUTING_CACHE_PATH,
+    ),
+    min_confidence=settings.PREROUTER_MIN_CONFIDENCE,
+    min_observations=settings.ROUTING_CACHE_MIN_OBSERVATIONS,
+    min_agreement=settings.ROUTING_CACHE_MIN_AGREEMENT,
+    enabled=settings.PREROUTER_ENABLED,
+)
+
+# Background router LLM checks of local decisions (kept referenced until done).
+shadow_checks = set()
+
+
+async def check_local_route(user_message: HumanMessage, source: str, tool_name: str) -> None:
+    """
+    Asks the router LLM to route a prompt that was routed locally and records
+    whether it agrees. Runs in the background at batch priority.
+    """
+    llm_priority.set("batch")
+    try:
+        response = await router_agent_executor.ainvoke({"messages": [user_message]})
+    except Exception as e:
+        logger.warning("Router check failed: %s", e)
+        return
+    llm_tools = [call["name"] for call in response.tool_calls] or ["direct_response"]
+    pre_router.check(source, tool_name, llm_tools)
+    await asyncio.to_thread(pre_router.learn, user_message.content, llm_tools)
+
+
+def session_history(state: MainAgentState) -> List[Union[HumanMessage, AIMessage, SystemMessage]]:
+    """
+    Returns the earlier turns of the session to send to the router before the
+    prompt, preceded by the summary of older turns. Empty outside a session.
+    """
+    history = list(state.get("history") or [])
+    if state.get("history_summary"):
+        history.insert(
+            0,
+            SystemMessage(
+                content=f"Summary of the earlier conversation: {state['history_summary']}"
+            ),
+        )
+    return history
 
 
 # Define Graph Nodes
 async def route_and_call_agent(state: MainAgentState) -> MainAgentState:
     """
-    This node acts as the router. It takes the user's prompt, routes it to the LLM with tools,
-    and captures the LLM's decision (tool call or direct response).
+    This node acts as the router. It takes the user's prompt and chooses the tool
+    locally when the pre-router is confident; otherwise it routes it, after the
+    earlier turns of the session, to the LLM with tools and captures the LLM's
+    decision (tool call or direct response).
     """
     user_message = state["messages"][-1]  # Get the latest user message
-    print(f"\nRouter Node: Receiving user message: '{user_message.content}'")
-
-    response = await router_agent_executor.ainvoke({"messages": [user_message]})
-    print(f"Router Node: LLM response (potential tool call): {response}")
+    log_payload(logger, "Router Node: Receiving user message", user_message.content)
+    history = session_history(state)
+    follow_up = bool(history)
+
+    decision = await asyncio.to_thread(pre_router.route, user_message.content, follow_up)
+    if decision is not None:
+        response = AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": decision["tool"],
+                    "args": decision["args"],
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                }
+            ],
+        )
+        logger.info(
+            "Router Node: Pre-routed to %s (%s, confidence %.2f).",
+            decision["tool"],
+            decision["source"],
+            decision["confidence"],
+        )
+        if random.random() < settings.PREROUTER_SHADOW_RATE:
+            task = asyncio.create_task(
+                check_local_route(user_message, decision["source"], decision["tool"])
+            )
+            shadow_checks.add(task)
+            task.add_done_callback(shadow_checks.discard)
+    else:
+        executor = (
+            router_agent_executor_fast
+            if state.get("response_mode") == "fast"
+            else router_agent_executor
+        )
+        response = await executor.ainvoke({"messages": history + [user_message]})
+        await asyncio.to_thread(
+            pre_router.observe,
+            user_message.content,
+            [call["name"] for call in response.tool_calls] or ["direct_response"],
+            follow_up,
+        )
+    log_payload(logger, "Router Node: LLM response (potential tool call)", response)
 
     state["messages"].append(response)  # Add the LLM's response to the state
 
@@ -152,84 +388,145 @@ async def route_and_call_agent(state: MainAgentState) -> MainAgentState:
     tool_raw_output = None
 
     if response.tool_calls:
-        selected_tool_name = response.tool_calls[0]["name"]
-        print(f"Router Node: Selected tool: {selected_tool_name}")
+        # The router may ask for several tools (e.g. "summarize this and find the
+        # latest news on X"); all of them are executed, in call order.
+        selected_tool_name = ", ".join(call["name"] for call in response.tool_calls)
+        logger.info("Router Node: Selected tool: %s", selected_tool_name)
     else:
         # If no tool call, it means the LLM decided to respond directly
         selected_tool_name = "direct_response"
-        tool_raw_output = json.dumps({"response": response.content})
-        print(
-            f"Router Node: LLM responded directly. Selected tool: {selected_tool_name}"
-        )
+        tool_raw_output = {"response": response.content}
+        logger.info("Router Node: LLM responded directly.")
+
+    router_rationale = None
+    if response.tool_calls and isinstance(response.content, str) and response.content.strip():
+        router_rationale = response.content.strip().splitlines()[0]
 
     return {
         **state,
         "selected_tool_name": selected_tool_name,
         "tool_raw_output": tool_raw_output,
+        "router_rationale": router_rationale,
     }
 
 
+# Caps the number of tools executing at once across all requests.
+tool_semaphore = asyncio.Semaphore(settings.TOOL_MAX_CONCURRENCY)
+
+
+async def execute_tool_call(tool_call: dict) -> Dict[str, Any]:
+    """
+    Executes one tool call under the global tool concurrency cap and the tool's
+    timeout. Failures are returned as an {"error": ...} result instead of raised,
+    so one failing tool does not discard the results of the others.
+    """
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
+    logger.info("Call Tool Node: Executing tool '%s'.", tool_name)
+    log_payload(logger, f"Call Tool Node: '{tool_name}' arguments", tool_args)
+
+    tool_function = tools_by_name.get(tool_name)
+    if tool_function is None:
+        error_message = f"Tool '{tool_name}' not found."
+        logger.error(error_message)
+        return {"error": error_message}
+
+    timeout = settings.TOOL_TIMEOUTS.get(tool_name, settings.TOOL_TIMEOUT_SECONDS)
+    started = time.perf_counter()
+    try:
+        async with tool_semaphore:
+            tool_output = await asyncio.wait_for(tool_function.ainvoke(tool_args), timeout)
+        tool_duration.labels(current_route.get(), tool_name, "ok").observe(
+            time.perf_counter() - started
+        )
+        return tool_output
+    except asyncio.TimeoutError:
+        status = "timeout"
+        error_message = f"Tool '{tool_name}' timed out after {timeout}s."
+    except Exception as e:
+        status = "error"
+        error_message = f"Error executing tool '{tool_name}': {e}"
+    tool_duration.labels(current_route.get(), tool_name, status).observe(
+        time.perf_counter() - started
+    )
+    logger.error(error_message)
+    return {"error": error_message}
+
+
+async def execute_session_tool_call(
+    tool_call: dict, tool_results: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Returns the output of an identical tool call from an earlier turn of the
+    session while it is fresh (SESSION_TOOL_RESULT_TTL_SECONDS); otherwise runs
+    the tool and keeps its output in tool_results for later turns.
+    """
+    tool_name = tool_call["name"]
+    key = tool_call_key(tool_name, tool_call["args"])
+    stored = tool_results.get(key)
+    if stored is not None and time.time() - stored["at"] <= settings.SESSION_TOOL_RESULT_TTL_SECONDS:
+        logger.info("Call Tool Node: Reusing the session's earlier output of '%s'.", tool_name)
+        session_tool_results.labels(tool_name, "reused").inc()
+        return stored["output"]
+
+    tool_output = await execute_tool_call(tool_call)
+    session_tool_results.labels(tool_name, "computed").inc()
+    if isinstance(tool_output, dict) and "error" not in tool_output:
+        tool_results.pop(key, None)
+        tool_results[key] = {"tool": tool_name, "output": tool_output, "at": time.time()}
+        while len(tool_results) > settings.SESSION_MAX_TOOL_RESULTS:
+            tool_results.pop(next(iter(tool_results)))
+    return tool_output
+
+
 async def call_tool_node(state: MainAgentState) -> MainAgentState:
     """
-    Executes the tool chosen by the router LLM or processes a direct response.
+    Executes the tools chosen by the router LLM or processes a direct response.
     """
     messages = state["messages"]
     last_message = messages[-1]
     selected_tool_name = state.get("selected_tool_name")
 
     if selected_tool_name == "direct_response":
-        print("Call Tool Node: Processing direct response from router LLM.")
+        logger.debug("Call Tool Node: Processing direct response from router LLM.")
         # tool_raw_output is already set by route_and_call_agent for direct_response
         return state
 
     if not last_message.tool_calls:
-        print(
+        logger.warning(
             "Call Tool Node: No tool call found in the last message, but not a direct response. This is unexpected."
         )
         # Fallback for unexpected scenarios
         return {
             **state,
-            "tool_raw_output": json.dumps(
-                {"error": "No tool call found after routing."}
-            ),
+            "tool_raw_output": {"error": "No tool call found after routing."},
             "selected_tool_name": "error_fallback",
         }
 
-    tool_call = last_message.tool_calls[0]
-    tool_name = tool_call["name"]
-    tool_args = tool_call["args"]
-    tool_id = tool_call["id"]
-
-    print(f"Call Tool Node: Executing tool '{tool_name}' with arguments: {tool_args}")
-
-    tool_function = next((t for t in tools if t.name == tool_name), None)
-    if tool_function:
-        try:
-            tool_output = await tool_function.ainvoke(tool_args)
-            messages.append(ToolMessage(tool_output, tool_call_id=tool_id))
-            return {**state, "messages": messages, "tool_raw_output": tool_output}
-        except Exception as e:
-            error_message = f"Error executing tool '{tool_name}': {e}"
-            print(error_message)
-            messages.append(
-                ToolMessage(json.dumps({"error": error_message}), tool_call_id=tool_id)
-            )
-            return {
-                **state,
-                "messages": messages,
-                "tool_raw_output": json.dumps({"error": error_message}),
-            }
+    # Run every requested tool concurrently; results keep the router's call order.
+    # In a session, outputs of identical calls in earlier turns are reused.
+    tool_calls = last_message.tool_calls
+    if state.get("session_id"):
+        tool_results = dict(state.get("tool_results") or {})
+        tool_outputs = await asyncio.gather(
+            *(execute_session_tool_call(tool_call, tool_results) for tool_call in tool_calls)
+        )
+        state = {**state, "tool_results": tool_results}
     else:
-        error_message = f"Tool '{tool_name}' not found."
-        print(error_message)
-        messages.append(
-            ToolMessage(json.dumps({"error": error_message}), tool_call_id=tool_id)
+        tool_outputs = await asyncio.gather(
+            *(execute_tool_call(tool_call) for tool_call in tool_calls)
         )
-        return {
-            **state,
-            "messages": messages,
-            "tool_raw_output": json.dumps({"error": error_message}),
-        }
+    for tool_call, tool_output in zip(tool_calls, tool_outputs):
+        messages.append(ToolMessage(compact_json(tool_output), tool_call_id=tool_call["id"]))
+
+    if len(tool_outputs) == 1:
+        tool_raw_output = tool_outputs[0]
+    else:
+        tool_raw_output = [
+            {"tool": tool_call["name"], "output": tool_output}
+            for tool_call, tool_output in zip(tool_calls, tool_outputs)
+        ]
+    return {**state, "messages": messages, "tool_raw_output": tool_raw_output}
 
 
 async def generate_final_response_and_justify(state: MainAgentState) -> MainAgentState:
@@ -238,47 +535,18 @@ async def generate_final_response_and_justify(state: MainAgentState) -> MainAgen
     """
     user_prompt = state["messages"][0].content
     selected_tool_name = state.get("selected_tool_name", "unknown_tool")
-    tool_raw_output = state.get(
-        "tool_raw_output", json.dumps({"error": "No tool output."})
-    )
+    tool_raw_output = state.get("tool_raw_output") or {"error": "No tool output."}
 
-    print(
-        f"\nFinal Response Node: Generating response for tool '{selected_tool_name}' output."
+    logger.debug(
+        "Final Response Node: Generating response for tool '%s' output.", selected_tool_name
     )
 
-    # Prompt for the final response generation and justification
-    final_response_template = """
-    You are a helpful AI assistant named Auraa and a manager of specialized agents.
-    You have just processed a user's request.
-    Your task is to:
-    1.  Convert the raw JSON output (or direct response) into a natural, user-friendly answer. Ensure ALL information from the raw output without missing a single word is included in the natural language answer.
-    2.  If the json output contains any links or URLs, ensure they are included in the final answer.
-    3.  For summarization tool output start with the summary of the given document and then mention the keywords as well in the final natural_language_answer.
-    4.  Provide a clear and concise justification for why the specific tool was chosen to address the user's original query. This justification MUST be a single line.
-        If no tool was chosen (i.e., 'direct_response'), explain why a direct response was provided in a single line.
-
-    Original User Query: {user_prompt}
-    Tool Used: {selected_tool_name}
-    Raw Tool Output/Direct Response (JSON): {tool_raw_output}
-
-    Based on the above, provide your comprehensive response in the following format:
-
-    **Answer:**
-    [Natural language answer derived from the tool output, do not omit any of result except user_query, other than that keep everything in final response mentioning evrything use correct line terminations to make the response more effective. If the tool output indicates an error or no results, clearly state that. If it was a 'direct_response', provide the direct answer here.]
-
-    **Justification for Tool Selection:**
-    [Single-line explanation of why the '{selected_tool_name}' tool was chosen for the original query. If 'direct_response', explain why a direct response was given.]
-    """
-
-    final_response_prompt = ChatPromptTemplate.from_template(final_response_template)
-    final_response_chain = final_response_prompt | llm
-
     try:
         final_llm_response = await final_response_chain.ainvoke(
             {
-                "user_prompt": user_prompt,
+                "user_prompt": fit_text(user_prompt, "final_user_prompt"),
                 "selected_tool_name": selected_tool_name,
-                "tool_raw_output": tool_raw_output,
+                "tool_raw_output": fit_text(compact_json(tool_raw_output), "final_tool_output"),
             }
         )
         full_response_content = final_llm_response.content.strip()
@@ -315,8 +583,7 @@ async def generate_final_response_and_justify(state: MainAgentState) -> MainAgen
             "justification": justification,
         }
     except Exception as e:
-        error_msg = f"Error in final response generation: {e}"
-        print(error_msg)
+        logger.exception("Error in final response generation: %s", e)
         return {
             **state,
             "natural_language_response": f"An error occurred while generating the final response: {e}",
@@ -324,89 +591,411 @@ async def generate_final_response_and_justify(state: MainAgentState) -> MainAgen
         }
 
 
+# Fallback justifications for "fast" mode when the router gave no reason.
+DEFAULT_JUSTIFICATIONS = {
+    "summarize_document": "The 'summarize_document' tool was chosen because the request asks for a summary or keywords of the provided document.",
+    "answer_query_from_documents": "The 'answer_query_from_documents' tool was chosen because the request asks a question about the provided documents.",
+    "answer_query_from_corpus": "The 'answer_query_from_corpus' tool was chosen because the request asks a question about a registered document corpus.",
+    "search_internet": "The 'search_internet' tool was chosen because the request needs current information from the internet.",
+    "direct_response": "A direct response was given because none of the tools fit the request.",
+}
+
+
+def format_tool_result(tool_name: str, data) -> str:
+    """
+    Formats the parsed output of a single tool. Every field of the tool output
+    except the echoed query is kept.
+    """
+    if not isinstance(data, dict):
+        return str(data)
+    if "error" in data:
+        return f"Sorry, the request could not be completed: {data['error']}"
+    if tool_name == "summarize_document":
+        keywords = ", ".join(data.get("keywords", []))
+        return f"{data.get('document', '')}\n\nKeywords: {keywords}"
+    if tool_name == "search_internet":
+        answer = data.get("response", "")
+        source = data.get("source")
+        if source and source != "N/A":
+            answer = f"{answer}\n\nSource: {source}"
+        return answer
+    return data.get("response", compact_json(data))
+
+
+def format_tool_output(
+    selected_tool_name: str,
+    tool_raw_output: Union[Dict[str, Any], List[Dict[str, Any]], None],
+) -> str:
+    """
+    Turns the raw output of the executed tool(s) into the user-facing answer
+    without an LLM call. Outputs of several tools are formatted one after another,
+    in call order.
+    """
+    if not tool_raw_output:
+        return "No tool output."
+    if isinstance(tool_raw_output, list) and "," in selected_tool_name:
+        return "\n\n".join(
+            format_tool_result(item.get("tool"), item.get("output"))
+            for item in tool_raw_output
+        )
+    return format_tool_result(selected_tool_name, tool_raw_output)
+
+
+async def format_final_response(state: MainAgentState) -> MainAgentState:
+    """
+    "Fast" mode replacement for generate_final_response_and_justify: formats the
+    tool output deterministically and takes the justification from the router's
+    tool-call decision, saving a full LLM round-trip.
+    """
+    selected_tool_name = state.get("selected_tool_name") or "unknown_tool"
+    logger.debug("Format Response Node: Formatting output of tool '%s'.", selected_tool_name)
+
+    justification = state.get("router_rationale") or " ".join(
+        DEFAULT_JUSTIFICATIONS.get(
+            tool_name,
+            f"The '{tool_name}' tool was selected by the router for this request.",
+        )
+        for tool_name in selected_tool_name.split(", ")
+    )
+    return {
+        **state,
+        "natural_language_response": format_tool_output(
+            selected_tool_name, state.get("tool_raw_output")
+        ),
+        "justification": justification,
+    }
+
+
+def select_response_node(state: MainAgentState) -> str:
+    """
+    Chooses between the LLM rewrite pass and deterministic formatting.
+    """
+    if state.get("response_mode") == "fast":
+        return "format_final_response"
+    return "generate_final_response"
+
+
+# Prompt for folding older turns of a session into its running summary.
+session_summary_template = """
+    Summarize the conversation below between a user and the assistant Auraa, continuing the earlier summary, in at most 150 words.
+    Keep the facts, names, numbers, URLs and corpus IDs that later questions may refer to.
+
+    Earlier summary: {summary}
+
+    Conversation:
+    {conversation}
+"""
+
+session_summary_prompt = ChatPromptTemplate.from_template(session_summary_template)
+
+
+@lazy
+def session_summary_chain():
+    return session_summary_prompt | cached_llm(settings.llm, "session_summary")
+
+
+async def register_turn_documents(state: MainAgentState) -> Optional[str]:
+    """
+    Registers the documents passed to the tools in this turn as a corpus, so
+    follow-up questions can be answered from it without resending them. Returns
+    the corpus ID, or None when the turn had no documents.
+    """
+    documents = []
+    for message in state["messages"]:
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            if tool_call["name"] == "summarize_document":
+                documents.append(tool_call["args"].get("document_text", ""))
+            elif tool_call["name"] == "answer_query_from_documents":
+                documents.extend(tool_call["args"].get("documents_list", []))
+    documents = [document for document in documents if document.strip()]
+    if not documents:
+        return None
+    try:
+        corpus = await register_corpus(documents)
+    except Exception as e:
+        logger.warning("Could not register the session's documents: %s", e)
+        return None
+    return corpus["corpus_id"]
+
+
+async def update_session(state: MainAgentState) -> MainAgentState:
+    """
+    Adds this turn to the session history: the prompt and the answer, each cut to
+    its budget (session_prompt, session_answer). Documents cut from the prompt
+    are registered as a corpus that the history refers to. When the history
+    exceeds SESSION_HISTORY_TURNS turns, its older half is folded into the
+    summary (or dropped when SESSION_SUMMARY_ENABLED is false).
+    """
+    user_prompt = state["messages"][0].content
+    prompt_entry = fit_text(user_prompt, "session_prompt")
+    if prompt_entry != user_prompt:
+        corpus_id = await register_turn_documents(state)
+        if corpus_id is not None:
+            prompt_entry += (
+                f"\n[The documents of this message are registered as corpus {corpus_id}; "
+                "answer questions about them with answer_query_from_corpus.]"
+            )
+    answer_entry = fit_text(state.get("natural_language_response") or "", "session_answer")
+    history = list(state.get("history") or []) + [
+        HumanMessage(content=prompt_entry),
+        AIMessage(content=answer_entry),
+    ]
+    summary = state.get("history_summary")
+
+    max_turns = settings.SESSION_HISTORY_TURNS
+    if len(history) > 2 * max_turns:
+        keep = 2 * (max_turns // 2)  # The newer half stays verbatim.
+        older, history = history[: len(history) - keep], history[len(history) - keep :]
+        if settings.SESSION_SUMMARY_ENABLED:
+            conversation = "\n".join(
+                f"{'User' if isinstance(message, HumanMessage) else 'Auraa'}: {message.content}"
+                for message in older
+            )
+            try:
+                summary_response = await session_summary_chain.ainvoke(
+                    {"summary": summary or "(none)", "conversation": conversation}
+                )
+                summary = summary_response.content.strip()
+            except Exception as e:
+                logger.warning("Could not summarize the session history: %s", e)
+        logger.debug("Update Session Node: Folded %d older turns.", len(older) // 2)
+
+    return {**state, "history": history, "history_summary": summary}
+
+
 # 4. Build the Main LangGraph Graph
-main_workflow = StateGraph(MainAgentState)
+def build_main_workflow(sessions: bool = False) -> StateGraph:
+    """
+    Builds the orchestrator graph. With `sessions`, each run ends by updating
+    the session history (update_session).
+    """
+    main_workflow = StateGraph(MainAgentState)
 
-# Add nodes
-main_workflow.add_node("router_and_tool_decider", route_and_call_agent)
-main_workflow.add_node("execute_tool", call_tool_node)
-main_workflow.add_node("generate_final_response", generate_final_response_and_justify)
+    # Add nodes
+    main_workflow.add_node(
+        "router_and_tool_decider",
+        instrument_node("main", "router_and_tool_decider", route_and_call_agent),
+    )
+    main_workflow.add_node(
+        "execute_tool", instrument_node("main", "execute_tool", call_tool_node)
+    )
+    main_workflow.add_node(
+        "generate_final_response",
+        instrument_node(
+            "main", "generate_final_response", generate_final_response_and_justify
+        ),
+    )
+    main_workflow.add_node(
+        "format_final_response",
+        instrument_node("main", "format_final_response", format_final_response),
+    )
 
-# Set entry point
-main_workflow.set_entry_point("router_and_tool_decider")
+    # Set entry point
+    main_workflow.set_entry_point("router_and_tool_decider")
 
-# Define edges
-main_workflow.add_edge("router_and_tool_decider", "execute_tool")
-main_workflow.add_edge("execute_tool", "generate_final_response")
-main_workflow.add_edge("generate_final_response", END)
+    # Define edges
+    main_workflow.add_edge("router_and_tool_decider", "execute_tool")
+    main_workflow.add_conditional_edges(
+        "execute_tool",
+        select_response_node,
+        ["generate_final_response", "format_final_response"],
+    )
+    if sessions:
+        main_workflow.add_node(
+            "update_session", instrument_node("main", "update_session", update_session)
+        )
+        main_workflow.add_edge("generate_final_response", "update_session")
+        main_workflow.add_edge("format_final_response", "update_session")
+        main_workflow.add_edge("update_session", END)
+    else:
+        main_workflow.add_edge("generate_final_response", END)
+        main_workflow.add_edge("format_final_response", END)
 
-# Compile the graph
-main_app = main_workflow.compile()
+    return main_workflow
 
 
-#  Main Agent Invocation Function
-async def run_main_agent_orchestrator(user_prompt: str) -> str:
+@lazy
+def main_app():
     """
-    Runs the main graph agent to process a user prompt by selecting and invoking
-    the appropriate sub-agent tool, then provides a natural language response
-    and justification.
+    The compiled orchestrator graph, built on first use.
+    """
+    return build_main_workflow().compile()
 
-    Args:
-        user_prompt (str): The user's input query.
 
-    Returns:
-        str: A JSON string containing the natural language response and justification.
+@lru_cache(maxsize=None)
+def session_app(checkpointer):
+    """
+    The compiled orchestrator graph for session turns, which saves the state of
+    each session with the checkpointer (see services.sessions).
+    """
+    return build_main_workflow(sessions=True).compile(checkpointer=checkpointer)
+
+
+def session_config(session_id: str) -> dict:
+    return {"configurable": {"thread_id": session_id}}
+
+
+def build_initial_state(
+    user_prompt: str, response_mode: Optional[str] = None, session_id: Optional[str] = None
+) -> MainAgentState:
+    """
+    Creates the initial graph state for a user prompt. response_mode defaults to
+    settings.ORCHESTRATOR_RESPONSE_MODE. The session state (history and tool
+    results) is not part of it: in a session it comes from the checkpointer.
     """
     initial_messages = [HumanMessage(content=user_prompt)]
-    initial_state = {
+    return {
         "messages": initial_messages,
         "selected_tool_name": None,
         "tool_raw_output": None,
         "natural_language_response": None,
         "justification": None,
+        "response_mode": response_mode or settings.ORCHESTRATOR_RESPONSE_MODE,
+        "router_rationale": None,
+        "session_id": session_id,
     }
 
-    final_state = None
-    async for s in main_app.astream(initial_state):
-        if "__end__" in s:
-            final_state = s["__end__"]
-        elif "execute_tool" in s:
-            # Extract the state from the "execute_tool" key
-            final_state = s["execute_tool"]
-        elif "generate_final_response" in s:
-            # Extract the state from the "generate_final_response" key
-            final_state = s["generate_final_response"]
-        else:
-            final_state = s
-            # Print intermediate states for debugging
-            print(f"Intermediate State: {s}")
 
+def format_output(
+    final_state: Optional[MainAgentState], user_prompt: str = ""
+) -> MainAgentResult:
+    """
+    Extracts the orchestrator output (query, response and justification) from the
+    final graph state. `user_prompt` is reported if the graph produced no state.
+    """
+    if final_state:
+        user_prompt = final_state["messages"][0].content
     if final_state and final_state.get("natural_language_response") is not None:
-        return json.dumps(
-            {
-                "query": user_prompt,
-                "response": final_state["natural_language_response"],
-                "justification": final_state["justification"],
-            },
-            indent=2,
-        )
-    else:
-        # Fallback for cases where final processing failed
-        error_msg = (
-            final_state.get("natural_language_response", "An unknown error occurred.")
-            if final_state
-            else "No final state."
+        return {
+            "query": user_prompt,
+            "response": final_state["natural_language_response"],
+            "justification": final_state["justification"],
+        }
+
+    # Fallback for cases where final processing failed
+    error_msg = (
+        final_state.get("natural_language_response") or "An unknown error occurred."
+        if final_state
+        else "No final state."
+    )
+    justification_msg = (
+        final_state.get("justification") or "Could not determine justification."
+        if final_state
+        else ""
+    )
+    return {
+        "query": user_prompt,
+        "response": f"Sorry, Auraa could not process your request. {error_msg}",
+        "justification": justification_msg,
+    }
+
+
+#  Main Agent Invocation Function
+async def run_main_agent_orchestrator(
+    user_prompt: str, response_mode: Optional[str] = None, session_id: Optional[str] = None
+) -> MainAgentResult:
+    """
+    Runs the main graph agent to process a user prompt by selecting and invoking
+    the appropriate sub-agent tool, then provides a natural language response
+    and justification.
+
+    Args:
+        user_prompt (str): The user's input query.
+        response_mode (Optional[str]): "rewrite" to have the LLM rewrite the tool
+            output, or "fast" to format it deterministically. Defaults to
+            settings.ORCHESTRATOR_RESPONSE_MODE.
+        session_id (Optional[str]): Conversation session the prompt belongs to.
+            Its earlier turns are given to the router and its earlier tool
+            outputs reused; the session is created on first use.
+
+    Returns:
+        MainAgentResult: The query, natural language response and justification.
+    """
+    if not session_id:
+        return await run_main_graph(main_app, build_initial_state(user_prompt, response_mode))
+    async with session_store.lock(session_id):
+        return await run_main_graph(
+            session_app(session_store.checkpointer()),
+            build_initial_state(user_prompt, response_mode, session_id),
+            session_config(session_id),
         )
-        justification_msg = (
-            final_state.get("justification", "Could not determine justification.")
-            if final_state
-            else ""
+
+
+async def run_main_graph(
+    graph, initial_state: MainAgentState, config: Optional[dict] = None
+) -> MainAgentResult:
+    """
+    Runs a compiled orchestrator graph (config selects the session) and formats its output.
+    """
+    final_state = None
+    # Sessions save their state once, when the run finishes.
+    async for s in graph.astream(
+        initial_state, config, durability="exit" if config else None
+    ):
+        # Every node returns the full state, so the latest update is the current state.
+        for node_name, node_state in s.items():
+            final_state = node_state
+            if node_name == "router_and_tool_decider":
+                # Log intermediate states for debugging
+                log_payload(logger, "Intermediate State", s)
+
+    return format_output(final_state, initial_state["messages"][0].content)
+
+
+def stream_main_agent_orchestrator(
+    user_prompt: str, response_mode: Optional[str] = None, session_id: Optional[str] = None
+) -> AsyncIterator[dict]:
+    """
+    Runs the main graph agent and yields LLM tokens (including those of the
+    sub-agent invoked by the selected tool) and node progress events as they are
+    produced, followed by the final response and justification.
+
+    Args:
+        user_prompt (str): The user's input query.
+        response_mode (Optional[str]): "rewrite" or "fast" (see run_main_agent_orchestrator).
+        session_id (Optional[str]): Conversation session (see run_main_agent_orchestrator).
+
+    Returns:
+        AsyncIterator[dict]: Stream events (see services.streaming.stream_graph_events).
+    """
+    if not session_id:
+        return stream_graph_events(
+            main_app, build_initial_state(user_prompt, response_mode), format_output
         )
-        return json.dumps(
+
+    async def session_events():
+        async with session_store.lock(session_id):
+            async for event in stream_graph_events(
+                session_app(session_store.checkpointer()),
+                build_initial_state(user_prompt, response_mode, session_id),
+                format_output,
+                session_config(session_id),
+            ):
+                yield event
+
+    return session_events()
+
+
+async def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns what a session keeps between turns (the earlier turns, the summary
+    of older ones and the number of stored tool outputs), or None if there is no
+    such session.
+    """
+    snapshot = await session_app(session_store.checkpointer()).aget_state(
+        session_config(session_id)
+    )
+    if not snapshot.values:
+        return None
+    return {
+        "session_id": session_id,
+        "history": [
             {
-                "query": user_prompt,
-                "response": f"Sorry, Auraa could not process your request. {error_msg}",
-                "justification": justification_msg,
-            },
-            indent=2,
-        )
+                "role": "user" if isinstance(message, HumanMessage) else "assistant",
+                "content": message.content,
+            }
+            for message in snapshot.values.get("history", [])
+        ],
+        "summary": snapshot.values.get("history_summary"),
+        "tool_results": len(snapshot.values.get("tool_results") or {}),
+    }
@@ -1,9 +1,21 @@
-import json
-from typing import TypedDict, List
+import asyncio
+import logging
+from typing import AsyncIterator, TypedDict, List, Optional
 from langchain_core.prompts import PromptTemplate
 from langgraph.graph import StateGraph
 from langchain_core.documents import Document
 from config import settings
+from services.corpus_store import CorpusStore
+from services.lazy import lazy
+from services.llm_cache import cached_llm
+from services.metrics import instrument_node
+from services.prompt_budget import fit_snippets
+from services.retrieval import retrieve_context
+from services.singleflight import single_flight
+from services.streaming import stream_graph_events
+from services.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
 
 
 # Define LangGraph State
@@ -14,16 +26,35 @@ class QueryAgentState(TypedDict):
     Attributes:
         query (str): The original user query.
         documents (List[Document]): A list of documents to draw information from.
+        corpus_id (Optional[str]): ID of a registered corpus to retrieve from instead
+            of the uploaded documents.
+        use_retrieval (Optional[bool]): Forces the retrieval stage on or off for this
+            request. None follows settings.QUERY_RETRIEVAL_MODE.
+        context_documents (List[Document]): The documents (or ranked chunks) that
+            are placed into the prompt.
         response (str): The answer derived from the provided documents.
     """
 
     query: str
     documents: List[Document]
+    corpus_id: Optional[str]
+    use_retrieval: Optional[bool]
+    context_documents: List[Document]
     response: str
 
 
-# Initialize LLM
-llm = settings.llm
+class QueryAgentResult(TypedDict):
+    """
+    Output of the query responder agent.
+
+    Attributes:
+        query (str): The original user query.
+        response (str): The answer derived from the documents.
+    """
+
+    query: str
+    response: str
+
 
 # Define Prompt Template
 response_template = """
@@ -41,11 +72,87 @@ response_prompt = PromptTemplate(
     template=response_template, input_variables=["context", "query"]
 )
 
-# Define LangChain Chain
-response_chain = response_prompt | llm
+# Define LangChain Chain (built on first use, see services.lazy)
+@lazy
+def response_chain():
+    return response_prompt | cached_llm(settings.llm, "response")
+
+
+# Server-side store of registered corpora, indexed once at registration time.
+@lazy
+def corpus_store():
+    return CorpusStore(
+        settings.CORPUS_DB_PATH,
+        chunk_tokens=settings.QUERY_CHUNK_TOKENS,
+        overlap_tokens=settings.QUERY_CHUNK_OVERLAP_TOKENS,
+    )
+
+
+def should_retrieve(documents: List[Document], use_retrieval: Optional[bool]) -> bool:
+    """
+    Decides whether the retrieval stage runs. An explicit per-request flag wins;
+    otherwise "auto" mode only retrieves when the documents exceed the context budget.
+    """
+    if use_retrieval is not None:
+        return use_retrieval
+    mode = settings.QUERY_RETRIEVAL_MODE.lower()
+    if mode == "always":
+        return True
+    if mode == "off":
+        return False
+    total_tokens = sum(count_tokens(doc.page_content) for doc in documents)
+    return total_tokens > settings.QUERY_CONTEXT_TOKEN_BUDGET
+
+
+# Define Graph Node Functions
+async def select_context(state: QueryAgentState) -> QueryAgentState:
+    """
+    Optional retrieval stage: chunks the documents, ranks the chunks against the
+    query with BM25 and keeps only the top-k chunks that fit into the context
+    token budget, so prompt size stays bounded as the corpus grows.
+
+    Args:
+        state (QueryAgentState): The current state containing the query and documents.
+
+    Returns:
+        QueryAgentState: The updated state with context_documents.
+    """
+    if state.get("corpus_id"):
+        # SQLite lookups run in a worker thread to keep the event loop free.
+        context_documents = await asyncio.to_thread(
+            corpus_store.search,
+            state["corpus_id"],
+            state["query"],
+            settings.QUERY_RETRIEVAL_TOP_K,
+            settings.QUERY_CONTEXT_TOKEN_BUDGET,
+        )
+        logger.info(
+            "Retrieval kept %d chunks from corpus %s.",
+            len(context_documents),
+            state["corpus_id"],
+        )
+        return {**state, "context_documents": context_documents}
+
+    documents = state["documents"]
+    if not should_retrieve(documents, state.get("use_retrieval")):
+        return {**state, "context_documents": documents}
+
+    # Chunking and BM25 scoring are CPU-bound; run them in a worker thread too.
+    context_documents = await asyncio.to_thread(
+        retrieve_context,
+        state["query"],
+        documents,
+        top_k=settings.QUERY_RETRIEVAL_TOP_K,
+        token_budget=settings.QUERY_CONTEXT_TOKEN_BUDGET,
+        chunk_tokens=settings.QUERY_CHUNK_TOKENS,
+        overlap_tokens=settings.QUERY_CHUNK_OVERLAP_TOKENS,
+    )
+    logger.info(
+        "Retrieval kept %d chunks from %d documents.", len(context_documents), len(documents)
+    )
+    return {**state, "context_documents": context_documents}
 
 
-# Define Graph Node Function
 async def generate_response(state: QueryAgentState) -> QueryAgentState:
     """
     Generates a response to the user query based on the provided documents.
@@ -57,11 +164,14 @@ async def generate_response(state: QueryAgentState) -> QueryAgentState:
         QueryAgentState: The updated state with the generated response.
     """
     user_query = state["query"]
-    documents = state["documents"]
+    documents = state["context_documents"]
 
-    # Concatenate document content to form the context for the LLM.
+    # Concatenate document content to form the context for the LLM, within the
+    # query_context budget (duplicate documents are dropped, the overflow cut).
     # We assume documents are a list of Document objects, each with a 'page_content' attribute.
-    context_text = "\n\n".join([doc.page_content for doc in documents])
+    context_text = "\n\n".join(
+        fit_snippets([doc.page_content for doc in documents], "query_context")
+    )
 
     # Invoke the response chain.
     response_result = await response_chain.ainvoke(
@@ -70,49 +180,138 @@ async def generate_response(state: QueryAgentState) -> QueryAgentState:
     generated_response = response_result.content.strip()
 
     # Update the state with the generated response
-    return {"query": user_query, "documents": documents, "response": generated_response}
+    return {**state, "response": generated_response}
 
 
 # Build the LangGraph Graph
-# Create a StateGraph instance with our defined state.
-query_workflow = StateGraph(QueryAgentState)
+@lazy
+def query_app():
+    """
+    The compiled query responder graph, built on first use.
+    """
+    # Create a StateGraph instance with our defined state.
+    query_workflow = StateGraph(QueryAgentState)
+
+    query_workflow.add_node(
+        "retrieve_node", instrument_node("query", "retrieve_node", select_context)
+    )
+    query_workflow.add_node(
+        "response_node", instrument_node("query", "response_node", generate_response)
+    )
+
+    query_workflow.set_entry_point("retrieve_node")
+    query_workflow.add_edge("retrieve_node", "response_node")
+    query_workflow.set_finish_point("response_node")
+    return query_workflow.compile()
+
 
-query_workflow.add_node("response_node", generate_response)
+def build_initial_state(
+    user_query: str,
+    documents_list: List[str],
+    use_retrieval: Optional[bool] = None,
+    corpus_id: Optional[str] = None,
+) -> QueryAgentState:
+    """
+    Creates the initial graph state for a query over uploaded documents or a
+    registered corpus.
+    """
+    # Convert list of strings to list of LangChain Document objects
+    # This is a common pattern when working with LangChain's document handling.
+    documents = [Document(page_content=doc_str) for doc_str in documents_list]
+    return {
+        "query": user_query,
+        "documents": documents,
+        "corpus_id": corpus_id,
+        "use_retrieval": use_retrieval,
+        "context_documents": [],
+        "response": "",
+    }
 
 
-query_workflow.set_entry_point("response_node")
-query_workflow.set_finish_point("response_node")
-query_app = query_workflow.compile()
+def format_output(final_state: QueryAgentState) -> QueryAgentResult:
+    """
+    Extracts the agent output (query and answer) from the final graph state.
+    """
+    return {"query": final_state["query"], "response": final_state["response"]}
 
 
 # Agent Invocation Function
-async def run_query_responder_agent(user_query: str, documents_list: List[str]) -> str:
+# Identical questions about the same documents asked at the same time share one run.
+@single_flight("query_responder")
+async def run_query_responder_agent(
+    user_query: str, documents_list: List[str], use_retrieval: Optional[bool] = None
+) -> QueryAgentResult:
     """
     Runs the query responder agent.
 
     Args:
         user_query (str): The user's question.
         documents_list (List[str]): A list of document strings to use as context.
+        use_retrieval (Optional[bool]): Forces the BM25 retrieval stage on or off.
+            None follows settings.QUERY_RETRIEVAL_MODE.
 
     Returns:
-        str: A JSON string containing the original query and the derived response.
+        QueryAgentResult: The original query and the derived response.
     """
-    # Convert list of strings to list of LangChain Document objects
-    # This is a common pattern when working with LangChain's document handling.
-    documents = [Document(page_content=doc_str) for doc_str in documents_list]
+    # Invoke the compiled graph.
+    final_state = await query_app.ainvoke(
+        build_initial_state(user_query, documents_list, use_retrieval)
+    )
 
-    # Initial state for the graph.
-    initial_state = {"query": user_query, "documents": documents, "response": ""}
+    return format_output(final_state)
 
-    # Invoke the compiled graph.
-    final_state = None
-    async for s in query_app.astream(initial_state):
-        final_state = s
 
-    # Extract the results from the final state.
-    final_query = final_state["response_node"]["query"]
-    final_response = final_state["response_node"]["response"]
+def stream_query_responder_agent(
+    user_query: str, documents_list: List[str], use_retrieval: Optional[bool] = None
+) -> AsyncIterator[dict]:
+    """
+    Runs the query responder agent and yields LLM tokens and node progress events
+    as they are produced, followed by the final result.
+
+    Args:
+        user_query (str): The user's question.
+        documents_list (List[str]): A list of document strings to use as context.
+        use_retrieval (Optional[bool]): Forces the BM25 retrieval stage on or off.
+
+    Returns:
+        AsyncIterator[dict]: Stream events (see services.streaming.stream_graph_events).
+    """
+    return stream_graph_events(
+        query_app,
+        build_initial_state(user_query, documents_list, use_retrieval),
+        format_output,
+    )
+
+
+async def register_corpus(documents_list: List[str]) -> dict:
+    """
+    Registers a list of documents as a corpus: chunks, tokenizes and indexes
+    them once so they can be queried by ID.
+
+    Args:
+        documents_list (List[str]): The documents of the corpus.
+
+    Returns:
+        dict: The corpus metadata, including 'corpus_id', 'document_count' and 'chunk_count'.
+    """
+    return await asyncio.to_thread(corpus_store.add_corpus, documents_list)
+
+
+async def run_corpus_query_agent(user_query: str, corpus_id: str) -> QueryAgentResult:
+    """
+    Runs the query responder agent against a registered corpus.
+
+    Args:
+        user_query (str): The user's question.
+        corpus_id (str): The ID returned when the corpus was registered.
+
+    Returns:
+        QueryAgentResult: The original query and the derived response.
 
-    # Format the output as a JSON string.
-    output_json = {"query": final_query, "response": final_response}
-    return json.dumps(output_json, indent=2)
+    Raises:
+        CorpusNotFoundError: If the corpus ID is unknown.
+    """
+    final_state = await query_app.ainvoke(
+        build_initial_state(user_query, [], corpus_id=corpus_id)
+    )
+    return format_output(final_state)
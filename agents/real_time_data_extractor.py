@@ -1,15 +1,30 @@
-# import asyncio
-import json
+import asyncio
+import logging
 import os  # Import os to access environment variables
-from typing import TypedDict, Optional
+import re
+import time
+import unicodedata
+from typing import AsyncIterator, TypedDict, Optional
 from langchain_core.prompts import PromptTemplate
 
 # from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph
-from langchain_tavily import TavilySearch
 from config import settings
+from services.cache import build_cache
+from services.lazy import lazy
+from services.llm_cache import cached_llm
+from services.metrics import (
+    current_route,
+    instrument_node,
+    search_cache_lookups,
+    search_request_duration,
+)
+from services.prompt_budget import fit_snippets
+from services.singleflight import single_flight
+from services.streaming import stream_graph_events
+
+logger = logging.getLogger(__name__)
 
-llm = settings.llm  # Use the LLM instance from the settings
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
 
@@ -29,8 +44,37 @@ class InternetAgentState(TypedDict):
     source: Optional[str]
 
 
-# Initialize the Tavily search tool.
-tavily_tool = TavilySearch(max_results=5)  # Limit to 5 search results for conciseness
+class InternetAgentResult(TypedDict):
+    """
+    Output of the internet-connected agent.
+
+    Attributes:
+        query (str): The original user query.
+        response (str): The real-time answer fetched from the internet.
+        source (Optional[str]): URL or source of the fetched information.
+    """
+
+    query: str
+    response: str
+    source: Optional[str]
+
+
+# Initialize the search tool (on first use, see services.lazy). Tavily by
+# default; settings.SEARCH_PROVIDER can swap in a local fake.
+@lazy
+def search_tool():
+    return settings.search_tool
+
+# Cache of raw search results keyed by normalized query, so repeated questions
+# within SEARCH_CACHE_TTL_SECONDS do not trigger a new Tavily call.
+search_cache = build_cache(
+    name="search",
+    backend=settings.SEARCH_CACHE_BACKEND,
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SEARCH_CACHE_MAX_BYTES,
+    sqlite_path=settings.SEARCH_CACHE_PATH,
+)
 
 # Define Prompt Template
 response_template_internet = """
@@ -49,8 +93,69 @@ response_prompt_internet = PromptTemplate(
     template=response_template_internet, input_variables=["search_results", "query"]
 )
 
-# Define LangChain Chain
-response_chain_internet = response_prompt_internet | llm
+# Define LangChain Chain (built on first use, see services.lazy)
+@lazy
+def response_chain_internet():
+    return response_prompt_internet | cached_llm(settings.llm, "response_internet")
+
+
+def normalize_query(user_query: str) -> str:
+    """
+    Normalizes a search query for use as a cache key: Unicode-normalized,
+    case-folded, with collapsed whitespace and trailing punctuation removed, so
+    that near-identical queries share one cache entry.
+    """
+    normalized = unicodedata.normalize("NFKC", user_query).casefold()
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return normalized.rstrip(" ?!.")
+
+
+async def search_web(user_query: str) -> dict:
+    """
+    Runs the Tavily search through the tool's async API so the event loop is never
+    blocked on the HTTP round-trip. The call is cancelled if it takes longer than
+    TAVILY_TIMEOUT_SECONDS, or if the calling request is cancelled. Successful
+    results are served from search_cache when the same normalized query was
+    searched recently. Cache lookups run in a worker thread, since the cache may
+    be backed by a SQLite file.
+
+    Args:
+        user_query (str): The query to search for.
+
+    Returns:
+        dict: The raw Tavily response, with the hits under 'results'.
+    """
+    cache_key = normalize_query(user_query)
+    if search_cache is not None:
+        cached_results = await asyncio.to_thread(search_cache.get, cache_key)
+        if cached_results is not None:
+            logger.debug("Search cache hit for '%s'", cache_key)
+            search_cache_lookups.labels("hit").inc()
+            return cached_results
+        search_cache_lookups.labels("miss").inc()
+
+    started = time.perf_counter()
+    status = "error"
+    try:
+        search_results = await asyncio.wait_for(
+            search_tool.ainvoke({"query": user_query}),
+            timeout=settings.TAVILY_TIMEOUT_SECONDS,
+        )
+        status = "ok" if search_results.get("results") else "empty"
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise TimeoutError(
+            f"Internet search timed out after {settings.TAVILY_TIMEOUT_SECONDS}s."
+        )
+    finally:
+        search_request_duration.labels(current_route.get(), status).observe(
+            time.perf_counter() - started
+        )
+
+    # Only cache successful searches; the tool reports API failures as {"error": ...}.
+    if search_cache is not None and search_results.get("results"):
+        await asyncio.to_thread(search_cache.set, cache_key, search_results)
+    return search_results
 
 
 # Define Graph Node Function
@@ -68,19 +173,23 @@ async def fetch_and_respond(state: InternetAgentState) -> InternetAgentState:
 
     # Perform the web search using the Tavily tool.
     # The output of TavilySearchResults is a list of dictionaries.
-    search_results = tavily_tool.invoke({"query": user_query})
+    search_results = await search_web(user_query)
     results_list = search_results.get("results", [])
 
     # We'll concatenate snippets and try to get a primary source URL.
     context_for_llm = ""
     source_url = None
     if results_list:
-        # Concatenate snippets from search results
+        # Concatenate snippets from search results, best ranked first, within the
+        # search_results budget.
         context_for_llm = "\n\n".join(
-            [
-                f"Title: {res.get('title', 'N/A')}\nURL: {res.get('url', 'N/A')}\nSnippet: {res.get('content', 'N/A')}"
-                for res in results_list
-            ]
+            fit_snippets(
+                [
+                    f"Title: {res.get('title', 'N/A')}\nURL: {res.get('url', 'N/A')}\nSnippet: {res.get('content', 'N/A')}"
+                    for res in results_list
+                ],
+                "search_results",
+            )
         )
         # Try to get the URL of the first result as the primary source
         if results_list[0].get("url"):
@@ -100,17 +209,52 @@ async def fetch_and_respond(state: InternetAgentState) -> InternetAgentState:
 
 
 # Build the LangGraph Graph
-internet_workflow = StateGraph(InternetAgentState)
+@lazy
+def internet_app():
+    """
+    The compiled internet agent graph, built on first use.
+    """
+    internet_workflow = StateGraph(InternetAgentState)
+
+    internet_workflow.add_node(
+        "internet_search_node",
+        instrument_node("internet", "internet_search_node", fetch_and_respond),
+    )
+    internet_workflow.set_entry_point("internet_search_node")
+    internet_workflow.set_finish_point("internet_search_node")
+    return internet_workflow.compile()
 
 
-internet_workflow.add_node("internet_search_node", fetch_and_respond)
-internet_workflow.set_entry_point("internet_search_node")
-internet_workflow.set_finish_point("internet_search_node")
-internet_app = internet_workflow.compile()
+def build_initial_state(user_query: str) -> InternetAgentState:
+    """
+    Creates the initial graph state for a query.
+    """
+    return {"query": user_query, "response": "", "source": None}
+
+
+def format_output(final_state: InternetAgentState) -> InternetAgentResult:
+    """
+    Extracts the agent output (query, answer and source) from the final graph state.
+    """
+    return {
+        "query": final_state["query"],
+        "response": final_state["response"],
+        "source": final_state["source"],
+    }
+
+
+def stamp_query(result: InternetAgentResult, user_query: str) -> InternetAgentResult:
+    """
+    Reports a coalesced run under the caller's own wording of the query.
+    """
+    result["query"] = user_query
+    return result
 
 
 # Agent Invocation Function
-async def run_internet_agent(user_query: str) -> str:
+# Identical questions asked at the same time (same normalized query) share one run.
+@single_flight("internet", key=normalize_query, stamp=stamp_query)
+async def run_internet_agent(user_query: str) -> InternetAgentResult:
     """
     Runs the internet-connected agent to fetch real-time information.
 
@@ -118,25 +262,24 @@ async def run_internet_agent(user_query: str) -> str:
         user_query (str): The user's question.
 
     Returns:
-        str: A JSON string containing the original query, the real-time answer, and the source.
+        InternetAgentResult: The original query, the real-time answer and the source.
     """
-    # Initial state for the graph.
-    initial_state = {"query": user_query, "response": "", "source": None}
-
     # Invoke the compiled graph.
-    final_state = None
-    async for s in internet_app.astream(initial_state):
-        final_state = s
-
-    # Extract the results from the final state.
-    final_query = final_state["internet_search_node"]["query"]
-    final_response = final_state["internet_search_node"]["response"]
-    final_source = final_state["internet_search_node"]["source"]
-
-    # Format the output as a JSON string.
-    output_json = {
-        "query": final_query,
-        "response": final_response,
-        "source": final_source,
-    }
-    return json.dumps(output_json, indent=2)
+    final_state = await internet_app.ainvoke(build_initial_state(user_query))
+    return format_output(final_state)
+
+
+def stream_internet_agent(user_query: str) -> AsyncIterator[dict]:
+    """
+    Runs the internet-connected agent and yields LLM tokens and node progress
+    events as they are produced, followed by the final result.
+
+    Args:
+        user_query (str): The user's question.
+
+    Returns:
+        AsyncIterator[dict]: Stream events (see services.streaming.stream_graph_events).
+    """
+    return stream_graph_events(
+        internet_app, build_initial_state(user_query), format_output
+    )
@@ -0,0 +1,101 @@
+"""
+Request coalescing (single-flight) benchmark.
+
+Sends bursts of identical concurrent requests to /agent3/search_internet,
+/agent1/summarize and /process_query, in-process, with the fake LLM and search
+(services/fakes.py) and the search and LLM caches disabled, once with
+SINGLE_FLIGHT_ENABLED off and once on. Reports the upstream search and LLM calls
+each burst caused, so the reduction from coalescing is visible.
+
+Run from the repository root:
+    python -m benchmarks.coalescing --burst 50 --distinct 2 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+PAYLOADS = {
+    "/agent3/search_internet": lambda i: {"user_query": f"Latest news on event {i}?"},
+    "/agent1/summarize": lambda i: {
+        "document_content": f"Breaking report {i}. " + "The situation is developing quickly. " * 40
+    },
+    "/process_query": lambda i: {
+        "user_prompt": f"What is the latest news on event {i}?",
+        "response_mode": "fast",
+    },
+}
+
+
+def configure_environment(latency: float) -> None:
+    """
+    Must run before config is imported: settings are read at import time.
+    """
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["SEARCH_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = str(latency)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = "0"
+    os.environ["FAKE_SEARCH_LATENCY"] = str(latency)
+    # Only overlapping requests should share work, so nothing is cached.
+    os.environ["SEARCH_CACHE_BACKEND"] = "none"
+    os.environ["LLM_CACHE_BACKEND"] = "none"
+    os.environ["ROUTING_CACHE_BACKEND"] = "none"
+    os.environ["PREROUTER_SHADOW_RATE"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+async def run_burst(client, path: str, burst: int, distinct: int) -> list:
+    async def call(i: int) -> float:
+        started = time.perf_counter()
+        response = await client.post(path, json=PAYLOADS[path](i % distinct))
+        response.raise_for_status()
+        return (time.perf_counter() - started) * 1000
+
+    return await asyncio.gather(*(call(i) for i in range(burst)))
+
+
+async def run_benchmark(burst: int, distinct: int) -> None:
+    import httpx
+    from config import settings
+    from main import app
+
+    llm, search = settings.llm, settings.search_tool
+
+    print(f"Bursts of {burst} requests over {distinct} distinct payload(s)")
+    print(
+        f"{'endpoint':26s} {'single_flight':>13} {'search_calls':>12} {'llm_calls':>9}"
+        f" {'p50_ms':>8} {'max_ms':>8}"
+    )
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            for path in PAYLOADS:
+                for enabled in (False, True):
+                    settings.SINGLE_FLIGHT_ENABLED = enabled
+                    search_calls, llm_calls = search.calls, llm.calls
+                    latencies = await run_burst(client, path, burst, distinct)
+                    print(
+                        f"{path:26s} {'on' if enabled else 'off':>13}"
+                        f" {search.calls - search_calls:>12} {llm.calls - llm_calls:>9}"
+                        f" {statistics.median(latencies):>8.1f} {max(latencies):>8.1f}"
+                    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--burst", type=int, default=50, help="Concurrent requests per burst.")
+    parser.add_argument("--distinct", type=int, default=1, help="Distinct payloads per burst.")
+    parser.add_argument(
+        "--latency", type=float, default=0.3, help="Fake LLM and search latency in seconds."
+    )
+    args = parser.parse_args()
+    configure_environment(args.latency)
+    asyncio.run(run_benchmark(args.burst, args.distinct))
+
+
+if __name__ == "__main__":
+    main()
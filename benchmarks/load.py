@@ -0,0 +1,491 @@
+"""
+End-to-end load benchmark for the HTTP API.
+
+Replays a request mix against /process_query, /agent1/summarize,
+/agent2/respond_to_query and /agent3/search_internet with a fixed number of
+concurrent callers, either in-process (httpx ASGITransport, one event loop for
+client and server) or over loopback against `uvicorn main:app --workers N`. The
+LLM and the search use the fake providers (services/fakes.py) unless
+--real-providers is given, so results do not depend on API quota.
+
+Reports throughput and p50/p95/p99 latency per endpoint, plus event-loop lag
+(auraa_event_loop_lag_seconds) and resident memory of every server worker,
+scraped from /metrics before and after the run. Results are written as JSON;
+--compare prints the change against an earlier results file.
+
+The mix is synthetic (payloads from the README examples, weighted with --mix)
+unless --mix-file points to a recording: a JSON Lines file with one
+{"path": "/agent1/summarize", "body": {...}} object per request.
+
+Run from the repository root:
+    python -m benchmarks.load --transport asgi --concurrency 32 --duration 30
+    python -m benchmarks.load --transport loopback --workers 2 --compare old.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+ENDPOINTS = {
+    "process_query": "/process_query",
+    "summarize": "/agent1/summarize",
+    "respond_to_query": "/agent2/respond_to_query",
+    "search_internet": "/agent3/search_internet",
+}
+
+DOCUMENT = (
+    "Artificial intelligence (AI) is intelligence demonstrated by machines, unlike the "
+    "natural intelligence displayed by humans and animals. Leading AI textbooks define "
+    "the field as the study of 'intelligent agents': any device that perceives its "
+    "environment and takes actions that maximize its chance of successfully achieving "
+    "its goals. AI applications include advanced web search engines, recommendation "
+    "systems, understanding human speech, self-driving cars and generative AI."
+)
+DOCUMENTS = [
+    "The capital of France is Paris. Paris is known for the Eiffel Tower.",
+    "Tokyo is the capital of Japan and is famous for its cherry blossoms.",
+    "The Amazon River is the largest river by discharge volume of water in the world.",
+]
+QUESTIONS = [
+    "what is the capital of france?",
+    "What is Tokyo famous for?",
+    "Which river has the largest discharge?",
+]
+SEARCHES = [
+    "What's the weather report in hyderabad ?",
+    "what is the match result of india vs england test ?",
+    "latest news on renewable energy",
+]
+
+DEFAULT_MIX = "process_query=4,summarize=2,respond_to_query=2,search_internet=2"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def synthetic_request(endpoint: str, i: int, unique: bool) -> dict:
+    """
+    Builds the i-th payload for an endpoint. With `unique`, every payload is
+    distinct so no request is answered from the search or LLM caches.
+    """
+    suffix = f" (request {i})" if unique else ""
+    pick = i % 3
+    if endpoint == "process_query":
+        prompt = [
+            f"Summarize the given document and extract keywords. {DOCUMENT}",
+            "Answer this question based on the following context: "
+            f"{' '.join(DOCUMENTS)} Question: {QUESTIONS[1]}",
+            SEARCHES[0],
+        ][pick]
+        body = {"user_prompt": prompt + suffix}
+    elif endpoint == "summarize":
+        body = {"document_content": DOCUMENT + suffix}
+    elif endpoint == "respond_to_query":
+        body = {"user_query": QUESTIONS[pick] + suffix, "documents_list": DOCUMENTS}
+    else:
+        body = {"user_query": SEARCHES[pick] + suffix}
+    return {"path": ENDPOINTS[endpoint], "body": body}
+
+
+def synthetic_mix(weights: Dict[str, int], unique: bool, seed: int):
+    """
+    Yields requests forever, choosing endpoints at random in proportion to `weights`.
+    """
+    rng = random.Random(seed)
+    names = list(weights)
+    counts = [weights[name] for name in names]
+    i = 0
+    while True:
+        yield synthetic_request(rng.choices(names, counts)[0], i, unique)
+        i += 1
+
+
+def recorded_mix(path: str):
+    """
+    Yields the requests of a JSON Lines recording in order, starting over at the end.
+    """
+    with open(path, encoding="utf-8") as recording:
+        requests = [json.loads(line) for line in recording if line.strip()]
+    if not requests:
+        raise ValueError(f"No requests in {path}.")
+    while True:
+        yield from requests
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    weights = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}'; expected one of {list(ENDPOINTS)}.")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+def configure_environment(args) -> None:
+    """
+    Must run before config is imported (in-process) or before the server is
+    started (loopback): settings are read at import time.
+    """
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+    if not args.real_providers:
+        os.environ["LLM_PROVIDER"] = "fake"
+        os.environ["SEARCH_PROVIDER"] = "fake"
+        os.environ.setdefault("FAKE_SEED", str(args.seed))
+        if args.llm_latency is not None:
+            os.environ["FAKE_LLM_LATENCY"] = args.llm_latency
+        if args.search_latency is not None:
+            os.environ["FAKE_SEARCH_LATENCY"] = args.search_latency
+    if args.no_cache:
+        os.environ["SEARCH_CACHE_BACKEND"] = "none"
+        os.environ["LLM_CACHE_BACKEND"] = "none"
+
+
+def parse_scrape(text: str) -> dict:
+    """
+    Extracts the worker identity, resident memory and event-loop lag histogram
+    from a /metrics response.
+    """
+    from prometheus_client.parser import text_string_to_metric_families
+
+    snapshot = {
+        "pid": None,
+        "rss_bytes": None,
+        "lag_buckets": {},
+        "lag_count": 0.0,
+        "lag_sum": 0.0,
+    }
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "auraa_worker_info":
+                snapshot["pid"] = sample.labels["pid"]
+            elif sample.name == "process_resident_memory_bytes":
+                snapshot["rss_bytes"] = sample.value
+            elif sample.name == "auraa_event_loop_lag_seconds_bucket":
+                snapshot["lag_buckets"][float(sample.labels["le"])] = sample.value
+            elif sample.name == "auraa_event_loop_lag_seconds_count":
+                snapshot["lag_count"] = sample.value
+            elif sample.name == "auraa_event_loop_lag_seconds_sum":
+                snapshot["lag_sum"] = sample.value
+    return snapshot
+
+
+async def scrape_workers(client, workers: int) -> Dict[str, dict]:
+    """
+    Scrapes /metrics until every worker has answered at least once (or gives up),
+    keyed by worker pid. Each scrape closes its connection so that the next one
+    can be accepted by a different worker.
+    """
+    snapshots: Dict[str, dict] = {}
+    for _ in range(workers * 20):
+        response = await client.get("/metrics", headers={"Connection": "close"})
+        snapshot = parse_scrape(response.text)
+        snapshots[snapshot["pid"]] = snapshot
+        if len(snapshots) >= workers:
+            break
+    return snapshots
+
+
+def lag_quantile(buckets: Dict[float, float], count: float, fraction: float) -> Optional[float]:
+    """
+    Upper bound of the histogram bucket holding the given quantile.
+    """
+    if count <= 0:
+        return None
+    for bound in sorted(buckets):
+        if buckets[bound] >= fraction * count:
+            return bound
+    return None
+
+
+def worker_report(before: Dict[str, dict], after: Dict[str, dict]) -> List[dict]:
+    report = []
+    for pid, last in sorted(after.items()):
+        first = before.get(pid)
+        count = last["lag_count"] - (first["lag_count"] if first else 0)
+        total = last["lag_sum"] - (first["lag_sum"] if first else 0)
+        buckets = {
+            bound: value - (first["lag_buckets"].get(bound, 0) if first else 0)
+            for bound, value in last["lag_buckets"].items()
+        }
+        p99 = lag_quantile(buckets, count, 0.99)
+        report.append(
+            {
+                "pid": pid,
+                "rss_mb_before": round(first["rss_bytes"] / 2**20, 1)
+                if first and first["rss_bytes"]
+                else None,
+                "rss_mb_after": round(last["rss_bytes"] / 2**20, 1) if last["rss_bytes"] else None,
+                "event_loop_lag": {
+                    "probes": int(count),
+                    "mean_ms": round(total / count * 1000, 2) if count else None,
+                    "p99_ms_upper_bound": p99 * 1000 if p99 is not None else None,
+                },
+            }
+        )
+    return report
+
+
+def latency_summary(samples: List[float], errors: int, elapsed: float) -> dict:
+    summary = {
+        "requests": len(samples) + errors,
+        "errors": errors,
+        "throughput_rps": round((len(samples) + errors) / elapsed, 2) if elapsed else 0.0,
+    }
+    if samples:
+        summary.update(
+            {
+                "p50_ms": round(percentile(samples, 0.50), 2),
+                "p95_ms": round(percentile(samples, 0.95), 2),
+                "p99_ms": round(percentile(samples, 0.99), 2),
+                "mean_ms": round(statistics.fmean(samples), 2),
+                "max_ms": round(max(samples), 2),
+            }
+        )
+    return summary
+
+
+async def drive(client, requests, concurrency: int, total: Optional[int], duration: Optional[float]):
+    """
+    Runs `concurrency` closed-loop callers, each sending its next request as soon
+    as the previous one finishes, until `total` requests were sent or `duration`
+    seconds have passed.
+
+    Returns:
+        tuple: ({path: [latency_ms]}, {path: error_count}, elapsed seconds).
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    sent = 0
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    async def caller() -> None:
+        nonlocal sent
+        while True:
+            if total is not None and sent >= total:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            sent += 1
+            request = next(requests)
+            request_started = time.perf_counter()
+            try:
+                response = await client.post(request["path"], json=request["body"])
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            if ok:
+                latencies[request["path"]].append((time.perf_counter() - request_started) * 1000)
+            else:
+                errors[request["path"]] += 1
+
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_load(client, args, workers: int) -> dict:
+    if args.mix_file:
+        requests = recorded_mix(args.mix_file)
+    else:
+        requests = synthetic_mix(parse_mix(args.mix), args.unique, args.seed)
+
+    if args.warmup:
+        await drive(client, requests, min(args.concurrency, args.warmup), args.warmup, None)
+
+    before = await scrape_workers(client, workers)
+    latencies, errors, elapsed = await drive(
+        client, requests, args.concurrency, args.requests, args.duration
+    )
+    after = await scrape_workers(client, workers)
+
+    all_samples = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "overall": latency_summary(all_samples, sum(errors.values()), elapsed),
+        "endpoints": {
+            path: latency_summary(latencies.get(path, []), errors.get(path, 0), elapsed)
+            for path in sorted(set(latencies) | set(errors))
+        },
+        "workers": worker_report(before, after),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+async def run_in_process(args) -> dict:
+    import httpx
+    from main import app
+
+    # ASGITransport does not run the lifespan, so enter it here (pre-warm, lag probe).
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            return await run_load(client, args, workers=1)
+
+
+async def run_loopback(args) -> dict:
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        env=dict(os.environ),
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits
+        ) as client:
+            deadline = time.perf_counter() + 120
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError("The server exited during start-up.")
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("The server did not start within 120s.")
+                await asyncio.sleep(0.2)
+            return await run_load(client, args, workers=args.workers)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict) -> None:
+    print(
+        f"{'endpoint':28s} {'requests':>8} {'errors':>6} {'req/s':>8}"
+        f" {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}"
+    )
+    rows = list(results["endpoints"].items()) + [("overall", results["overall"])]
+    for name, summary in rows:
+        print(
+            f"{name:28s} {summary['requests']:>8} {summary['errors']:>6}"
+            f" {summary['throughput_rps']:>8.1f} {summary.get('p50_ms', 0):>9.1f}"
+            f" {summary.get('p95_ms', 0):>9.1f} {summary.get('p99_ms', 0):>9.1f}"
+        )
+    for worker in results["workers"]:
+        lag = worker["event_loop_lag"]
+        print(
+            f"worker {worker['pid']}: rss {worker['rss_mb_before']} -> {worker['rss_mb_after']} MB,"
+            f" event-loop lag mean {lag['mean_ms']} ms, p99 <= {lag['p99_ms_upper_bound']} ms"
+            f" ({lag['probes']} probes)"
+        )
+
+
+def print_comparison(baseline: dict, results: dict) -> None:
+    print(f"\nChange against {baseline.get('commit') or 'baseline'} ({baseline['timestamp']})")
+    rows = list(results["endpoints"].items()) + [("overall", results["overall"])]
+    for name, summary in rows:
+        old = baseline["endpoints"].get(name) if name != "overall" else baseline["overall"]
+        if not old:
+            continue
+        changes = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if old.get(key) and summary.get(key) is not None:
+                changes.append(f"{key} {100 * (summary[key] / old[key] - 1):+.1f}%")
+        print(f"  {name:28s} {', '.join(changes)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transport", choices=["asgi", "loopback"], default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (loopback).")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests.")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds.")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests sent first.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Synthetic endpoint weights.")
+    parser.add_argument("--mix-file", default=None, help="JSON Lines recording to replay.")
+    parser.add_argument(
+        "--unique", action="store_true", help="Make every synthetic payload distinct (no cache hits)."
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Disable the search and LLM caches.")
+    parser.add_argument("--llm-latency", default=None, help="FAKE_LLM_LATENCY for this run.")
+    parser.add_argument("--search-latency", default=None, help="FAKE_SEARCH_LATENCY for this run.")
+    parser.add_argument(
+        "--real-providers", action="store_true", help="Call OpenAI and Tavily instead of the fakes."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Results file (default benchmarks/results/).")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against.")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 200
+
+    configure_environment(args)
+    if args.transport == "asgi":
+        results = asyncio.run(run_in_process(args))
+    else:
+        results = asyncio.run(run_loopback(args))
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {
+            **vars(args),
+            "providers": {
+                name: os.environ.get(name)
+                for name in (
+                    "LLM_PROVIDER", "SEARCH_PROVIDER", "FAKE_LLM_LATENCY",
+                    "FAKE_SEARCH_LATENCY", "LLM_CACHE_BACKEND", "SEARCH_CACHE_BACKEND",
+                )
+            },
+        },
+        **results,
+    }
+    print_results(results)
+
+    output = args.output or os.path.join(
+        "benchmarks",
+        "results",
+        f"load-{args.transport}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            print_comparison(json.load(baseline_file), results)
+
+
+if __name__ == "__main__":
+    main()
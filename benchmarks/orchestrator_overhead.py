@@ -0,0 +1,101 @@
+"""
+Micro-benchmark of the orchestrator's non-LLM hot path.
+
+Replaces the LLM with an instant fake chat model and the internet search with
+canned results, then runs /process_query-equivalent orchestrations in a loop and
+reports the per-request overhead of routing, tool execution, sub-agent graphs and
+response formatting. With --max-p50-ms it exits non-zero when the median exceeds
+the given budget, so it can guard against regressions in CI.
+
+Run from the repository root:
+    python -m benchmarks.orchestrator_overhead --iterations 500
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+PROMPTS = [
+    "Summarize the given document and extract keywords. AI is intelligence demonstrated by machines.",
+    "Answer this question based on the following context: Paris is the capital of France. Question: What is the capital of France?",
+    "What is the latest news on AI?",
+]
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def configure_environment() -> None:
+    """
+    Must run before config is imported: settings are read at import time.
+    """
+    os.environ["SEARCH_CACHE_BACKEND"] = "none"
+    os.environ["LLM_CACHE_BACKEND"] = "none"
+    # Instant local stand-ins for the LLM and the search (services/fakes.py).
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["SEARCH_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = "0"
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = "0"
+    os.environ["FAKE_SEARCH_LATENCY"] = "0"
+
+
+async def run_benchmark(iterations: int, response_mode: str):
+    from agents.main_agent import run_main_agent_orchestrator
+
+    # Warm up lazily initialized code paths before measuring.
+    for prompt in PROMPTS:
+        await run_main_agent_orchestrator(prompt, response_mode)
+
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        await run_main_agent_orchestrator(PROMPTS[i % len(PROMPTS)], response_mode)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--mode", choices=["rewrite", "fast"], default="rewrite")
+    parser.add_argument(
+        "--max-p50-ms",
+        type=float,
+        default=None,
+        help="Fail if the median per-request overhead exceeds this many milliseconds.",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Log at DEBUG level, including payloads."
+    )
+    args = parser.parse_args()
+
+    configure_environment()
+    # Log through the service's queue-based handler, as in production. Set
+    # LOG_LEVEL=INFO to include the cost of the default request logging.
+    os.environ.setdefault("LOG_LEVEL", "DEBUG" if args.verbose else "WARNING")
+    from services.log import setup_logging, shutdown_logging
+
+    setup_logging()
+    try:
+        samples = asyncio.run(run_benchmark(args.iterations, args.mode))
+    finally:
+        shutdown_logging()
+
+    p50 = statistics.median(samples)
+    print(f"Orchestrator overhead ({args.mode} mode, {args.iterations} requests, LLM stubbed)")
+    print(f"  mean {statistics.fmean(samples):.3f} ms")
+    print(f"  p50  {p50:.3f} ms")
+    print(f"  p95  {percentile(samples, 0.95):.3f} ms")
+    print(f"  p99  {percentile(samples, 0.99):.3f} ms")
+    if args.max_p50_ms is not None and p50 > args.max_p50_ms:
+        print(f"FAIL: p50 {p50:.3f} ms exceeds budget {args.max_p50_ms:.3f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
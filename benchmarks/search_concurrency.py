@@ -0,0 +1,130 @@
+"""
+Concurrency benchmark for /agent3/search_internet.
+
+Starts a local fake Tavily server with a fixed response latency, points the
+search tool at it, stubs the LLM with a fake chat model, and drives the FastAPI
+app in-process with an increasing number of concurrent callers. With a
+non-blocking search path, throughput should scale roughly linearly with the
+number of callers until the fake server's latency is the only cost.
+
+Run from the repository root:
+    python -m benchmarks.search_concurrency --latency 0.2 --requests 64
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Dict, Tuple
+
+import uvicorn
+from fastapi import Body, FastAPI
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_fake_search_server(
+    port: int, latency: float
+) -> Tuple[uvicorn.Server, asyncio.Task]:
+    """
+    Serves a minimal Tavily-compatible /search endpoint that sleeps for `latency`
+    seconds before returning canned results.
+    """
+    fake_app = FastAPI()
+
+    @fake_app.post("/search")
+    async def search(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+        await asyncio.sleep(latency)
+        return {
+            "query": payload.get("query", ""),
+            "results": [
+                {
+                    "title": f"Result {i}",
+                    "url": f"https://example.com/{i}",
+                    "content": f"Fake snippet {i} for {payload.get('query', '')}",
+                }
+                for i in range(5)
+            ],
+        }
+
+    server = uvicorn.Server(
+        uvicorn.Config(
+            fake_app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"
+        )
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # Raises the startup error.
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+async def run_benchmark(latency: float, total_requests: int, levels) -> None:
+    port = _free_port()
+    os.environ["TAVILY_API_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    # Every request must reach the fake server, so the caches are disabled.
+    os.environ["SEARCH_CACHE_BACKEND"] = "none"
+    os.environ["LLM_CACHE_BACKEND"] = "none"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Instant fake LLM; the search goes through the real Tavily client.
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = "0"
+    os.environ["SEARCH_PROVIDER"] = "tavily"
+
+    # Import after the environment is set so the search tool picks up the fake server.
+
+    import httpx
+    from main import app
+
+    server, server_task = await start_fake_search_server(port, latency)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+
+            async def call(i: int) -> None:
+                response = await client.post(
+                    "/agent3/search_internet", json={"user_query": f"query {i}"}
+                )
+                response.raise_for_status()
+
+            print(f"Fake search latency: {latency:.3f}s, requests per level: {total_requests}")
+            print(f"{'concurrency':>12} {'elapsed_s':>10} {'req_per_s':>10}")
+            for concurrency in levels:
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def bounded(i: int) -> None:
+                    async with semaphore:
+                        await call(i)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(bounded(i) for i in range(total_requests)))
+                elapsed = time.perf_counter() - started
+                print(f"{concurrency:>12} {elapsed:>10.3f} {total_requests / elapsed:>10.1f}")
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake search latency in seconds.")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level.")
+    parser.add_argument(
+        "--levels", type=int, nargs="+", default=[1, 4, 16, 64], help="Concurrency levels to run."
+    )
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.latency, args.requests, args.levels))
+
+
+if __name__ == "__main__":
+    main()
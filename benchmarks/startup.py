@@ -0,0 +1,130 @@
+"""
+Worker start-up benchmark.
+
+Imports the application (`main`) in fresh interpreters with `-X importtime` and
+reports the total import time and the slowest modules, then times the lifespan
+pre-warm step (building the LLM client, chains and graphs) separately. Import
+time is what a new worker pays before it can accept connections; pre-warm is
+paid before (STARTUP_PREWARM=startup) or after (background) that.
+
+Run from the repository root:
+    python -m benchmarks.startup --runs 5 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# Modules of this repository; everything else is reported as a dependency.
+PROJECT_PREFIXES = ("main", "config", "routes", "agents", "services")
+
+PREWARM_SNIPPET = """
+import time
+import main
+started = time.perf_counter()
+main.prewarm()
+print(f"PREWARM {time.perf_counter() - started:.6f}")
+"""
+
+
+def _environment() -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    env.setdefault("TAVILY_API_KEY", "benchmark")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def import_times() -> dict:
+    """
+    Imports main in a new interpreter and returns {module: (self_us, cumulative_us)}.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True,
+        text=True,
+        env=_environment(),
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def prewarm_seconds() -> float:
+    completed = subprocess.run(
+        [sys.executable, "-c", PREWARM_SNIPPET],
+        capture_output=True,
+        text=True,
+        env=_environment(),
+        check=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("PREWARM "):
+            return float(line.split()[1])
+    raise RuntimeError(f"Pre-warm did not report a time: {completed.stderr}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Modules to list.")
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=None,
+        help="Fail if the median import time of main exceeds this many milliseconds.",
+    )
+    args = parser.parse_args()
+
+    totals = []
+    self_times = defaultdict(list)
+    cumulative_times = defaultdict(list)
+    for _ in range(args.runs):
+        times = import_times()
+        totals.append(times["main"][1] / 1000)
+        for module, (self_us, cumulative_us) in times.items():
+            self_times[module].append(self_us / 1000)
+            cumulative_times[module].append(cumulative_us / 1000)
+    prewarm = [prewarm_seconds() * 1000 for _ in range(args.runs)]
+
+    total = statistics.median(totals)
+    print(f"Start-up ({args.runs} runs, medians)")
+    print(f"  import main  {total:9.1f} ms")
+    print(f"  pre-warm     {statistics.median(prewarm):9.1f} ms")
+
+    project = sorted(
+        (module for module in cumulative_times if module.split(".")[0] in PROJECT_PREFIXES),
+        key=lambda module: -statistics.median(cumulative_times[module]),
+    )
+    print("\nProject modules (cumulative / self, ms)")
+    for module in project[: args.top]:
+        print(
+            f"  {module:45s} {statistics.median(cumulative_times[module]):9.1f}"
+            f" {statistics.median(self_times[module]):9.1f}"
+        )
+
+    dependencies = sorted(
+        (module for module in self_times if module.split(".")[0] not in PROJECT_PREFIXES),
+        key=lambda module: -statistics.median(self_times[module]),
+    )
+    print("\nSlowest dependency modules (self, ms)")
+    for module in dependencies[: args.top]:
+        print(f"  {module:45s} {statistics.median(self_times[module]):9.1f}")
+
+    if args.max_import_ms is not None and total > args.max_import_ms:
+        print(f"\nFAIL: import time {total:.1f} ms exceeds {args.max_import_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,26 @@
 import os
+from functools import cached_property
+from typing import Dict
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+
+from services.metrics import LLMMetricsCallback
 
 # Load environment variables from .env file
 load_dotenv()
 
 
+def parse_float_map(raw: str) -> Dict[str, float]:
+    """
+    Parses a "name=value,name=value" environment variable into a dict.
+    """
+    values = {}
+    for item in raw.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            values[name.strip()] = float(value)
+    return values
+
+
 class Settings:
     """
     Application settings loaded from environment variables.
@@ -19,9 +34,287 @@ class Settings:
     if not TAVILY_API_KEY:
         print("WARNING: TAVILY_API_KEY environment variable not set.")
 
-    llm = ChatOpenAI(
-        model="o4-mini-2025-04-16", temperature=1, api_key=OPENAI_API_KEY
-    )  # Using gpt-3.5-turbo with temperature 0
+    # Tokenizer used for local token counting (falls back to an estimate if unavailable).
+    TOKENIZER_ENCODING: str = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+    # Chunked (map-reduce) summarization for large documents.
+    SUMMARY_CHUNK_TOKENS: int = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+    SUMMARY_CHUNK_OVERLAP_TOKENS: int = int(
+        os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", "200")
+    )
+    SUMMARY_MAX_CONCURRENCY: int = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+    SUMMARY_MAX_KEYWORDS: int = int(os.getenv("SUMMARY_MAX_KEYWORDS", "30"))
+
+    # Incremental summarization for documents resubmitted after appends or edits:
+    # per-chunk summaries and keywords are stored by content hash and reused, so an
+    # update only summarizes new or changed chunks. SUMMARY_INCREMENTAL is the
+    # default when a request does not set 'incremental'.
+    SUMMARY_INCREMENTAL: bool = os.getenv("SUMMARY_INCREMENTAL", "false").lower() == "true"
+    SUMMARY_INCREMENTAL_CHUNK_TOKENS: int = int(
+        os.getenv("SUMMARY_INCREMENTAL_CHUNK_TOKENS", "1000")
+    )
+    SUMMARY_INCREMENTAL_GROUP_SIZE: int = int(os.getenv("SUMMARY_INCREMENTAL_GROUP_SIZE", "8"))
+    SUMMARY_CHUNK_CACHE_BACKEND: str = os.getenv("SUMMARY_CHUNK_CACHE_BACKEND", "memory")
+    SUMMARY_CHUNK_CACHE_TTL_SECONDS: float = float(
+        os.getenv("SUMMARY_CHUNK_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
+    )
+    SUMMARY_CHUNK_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("SUMMARY_CHUNK_CACHE_MAX_ENTRIES", "16384")
+    )
+    SUMMARY_CHUNK_CACHE_MAX_BYTES: int = int(
+        os.getenv("SUMMARY_CHUNK_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
+    SUMMARY_CHUNK_CACHE_PATH: str = os.getenv(
+        "SUMMARY_CHUNK_CACHE_PATH", "cache/summary_chunks.sqlite3"
+    )
+
+    # Retrieval stage for the query responder: "auto" ranks document chunks only
+    # when the documents exceed the token budget, "always" or "off" force it.
+    QUERY_RETRIEVAL_MODE: str = os.getenv("QUERY_RETRIEVAL_MODE", "auto")
+    QUERY_RETRIEVAL_TOP_K: int = int(os.getenv("QUERY_RETRIEVAL_TOP_K", "8"))
+    QUERY_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("QUERY_CONTEXT_TOKEN_BUDGET", "6000"))
+    QUERY_CHUNK_TOKENS: int = int(os.getenv("QUERY_CHUNK_TOKENS", "400"))
+    QUERY_CHUNK_OVERLAP_TOKENS: int = int(os.getenv("QUERY_CHUNK_OVERLAP_TOKENS", "50"))
+
+    # Token budgets for the variable parts of agent prompts (services/prompt_budget.py):
+    # query_context (documents for the query responder), search_results (snippets
+    # for the internet agent), final_tool_output and final_user_prompt (the
+    # orchestrator's final response prompt), session_prompt and session_answer
+    # (each earlier turn of a session). PROMPT_BUDGETS overrides them per
+    # part, e.g. "search_results=3000"; unlisted parts get PROMPT_BUDGET_TOKENS.
+    PROMPT_BUDGET_TOKENS: int = int(os.getenv("PROMPT_BUDGET_TOKENS", "8000"))
+    PROMPT_BUDGETS: Dict[str, float] = {
+        "query_context": QUERY_CONTEXT_TOKEN_BUDGET,
+        "search_results": 4000,
+        "final_tool_output": 6000,
+        "final_user_prompt": 1000,
+        "session_prompt": 500,
+        "session_answer": 500,
+        **parse_float_map(os.getenv("PROMPT_BUDGETS", "")),
+    }
+
+    # Conversation sessions for /process_query requests with a session_id. The
+    # orchestrator state is checkpointed per session in memory (per worker) or in
+    # SQLite (SESSION_STORE_PATH, shared by the workers and kept across restarts).
+    SESSION_STORE_BACKEND: str = os.getenv("SESSION_STORE_BACKEND", "memory")
+    SESSION_STORE_PATH: str = os.getenv("SESSION_STORE_PATH", "data/sessions.sqlite3")
+    SESSION_TTL_SECONDS: float = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    # Earlier turns sent to the router with each prompt. Beyond this many, the
+    # older half is folded into a running summary by the LLM (or dropped when
+    # SESSION_SUMMARY_ENABLED is false).
+    SESSION_HISTORY_TURNS: int = int(os.getenv("SESSION_HISTORY_TURNS", "6"))
+    SESSION_SUMMARY_ENABLED: bool = os.getenv("SESSION_SUMMARY_ENABLED", "true").lower() == "true"
+    # Tool outputs kept per session and reused when the router repeats a tool
+    # call with the same arguments within SESSION_TOOL_RESULT_TTL_SECONDS.
+    SESSION_MAX_TOOL_RESULTS: int = int(os.getenv("SESSION_MAX_TOOL_RESULTS", "8"))
+    SESSION_TOOL_RESULT_TTL_SECONDS: float = float(
+        os.getenv("SESSION_TOOL_RESULT_TTL_SECONDS", "900")
+    )
+
+    # Asynchronous jobs (POST .../jobs routes), kept in a SQLite file shared by the
+    # workers on one host. Each worker process runs up to JOB_WORKERS jobs at once.
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", "data/jobs.sqlite3")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_MAX_QUEUED: int = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+    JOB_TIMEOUT_SECONDS: float = float(os.getenv("JOB_TIMEOUT_SECONDS", "1800"))
+    # Running jobs report every JOB_HEARTBEAT_SECONDS; a job silent for three
+    # heartbeats (its process died) is run again, up to JOB_MAX_ATTEMPTS times.
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_TTL_SECONDS: float = float(os.getenv("JOB_TTL_SECONDS", "86400"))
+
+    # Registered document corpora and their inverted index (SQLite file).
+    CORPUS_DB_PATH: str = os.getenv("CORPUS_DB_PATH", "data/corpora.sqlite3")
+
+    # Default orchestrator response mode for /process_query: "rewrite" runs a final
+    # LLM pass over the tool output, "fast" formats it deterministically.
+    ORCHESTRATOR_RESPONSE_MODE: str = os.getenv("ORCHESTRATOR_RESPONSE_MODE", "rewrite")
+
+    # Orchestrator tool execution: all tool calls requested by the router run
+    # concurrently, each with a timeout (TOOL_TIMEOUTS overrides it per tool, e.g.
+    # "search_internet=30"), and at most TOOL_MAX_CONCURRENCY tools run at once
+    # across all requests.
+    TOOL_TIMEOUT_SECONDS: float = float(os.getenv("TOOL_TIMEOUT_SECONDS", "120"))
+    TOOL_TIMEOUTS: Dict[str, float] = parse_float_map(os.getenv("TOOL_TIMEOUTS", ""))
+    TOOL_MAX_CONCURRENCY: int = int(os.getenv("TOOL_MAX_CONCURRENCY", "32"))
+
+    # Batch endpoints: default and maximum number of items processed concurrently,
+    # and the maximum number of items accepted per request.
+    BATCH_DEFAULT_CONCURRENCY: int = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+    # Internet search (Tavily). TAVILY_API_BASE_URL lets the search tool point at a
+    # different endpoint, e.g. a local fake server for benchmarks.
+    TAVILY_API_BASE_URL: str = os.getenv("TAVILY_API_BASE_URL", "")
+    TAVILY_TIMEOUT_SECONDS: float = float(os.getenv("TAVILY_TIMEOUT_SECONDS", "15"))
+
+    # Search-result cache in front of Tavily: "memory", "sqlite" or "none".
+    SEARCH_CACHE_BACKEND: str = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+    SEARCH_CACHE_TTL_SECONDS: float = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+    SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+    SEARCH_CACHE_MAX_BYTES: int = int(
+        os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024))
+    )
+    SEARCH_CACHE_PATH: str = os.getenv("SEARCH_CACHE_PATH", "cache/search_cache.sqlite3")
+
+    # LLM response cache shared by all agents: "memory", "sqlite" or "none".
+    # Only the chains listed in LLM_CACHE_CHAINS use it; LLM_CACHE_CHAIN_TTLS
+    # overrides the TTL per chain, e.g. "summary=86400,response=600".
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "memory")
+    LLM_CACHE_CHAINS: str = os.getenv("LLM_CACHE_CHAINS", "summary,keywords,combine")
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    LLM_CACHE_CHAIN_TTLS: Dict[str, float] = parse_float_map(
+        os.getenv("LLM_CACHE_CHAIN_TTLS", "")
+    )
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "4096"))
+    LLM_CACHE_MAX_BYTES: int = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+
+    # Logging: level, "json" or "text" output, and how much of a payload (documents,
+    # tool outputs, LLM responses) a debug record may carry. LOG_PAYLOAD_SAMPLE_RATE
+    # keeps only that fraction of payload records. Records go through a bounded queue
+    # and are dropped, not waited on, when LOG_QUEUE_SIZE records are pending.
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_PAYLOAD_MAX_CHARS: int = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+    LOG_PAYLOAD_SAMPLE_RATE: float = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    # Startup pre-warming of LLM clients, chains and graphs (which are otherwise
+    # built on first use): "startup" builds them before the app accepts requests,
+    # "background" right after, "off" leaves them to the first request.
+    STARTUP_PREWARM: str = os.getenv("STARTUP_PREWARM", "startup")
+
+    # Event-loop lag probe feeding auraa_event_loop_lag_seconds; 0 disables it.
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = float(
+        os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.25")
+    )
+
+    # Providers: "openai" / "tavily" call the real APIs, "fake" uses the local,
+    # deterministic stand-ins in services/fakes.py (for offline load testing).
+    # Latencies are distributions: "0.5", "uniform:0.2,1.0", "normal:0.8,0.2" or
+    # "lognormal:0.8,0.5" (median, sigma), in seconds.
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
+    SEARCH_PROVIDER: str = os.getenv("SEARCH_PROVIDER", "tavily")
+    FAKE_LLM_LATENCY: str = os.getenv("FAKE_LLM_LATENCY", "lognormal:0.8,0.5")
+    FAKE_LLM_OUTPUT_TOKENS: int = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "64"))
+    FAKE_LLM_TOKENS_PER_SECOND: float = float(
+        os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50")
+    )
+    FAKE_SEARCH_LATENCY: str = os.getenv("FAKE_SEARCH_LATENCY", "lognormal:0.6,0.4")
+    FAKE_SEARCH_RESULTS_PATH: str = os.getenv("FAKE_SEARCH_RESULTS_PATH", "")
+    FAKE_SEED: str = os.getenv("FAKE_SEED", "")
+
+    # Identical concurrent agent runs (internet, document, query responder) share
+    # one in-flight execution (services/singleflight.py).
+    SINGLE_FLIGHT_ENABLED: bool = (
+        os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+    )
+
+    # Local pre-routing of /process_query (services/routing.py): lexical rules
+    # skip the router LLM above PREROUTER_MIN_CONFIDENCE, and the routing cache
+    # reuses the router LLM's decision for a prompt shape once it has seen it
+    # ROUTING_CACHE_MIN_OBSERVATIONS times with ROUTING_CACHE_MIN_AGREEMENT.
+    # PREROUTER_SHADOW_RATE is the fraction of local decisions re-checked by the
+    # router LLM in the background to measure their accuracy.
+    PREROUTER_ENABLED: bool = os.getenv("PREROUTER_ENABLED", "true").lower() == "true"
+    PREROUTER_MIN_CONFIDENCE: float = float(os.getenv("PREROUTER_MIN_CONFIDENCE", "0.9"))
+    PREROUTER_SHADOW_RATE: float = float(os.getenv("PREROUTER_SHADOW_RATE", "0.05"))
+    ROUTING_CACHE_BACKEND: str = os.getenv("ROUTING_CACHE_BACKEND", "memory")
+    ROUTING_CACHE_TTL_SECONDS: float = float(
+        os.getenv("ROUTING_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
+    )
+    ROUTING_CACHE_MAX_ENTRIES: int = int(os.getenv("ROUTING_CACHE_MAX_ENTRIES", "4096"))
+    ROUTING_CACHE_PATH: str = os.getenv("ROUTING_CACHE_PATH", "cache/routing_cache.sqlite3")
+    ROUTING_CACHE_MIN_OBSERVATIONS: int = int(
+        os.getenv("ROUTING_CACHE_MIN_OBSERVATIONS", "3")
+    )
+    ROUTING_CACHE_MIN_AGREEMENT: float = float(
+        os.getenv("ROUTING_CACHE_MIN_AGREEMENT", "0.9")
+    )
+
+    # LLM scheduler (services/llm_scheduler.py): calls in flight, provider rate
+    # limits (0 = none; set them to your OpenAI tier), tokens reserved per call
+    # for the completion, and retries with exponential backoff and jitter.
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    LLM_EXPECTED_OUTPUT_TOKENS: int = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1000"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_RETRY_BASE_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+    LLM_RETRY_MAX_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+    # Shared HTTP connection pool for the OpenAI client.
+    LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "64"))
+    LLM_HTTP_MAX_KEEPALIVE: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "32"))
+    LLM_HTTP_KEEPALIVE_SECONDS: float = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "60"))
+    LLM_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "120"))
+
+    @cached_property
+    def llm(self):
+        """
+        The shared chat model, created on first use. langchain_openai is imported
+        here rather than at module level because it dominates import time. Its
+        async calls go through the LLM scheduler (services/llm_scheduler.py).
+        """
+        from services.llm_scheduler import scheduled
+
+        if self.LLM_PROVIDER == "fake":
+            from services.fakes import FakeChatModel
+
+            return scheduled(FakeChatModel)(
+                latency=self.FAKE_LLM_LATENCY,
+                output_tokens=self.FAKE_LLM_OUTPUT_TOKENS,
+                tokens_per_second=self.FAKE_LLM_TOKENS_PER_SECOND,
+                seed=int(self.FAKE_SEED) if self.FAKE_SEED else None,
+                callbacks=[LLMMetricsCallback()],
+            )
+
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        return scheduled(ChatOpenAI)(
+            model="o4-mini-2025-04-16",
+            temperature=1,
+            api_key=self.OPENAI_API_KEY,
+            callbacks=[LLMMetricsCallback()],  # Latency and token metrics for /metrics
+            max_retries=0,  # Retried by the LLM scheduler instead
+            timeout=self.LLM_HTTP_TIMEOUT_SECONDS,
+            http_async_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=self.LLM_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=self.LLM_HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=self.LLM_HTTP_TIMEOUT_SECONDS,
+            ),
+        )  # Using gpt-3.5-turbo with temperature 0
+
+    @cached_property
+    def search_tool(self):
+        """
+        The internet search tool (Tavily, or the local fake), created on first use.
+        Called as `await search_tool.ainvoke({"query": ...})`.
+        """
+        if self.SEARCH_PROVIDER == "fake":
+            from services.fakes import FakeSearchTool
+
+            options = {
+                "latency": self.FAKE_SEARCH_LATENCY,
+                "seed": int(self.FAKE_SEED) if self.FAKE_SEED else None,
+            }
+            if self.FAKE_SEARCH_RESULTS_PATH:
+                return FakeSearchTool.from_file(self.FAKE_SEARCH_RESULTS_PATH, **options)
+            return FakeSearchTool(**options)
+
+        from langchain_tavily import TavilySearch
+
+        return TavilySearch(
+            max_results=5,  # Limit to 5 search results for conciseness
+            api_base_url=self.TAVILY_API_BASE_URL or None,
+        )
 
 
 settings = Settings()
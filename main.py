@@ -1,8 +1,33 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, Response
 from contextlib import asynccontextmanager
 from routes import agent_routes
 from config import settings
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from services.lazy import warm_up
+from services.jobs import job_queue
+from services.log import RequestIdMiddleware, setup_logging, shutdown_logging
+from services.metrics import monitor_event_loop_lag
+from services.sessions import session_store
+from services.tokens import count_tokens
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def prewarm() -> None:
+    """
+    Builds the LLM client, tools, chains and compiled graphs (all created lazily on
+    first use) and loads the tokenizer, so the first requests do not pay for it.
+    """
+    started = time.perf_counter()
+    warm_up()
+    count_tokens("warm up")
+    logger.info("Pre-warmed agents in %.3fs", time.perf_counter() - started)
 
 
 # Define the lifespan context manager
@@ -11,12 +36,39 @@ async def lifespan(app: FastAPI):
     """
     Handles startup and shutdown events for the FastAPI application.
     """
-    if not settings.OPENAI_API_KEY:
-        print("FastAPI Startup: OPENAI_API_KEY is missing. Agent operations may fail.")
-    if not settings.TAVILY_API_KEY:
-        print("FastAPI Startup: TAVILY_API_KEY is missing. Internet search may fail.")
+    setup_logging()
+    if settings.LLM_PROVIDER == "fake" or settings.SEARCH_PROVIDER == "fake":
+        logger.warning(
+            "Using fake providers (LLM: %s, search: %s).",
+            settings.LLM_PROVIDER,
+            settings.SEARCH_PROVIDER,
+        )
+    if settings.LLM_PROVIDER != "fake" and not settings.OPENAI_API_KEY:
+        logger.warning("OPENAI_API_KEY is missing. Agent operations may fail.")
+    if settings.SEARCH_PROVIDER != "fake" and not settings.TAVILY_API_KEY:
+        logger.warning("TAVILY_API_KEY is missing. Internet search may fail.")
+
+    prewarm_mode = settings.STARTUP_PREWARM.lower()
+    prewarm_task = None
+    if prewarm_mode == "startup":
+        await asyncio.to_thread(prewarm)
+    elif prewarm_mode == "background":
+        prewarm_task = asyncio.create_task(asyncio.to_thread(prewarm))
+    lag_task = None
+    if settings.EVENT_LOOP_LAG_INTERVAL_SECONDS > 0:
+        lag_task = asyncio.create_task(
+            monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        )
+    await job_queue.start()
     yield
-    print("FastAPI Shutdown: Application is shutting down.")
+    await job_queue.stop()
+    if lag_task is not None:
+        lag_task.cancel()
+    if prewarm_task is not None and not prewarm_task.done():
+        await prewarm_task
+    await session_store.close()
+    logger.info("Application is shutting down.")
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -37,6 +89,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tag every request (and its log records) with an X-Request-ID.
+app.add_middleware(RequestIdMiddleware)
+
 # Include the API router
 app.include_router(agent_routes.router)
 
@@ -49,5 +104,14 @@ async def read_root():
     return {"message": "Auraa Agent Microservice is running!"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint: per-route, per-node, LLM, tool and search
+    latency histograms plus LLM token counters.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 # Run: uvicorn main:app --reload --port 8000
 # access at http://127.0.0.1:8000/docs
@@ -1,19 +1,111 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from sse_starlette.sse import EventSourceResponse
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Literal, Optional
+import asyncio
 import json
+import logging
 
-from agents.main_agent import run_main_agent_orchestrator
-from agents.document_summarizer import run_document_agent
-from agents.query_responder import run_query_responder_agent
-from agents.real_time_data_extractor import run_internet_agent
+from config import settings
 
-router = APIRouter()
+from agents.main_agent import (
+    get_session,
+    pre_router,
+    run_main_agent_orchestrator,
+    stream_main_agent_orchestrator,
+)
+from agents.document_summarizer import (
+    chunk_store,
+    run_document_agent,
+    stream_document_agent,
+)
+from agents.query_responder import (
+    register_corpus,
+    run_corpus_query_agent,
+    run_query_responder_agent,
+    stream_query_responder_agent,
+    corpus_store,
+)
+from agents.real_time_data_extractor import (
+    run_internet_agent,
+    stream_internet_agent,
+    search_cache,
+)
+from services.batch import run_batch
+from services.corpus_store import CorpusNotFoundError
+from services.jobs import JobQueueFullError, job_queue
+from services.llm_cache import llm_cache_stats
+from services.log import log_payload
+from services.metrics import InstrumentedRoute
+from services.sessions import session_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+def sse_response(events: AsyncIterator[dict], route_name: str) -> EventSourceResponse:
+    """
+    Sends agent stream events to the client as Server-Sent Events. Each event's
+    'data' is JSON-encoded; a failure mid-stream is reported as an 'error' event
+    because the HTTP status has already been sent.
+    """
+
+    async def event_source():
+        try:
+            async for event in events:
+                yield {"event": event["event"], "data": json.dumps(event["data"])}
+        except Exception as e:
+            logger.exception("An unexpected error occurred in %s stream: %s", route_name, e)
+            yield {
+                "event": "error",
+                "data": json.dumps({"error": f"Internal server error: {e}"}),
+            }
+
+    return EventSourceResponse(event_source())
+
+
+def ndjson_batch_response(
+    items: List[Any],
+    worker: Callable[[Any], Awaitable[dict]],
+    max_concurrency: Optional[int],
+) -> StreamingResponse:
+    """
+    Runs a batch of agent requests with bounded concurrency and streams one JSON
+    line per item, in completion order. Each line has the item's 'index' in the
+    request, a 'status' of 'ok' or 'error', and either 'result' or 'error'.
+    """
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(items)} items (limit {settings.BATCH_MAX_ITEMS}).",
+        )
+    concurrency = min(
+        max_concurrency or settings.BATCH_DEFAULT_CONCURRENCY,
+        settings.BATCH_MAX_CONCURRENCY,
+    )
+
+    async def lines():
+        async for record in run_batch(items, worker, concurrency):
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 # Pydantic Models for Main Agent Route
 class MainQueryRequest(BaseModel):
     user_prompt: str
+    response_mode: Optional[Literal["rewrite", "fast"]] = Field(
+        None,
+        description="'rewrite' has the LLM rewrite the tool output into prose; 'fast' formats it directly and skips that LLM call. Defaults to the server's ORCHESTRATOR_RESPONSE_MODE.",
+    )
+    session_id: Optional[str] = Field(
+        None,
+        min_length=1,
+        max_length=128,
+        description="Conversation session chosen by the client. Prompts with the same session_id can refer to earlier turns (documents sent before, earlier answers), and earlier tool outputs are reused. Without it, every prompt stands alone.",
+    )
 
 
 class MainQueryResponse(BaseModel):
@@ -22,12 +114,25 @@ class MainQueryResponse(BaseModel):
     justification: str
 
 
+class MainQueryBatchRequest(BaseModel):
+    items: List[MainQueryRequest] = Field(..., description="The queries to process.")
+    max_concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Maximum number of items processed at the same time. Capped by the server's BATCH_MAX_CONCURRENCY.",
+    )
+
+
 # Pydantic Models for Agent 1: Document Summarizer and Keyword Extractor
 class DocumentSummarizerRequest(BaseModel):
     document_content: str = Field(
         ...,
         description="The full text content of the document to be summarized and from which keywords will be extracted.",
     )
+    incremental: Optional[bool] = Field(
+        None,
+        description="Reuse stored summaries of the parts of the document that were seen before (for documents resubmitted after appends or edits), so only new or changed parts are summarized. Defaults to the server's SUMMARY_INCREMENTAL.",
+    )
 
 
 class DocumentSummarizerResponse(BaseModel):
@@ -42,6 +147,17 @@ class DocumentSummarizerResponse(BaseModel):
         populate_by_name = True  # Allows using alias for field name in Pydantic v2
 
 
+class DocumentSummarizerBatchRequest(BaseModel):
+    items: List[DocumentSummarizerRequest] = Field(
+        ..., description="The documents to summarize."
+    )
+    max_concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Maximum number of items processed at the same time. Capped by the server's BATCH_MAX_CONCURRENCY.",
+    )
+
+
 # Pydantic Models for Agent 2: Query Responder
 class QueryResponderRequest(BaseModel):
     user_query: str = Field(..., description="The user's question to be answered.")
@@ -49,6 +165,10 @@ class QueryResponderRequest(BaseModel):
         ...,
         description="A list of document strings that the query responder should use as context to answer the query.",
     )
+    use_retrieval: Optional[bool] = Field(
+        None,
+        description="Rank document chunks with BM25 and send only the most relevant ones to the LLM. Defaults to the server's QUERY_RETRIEVAL_MODE.",
+    )
 
 
 class QueryResponderResponse(BaseModel):
@@ -58,6 +178,34 @@ class QueryResponderResponse(BaseModel):
     )
 
 
+class QueryResponderBatchRequest(BaseModel):
+    items: List[QueryResponderRequest] = Field(..., description="The queries to answer.")
+    max_concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Maximum number of items processed at the same time. Capped by the server's BATCH_MAX_CONCURRENCY.",
+    )
+
+
+# Pydantic Models for Agent 2 corpora (documents registered once, queried by ID)
+class CorpusRegisterRequest(BaseModel):
+    documents_list: List[str] = Field(
+        ...,
+        min_length=1,
+        description="The documents to store and index on the server for repeated queries.",
+    )
+
+
+class CorpusResponse(BaseModel):
+    corpus_id: str = Field(..., description="ID to use when querying the corpus.")
+    document_count: int = Field(..., description="Number of documents in the corpus.")
+    chunk_count: int = Field(..., description="Number of indexed chunks.")
+
+
+class CorpusQueryRequest(BaseModel):
+    user_query: str = Field(..., description="The user's question to be answered.")
+
+
 # Pydantic Models for Agent 3: Internet-Connected Agent
 class InternetAgentRequest(BaseModel):
     user_query: str = Field(
@@ -76,6 +224,43 @@ class InternetAgentResponse(BaseModel):
     )
 
 
+class InternetAgentBatchRequest(BaseModel):
+    items: List[InternetAgentRequest] = Field(..., description="The queries to search for.")
+    max_concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Maximum number of items processed at the same time. Capped by the server's BATCH_MAX_CONCURRENCY.",
+    )
+
+
+# Pydantic Models for asynchronous jobs
+class JobSubmittedResponse(BaseModel):
+    job_id: str = Field(..., description="ID to poll the job's status and result with.")
+    status: str = Field(..., description="'queued'.")
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str = Field(..., description="The agent route the job runs, e.g. 'summarize'.")
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    attempts: int = Field(..., description="Times a worker started the job.")
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = Field(
+        None,
+        description="When succeeded: the fields of the 'result' event of the route's /stream variant.",
+    )
+    error: Optional[str] = None
+
+
+class JobPartialResponse(BaseModel):
+    job_id: str
+    status: str
+    nodes: List[str] = Field(..., description="Graph nodes finished so far.")
+    output: dict = Field(..., description="LLM output produced so far, per graph node.")
+
+
 # Main Agent Route
 @router.post(
     "/process_query",
@@ -88,27 +273,93 @@ async def process_user_query(request: MainQueryRequest):
     and returning a natural language response with justification.
     """
     try:
-        print(f"Received query for Manager Agent: {request.user_prompt}")
-        result_json_str = await run_main_agent_orchestrator(request.user_prompt)
-        result_data = json.loads(result_json_str)
-
-        if "error" in result_data:
-            raise HTTPException(status_code=500, detail=result_data["error"])
+        logger.info("Received query for Manager Agent.")
+        log_payload(logger, "User prompt", request.user_prompt)
+        result_data = await run_main_agent_orchestrator(
+            request.user_prompt, request.response_mode, request.session_id
+        )
 
         return MainQueryResponse(
-            query=result_data.get("query", request.user_prompt),
-            response=result_data.get("response", "No response generated."),
-            justification=result_data.get(
-                "justification", "No justification provided."
-            ),
+            query=result_data["query"],
+            response=result_data["response"],
+            justification=result_data["justification"],
         )
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"An unexpected error occurred in Manager Agent route: {e}")
+        logger.exception("An unexpected error occurred in Manager Agent route: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
+@router.post(
+    "/process_query/stream",
+    summary="Process user query with Auraa Manager Agent (streaming)",
+)
+async def process_user_query_stream(request: MainQueryRequest):
+    """
+    Streaming variant of /process_query. Emits Server-Sent Events: 'token' for LLM
+    output tokens, 'node_end' when a graph node finishes, and a final 'result'
+    event with the same fields as /process_query.
+    """
+    logger.info("Received streaming query for Manager Agent.")
+    log_payload(logger, "User prompt", request.user_prompt)
+    return sse_response(
+        stream_main_agent_orchestrator(
+            request.user_prompt, request.response_mode, request.session_id
+        ),
+        "Manager Agent",
+    )
+
+
+@router.post(
+    "/process_query/batch",
+    summary="Process a batch of user queries with Auraa Manager Agent",
+)
+async def process_user_query_batch(request: MainQueryBatchRequest):
+    """
+    Processes many user queries with bounded concurrency. Streams NDJSON, one line
+    per query in completion order; 'result' has the fields of /process_query.
+    """
+    logger.info("Received batch of %d queries for Manager Agent.", len(request.items))
+
+    async def process_item(item: MainQueryRequest) -> dict:
+        result_data = await run_main_agent_orchestrator(
+            item.user_prompt, item.response_mode, item.session_id
+        )
+        return MainQueryResponse(**result_data).model_dump()
+
+    return ndjson_batch_response(request.items, process_item, request.max_concurrency)
+
+
+@router.get(
+    "/sessions/{session_id}",
+    summary="Get a conversation session of the Manager Agent",
+)
+async def get_session_route(session_id: str):
+    """
+    Returns what a /process_query session keeps between turns: the earlier turns
+    (shortened), the summary of older ones and the number of stored tool outputs.
+    """
+    session = await get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.")
+    return session
+
+
+@router.delete(
+    "/sessions/{session_id}",
+    summary="Delete a conversation session of the Manager Agent",
+)
+async def delete_session_route(session_id: str):
+    """
+    Deletes a /process_query session; its next prompt starts a new conversation.
+    """
+    if await get_session(session_id) is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.")
+    await session_store.delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+
 # Individual Agent Routes
 
 
@@ -122,27 +373,68 @@ async def summarize_document_route(request: DocumentSummarizerRequest):
     Summarizes the given document content and extracts a list of keywords.
     """
     try:
-        print(
-            f"Received request for Agent 1 (Summarizer). Document length: {len(request.document_content)}"
+        logger.info(
+            "Received request for Agent 1 (Summarizer). Document length: %d",
+            len(request.document_content),
+        )
+        result_data = await run_document_agent(
+            request.document_content, request.incremental
         )
-        result_json_str = await run_document_agent(request.document_content)
-        result_data = json.loads(result_json_str)
-
-        if "error" in result_data:
-            raise HTTPException(status_code=500, detail=result_data["error"])
 
         # Use the alias for 'document' field as per assignment PDF
         return DocumentSummarizerResponse(
-            doc_summary=result_data.get("document", ""),
-            keywords=result_data.get("keywords", []),
+            doc_summary=result_data["document"],
+            keywords=result_data["keywords"],
         )
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"An unexpected error occurred in Agent 1 route: {e}")
+        logger.exception("An unexpected error occurred in Agent 1 route: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
+@router.post(
+    "/agent1/summarize/stream",
+    summary="Document Summarizer and Keyword Extractor (Agent 1, streaming)",
+)
+async def summarize_document_stream_route(request: DocumentSummarizerRequest):
+    """
+    Streaming variant of /agent1/summarize. Emits 'token' and 'node_end' events
+    while the document is processed, and a final 'result' event with 'document'
+    (the summary) and 'keywords'.
+    """
+    logger.info(
+        "Received streaming request for Agent 1 (Summarizer). Document length: %d",
+        len(request.document_content),
+    )
+    return sse_response(
+        stream_document_agent(request.document_content, request.incremental), "Agent 1"
+    )
+
+
+@router.post(
+    "/agent1/summarize/batch",
+    summary="Summarize a batch of documents (Agent 1)",
+)
+async def summarize_document_batch_route(request: DocumentSummarizerBatchRequest):
+    """
+    Summarizes many documents with bounded concurrency. Streams NDJSON, one line
+    per document in completion order; 'result' has the fields of /agent1/summarize.
+    """
+    logger.info(
+        "Received batch of %d documents for Agent 1 (Summarizer).", len(request.items)
+    )
+
+    async def process_item(item: DocumentSummarizerRequest) -> dict:
+        result_data = await run_document_agent(item.document_content, item.incremental)
+        return DocumentSummarizerResponse(
+            doc_summary=result_data["document"],
+            keywords=result_data["keywords"],
+        ).model_dump(by_alias=True)
+
+    return ndjson_batch_response(request.items, process_item, request.max_concurrency)
+
+
 @router.post(
     "/agent2/respond_to_query",
     response_model=QueryResponderResponse,
@@ -153,25 +445,138 @@ async def respond_to_query_route(request: QueryResponderRequest):
     Responds to a user query based on provided document content.
     """
     try:
-        print(
-            f"Received request for Agent 2 (Query Responder). Query: {request.user_query}"
-        )
-        result_json_str = await run_query_responder_agent(
-            request.user_query, request.documents_list
+        logger.info("Received request for Agent 2 (Query Responder).")
+        log_payload(logger, "User query", request.user_query)
+        result_data = await run_query_responder_agent(
+            request.user_query, request.documents_list, request.use_retrieval
         )
-        result_data = json.loads(result_json_str)
-
-        if "error" in result_data:
-            raise HTTPException(status_code=500, detail=result_data["error"])
 
         return QueryResponderResponse(
-            query=result_data.get("query", request.user_query),
-            response=result_data.get("response", "No response generated."),
+            query=result_data["query"],
+            response=result_data["response"],
         )
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"An unexpected error occurred in Agent 2 route: {e}")
+        logger.exception("An unexpected error occurred in Agent 2 route: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post(
+    "/agent2/respond_to_query/stream",
+    summary="Query Responder (Agent 2, streaming)",
+)
+async def respond_to_query_stream_route(request: QueryResponderRequest):
+    """
+    Streaming variant of /agent2/respond_to_query. Emits 'token' and 'node_end'
+    events, and a final 'result' event with 'query' and 'response'.
+    """
+    logger.info("Received streaming request for Agent 2 (Query Responder).")
+    log_payload(logger, "User query", request.user_query)
+    return sse_response(
+        stream_query_responder_agent(
+            request.user_query, request.documents_list, request.use_retrieval
+        ),
+        "Agent 2",
+    )
+
+
+@router.post(
+    "/agent2/respond_to_query/batch",
+    summary="Answer a batch of queries (Agent 2)",
+)
+async def respond_to_query_batch_route(request: QueryResponderBatchRequest):
+    """
+    Answers many queries with bounded concurrency. Streams NDJSON, one line per
+    query in completion order; 'result' has the fields of /agent2/respond_to_query.
+    """
+    logger.info(
+        "Received batch of %d queries for Agent 2 (Query Responder).", len(request.items)
+    )
+
+    async def process_item(item: QueryResponderRequest) -> dict:
+        result_data = await run_query_responder_agent(
+            item.user_query, item.documents_list, item.use_retrieval
+        )
+        return QueryResponderResponse(**result_data).model_dump()
+
+    return ndjson_batch_response(request.items, process_item, request.max_concurrency)
+
+
+@router.post(
+    "/agent2/corpora",
+    response_model=CorpusResponse,
+    summary="Register a document corpus for the Query Responder (Agent 2)",
+)
+async def register_corpus_route(request: CorpusRegisterRequest):
+    """
+    Stores and indexes a list of documents once and returns a corpus ID. Registering
+    the same documents again returns the same ID without re-indexing them.
+    """
+    try:
+        logger.info(
+            "Received corpus registration for Agent 2 with %d documents.",
+            len(request.documents_list),
+        )
+        corpus = await register_corpus(request.documents_list)
+        return CorpusResponse(**corpus)
+    except Exception as e:
+        logger.exception("An unexpected error occurred in Agent 2 corpus route: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.get(
+    "/agent2/corpora/{corpus_id}",
+    response_model=CorpusResponse,
+    summary="Get a registered document corpus (Agent 2)",
+)
+async def get_corpus_route(corpus_id: str):
+    """
+    Returns the metadata of a registered corpus.
+    """
+    corpus = await asyncio.to_thread(corpus_store.get_corpus, corpus_id)
+    if corpus is None:
+        raise HTTPException(status_code=404, detail=f"Corpus '{corpus_id}' not found.")
+    return CorpusResponse(**corpus)
+
+
+@router.delete(
+    "/agent2/corpora/{corpus_id}",
+    summary="Delete a registered document corpus (Agent 2)",
+)
+async def delete_corpus_route(corpus_id: str):
+    """
+    Deletes a registered corpus and its index.
+    """
+    if not await asyncio.to_thread(corpus_store.delete_corpus, corpus_id):
+        raise HTTPException(status_code=404, detail=f"Corpus '{corpus_id}' not found.")
+    return {"corpus_id": corpus_id, "deleted": True}
+
+
+@router.post(
+    "/agent2/corpora/{corpus_id}/respond_to_query",
+    response_model=QueryResponderResponse,
+    summary="Query Responder over a registered corpus (Agent 2)",
+)
+async def respond_to_corpus_query_route(corpus_id: str, request: CorpusQueryRequest):
+    """
+    Responds to a user query using the most relevant chunks of a registered corpus.
+    """
+    try:
+        logger.info(
+            "Received request for Agent 2 (Query Responder) on corpus %s.", corpus_id
+        )
+        log_payload(logger, "User query", request.user_query)
+        result_data = await run_corpus_query_agent(request.user_query, corpus_id)
+
+        return QueryResponderResponse(
+            query=result_data["query"],
+            response=result_data["response"],
+        )
+    except CorpusNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Corpus '{corpus_id}' not found.")
+    except Exception as e:
+        logger.exception("An unexpected error occurred in Agent 2 corpus route: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
@@ -185,22 +590,211 @@ async def search_internet_route(request: InternetAgentRequest):
     Fetches real-time, up-to-date information from the internet to answer a user's question.
     """
     try:
-        print(
-            f"Received request for Agent 3 (Internet Agent). Query: {request.user_query}"
-        )
-        result_json_str = await run_internet_agent(request.user_query)
-        result_data = json.loads(result_json_str)
-
-        if "error" in result_data:
-            raise HTTPException(status_code=500, detail=result_data["error"])
+        logger.info("Received request for Agent 3 (Internet Agent).")
+        log_payload(logger, "User query", request.user_query)
+        result_data = await run_internet_agent(request.user_query)
 
         return InternetAgentResponse(
-            query=result_data.get("query", request.user_query),
-            response=result_data.get("response", "No response generated."),
-            source=result_data.get("source"),  # Source can be optional
+            query=result_data["query"],
+            response=result_data["response"],
+            source=result_data["source"],
         )
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"An unexpected error occurred in Agent 3 route: {e}")
+        logger.exception("An unexpected error occurred in Agent 3 route: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post(
+    "/agent3/search_internet/stream",
+    summary="Internet-Connected Agent (Agent 3, streaming)",
+)
+async def search_internet_stream_route(request: InternetAgentRequest):
+    """
+    Streaming variant of /agent3/search_internet. Emits 'token' and 'node_end'
+    events, and a final 'result' event with 'query', 'response' and 'source'.
+    """
+    logger.info("Received streaming request for Agent 3 (Internet Agent).")
+    log_payload(logger, "User query", request.user_query)
+    return sse_response(stream_internet_agent(request.user_query), "Agent 3")
+
+
+@router.post(
+    "/agent3/search_internet/batch",
+    summary="Search the internet for a batch of queries (Agent 3)",
+)
+async def search_internet_batch_route(request: InternetAgentBatchRequest):
+    """
+    Answers many queries from the internet with bounded concurrency. Streams NDJSON,
+    one line per query in completion order; 'result' has the fields of
+    /agent3/search_internet.
+    """
+    logger.info(
+        "Received batch of %d queries for Agent 3 (Internet Agent).", len(request.items)
+    )
+
+    async def process_item(item: InternetAgentRequest) -> dict:
+        result_data = await run_internet_agent(item.user_query)
+        return InternetAgentResponse(**result_data).model_dump()
+
+    return ndjson_batch_response(request.items, process_item, request.max_concurrency)
+
+
+# Asynchronous Job Routes: each returns a job ID at once; the work runs on the
+# background job workers (see services.jobs).
+job_queue.register(
+    "process_query",
+    lambda request: stream_main_agent_orchestrator(
+        request["user_prompt"], request.get("response_mode"), request.get("session_id")
+    ),
+)
+job_queue.register(
+    "summarize",
+    lambda request: stream_document_agent(
+        request["document_content"], request.get("incremental")
+    ),
+)
+job_queue.register(
+    "respond_to_query",
+    lambda request: stream_query_responder_agent(
+        request["user_query"], request["documents_list"], request.get("use_retrieval")
+    ),
+)
+job_queue.register(
+    "search_internet", lambda request: stream_internet_agent(request["user_query"])
+)
+
+
+async def submit_job(kind: str, request: BaseModel) -> JobSubmittedResponse:
+    try:
+        job_id = await job_queue.submit(kind, request.model_dump())
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {e}")
+    logger.info("Queued %s job %s.", kind, job_id)
+    return JobSubmittedResponse(job_id=job_id, status="queued")
+
+
+@router.post(
+    "/process_query/jobs",
+    status_code=202,
+    response_model=JobSubmittedResponse,
+    summary="Submit a user query to the Auraa Manager Agent as a job",
+)
+async def process_user_query_job(request: MainQueryRequest):
+    """
+    Queues a /process_query request and returns its job ID at once. Poll
+    /jobs/{job_id} for the result.
+    """
+    return await submit_job("process_query", request)
+
+
+@router.post(
+    "/agent1/summarize/jobs",
+    status_code=202,
+    response_model=JobSubmittedResponse,
+    summary="Submit a document to summarize as a job (Agent 1)",
+)
+async def summarize_document_job(request: DocumentSummarizerRequest):
+    """
+    Queues an /agent1/summarize request (e.g. for a large document) and returns
+    its job ID at once.
+    """
+    return await submit_job("summarize", request)
+
+
+@router.post(
+    "/agent2/respond_to_query/jobs",
+    status_code=202,
+    response_model=JobSubmittedResponse,
+    summary="Submit a query over documents as a job (Agent 2)",
+)
+async def respond_to_query_job(request: QueryResponderRequest):
+    """
+    Queues an /agent2/respond_to_query request and returns its job ID at once.
+    """
+    return await submit_job("respond_to_query", request)
+
+
+@router.post(
+    "/agent3/search_internet/jobs",
+    status_code=202,
+    response_model=JobSubmittedResponse,
+    summary="Submit an internet search query as a job (Agent 3)",
+)
+async def search_internet_job(request: InternetAgentRequest):
+    """
+    Queues an /agent3/search_internet request and returns its job ID at once.
+    """
+    return await submit_job("search_internet", request)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobStatusResponse,
+    summary="Get the status and result of a job",
+)
+async def get_job_route(job_id: str):
+    """
+    Returns a job's status, and its result or error once it has finished.
+    """
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return JobStatusResponse(**job)
+
+
+@router.get(
+    "/jobs/{job_id}/partial",
+    response_model=JobPartialResponse,
+    summary="Get the partial output of a job",
+)
+async def get_job_partial_route(job_id: str):
+    """
+    Returns what a job has produced so far: the graph nodes it finished and the
+    LLM output per node (saved at most once a second while it runs).
+    """
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    partial = job["partial"] or {"nodes": [], "output": {}}
+    return JobPartialResponse(job_id=job_id, status=job["status"], **partial)
+
+
+@router.post(
+    "/jobs/{job_id}/cancel",
+    summary="Cancel a job",
+)
+async def cancel_job_route(job_id: str):
+    """
+    Cancels a queued job at once. A running job is stopped by its worker, within
+    JOB_HEARTBEAT_SECONDS when it runs in another worker process; its status
+    turns to 'cancelled' then.
+    """
+    status = await job_queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return {"job_id": job_id, "status": status}
+
+
+@router.get("/cache/stats", summary="Search, LLM response and routing cache statistics")
+async def cache_stats_route():
+    """
+    Returns hit/miss counts for the internet search cache and the incremental
+    summarization chunk store, hit ratio and saved tokens for every chain using
+    the LLM response cache, the pre-router's bypass rate and measured accuracy,
+    the number of conversation sessions and the jobs per status.
+    """
+    return {
+        # Entry counts of SQLite-backed caches are queries; keep them off the loop.
+        "search": (
+            await asyncio.to_thread(search_cache.stats) if search_cache is not None else None
+        ),
+        "summary_chunks": (
+            await asyncio.to_thread(chunk_store.stats) if chunk_store is not None else None
+        ),
+        "llm": llm_cache_stats(),
+        "routing": await asyncio.to_thread(pre_router.stats),
+        "sessions": await session_store.stats(),
+        "jobs": await asyncio.to_thread(job_queue.store.counts),
+    }
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from services.llm_scheduler import llm_priority
+
+logger = logging.getLogger(__name__)
+
+
+async def run_batch(
+    items: List[Any],
+    worker: Callable[[Any], Awaitable[Dict[str, Any]]],
+    max_concurrency: int,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs worker over every item with at most max_concurrency items in flight and
+    yields one record per item in completion order.
+
+    A failing item does not affect the others: its record carries the error
+    message instead of a result. If the consumer stops iterating (e.g. the client
+    disconnects), all in-flight work is cancelled. LLM calls made by the items are
+    scheduled at "batch" priority, behind interactive requests.
+
+    Args:
+        items (List[Any]): The batch inputs.
+        worker (Callable): Async function that processes one item and returns a
+            JSON-serializable result.
+        max_concurrency (int): Maximum number of items processed at the same time.
+
+    Yields:
+        Dict[str, Any]: {"index", "status": "ok", "result"} or
+        {"index", "status": "error", "error"} for each item.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for index, item in enumerate(items):
+        pending.put_nowait((index, item))
+    completed: asyncio.Queue = asyncio.Queue()
+
+    async def consume() -> None:
+        # Batch work yields the LLM to interactive requests.
+        llm_priority.set("batch")
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                result = await worker(item)
+                record = {"index": index, "status": "ok", "result": result}
+            except Exception as e:
+                logger.warning("Batch item %d failed: %s", index, e)
+                record = {"index": index, "status": "error", "error": str(e)}
+            completed.put_nowait(record)
+
+    workers = [
+        asyncio.create_task(consume())
+        for _ in range(max(1, min(max_concurrency, len(items))))
+    ]
+    try:
+        for _ in range(len(items)):
+            yield await completed.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
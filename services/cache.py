@@ -0,0 +1,351 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class CacheBackend:
+    """
+    Storage interface for TTLCache. Values must be JSON-serializable so that every
+    backend can store them. Backends enforce their own size bounds by evicting the
+    least recently used entries.
+    """
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def update(
+        self, key: str, func: Callable[[Optional[Any]], Any], ttl_seconds: float
+    ) -> Any:
+        """
+        Stores `func(current value or None)` under key as one atomic step and
+        returns the new value.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU store bounded by entry count and by the approximate size of the
+    serialized values.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._total_bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._store(key, value, ttl_seconds)
+
+    def update(
+        self, key: str, func: Callable[[Optional[Any]], Any], ttl_seconds: float
+    ) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            current = entry[0] if entry is not None and entry[1] > time.time() else None
+            value = func(current)
+            self._store(key, value, ttl_seconds)
+        return value
+
+    def _store(self, key: str, value: Any, ttl_seconds: float) -> None:
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)[2]
+        self._entries[key] = (value, time.time() + ttl_seconds, size)
+        self._total_bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or self._total_bytes > self.max_bytes
+        ):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    On-disk LRU store backed by a local SQLite file, so cached entries survive a
+    restart. Bounded by entry count and by the total size of the stored values.
+
+    Hits do not write to the file: their access times are buffered and written in
+    one batch every access_flush_seconds (or access_flush_entries hits), and
+    before entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        access_flush_seconds: float = 5.0,
+        access_flush_entries: int = 256,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.access_flush_seconds = access_flush_seconds
+        self.access_flush_entries = access_flush_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries (last_access)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._pending_access: Dict[str, float] = {}
+        self._last_flush = time.time()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._pending_access.pop(key, None)
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._pending_access[key] = now
+            if (
+                len(self._pending_access) >= self.access_flush_entries
+                or now - self._last_flush >= self.access_flush_seconds
+            ):
+                self._flush_access(now)
+                self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        serialized = json.dumps(value)
+        if len(serialized) > self.max_bytes:
+            return
+        with self._lock:
+            self._store(key, serialized, ttl_seconds)
+            self._conn.commit()
+
+    def update(
+        self, key: str, func: Callable[[Optional[Any]], Any], ttl_seconds: float
+    ) -> Any:
+        # One write transaction, so concurrent updates from other workers sharing
+        # the file are not lost.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                ).fetchone()
+                value = func(json.loads(row[0]) if row is not None else None)
+                serialized = json.dumps(value)
+                if len(serialized) <= self.max_bytes:
+                    self._store(key, serialized, ttl_seconds)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return value
+
+    def _store(self, key: str, serialized: str, ttl_seconds: float) -> None:
+        """
+        Writes an entry and evicts; the caller holds the lock and commits.
+        """
+        now = time.time()
+        self._pending_access.pop(key, None)
+        self._flush_access(now)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, serialized, len(serialized), now + ttl_seconds, now),
+        )
+        self._conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+        self._evict()
+
+    def _flush_access(self, now: float) -> None:
+        """
+        Writes the buffered access times; the caller holds the lock and commits.
+        """
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE cache_entries SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._pending_access.items()],
+            )
+            self._pending_access.clear()
+        self._last_flush = now
+
+    def _evict(self) -> None:
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM cache_entries ORDER BY last_access ASC"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total_bytes -= size
+        self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pending_access.pop(key, None)
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending_access.clear()
+            self._conn.execute("DELETE FROM cache_entries")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+class TTLCache:
+    """
+    Key/value cache with per-entry TTL expiry on top of a pluggable backend.
+    Tracks hit and miss counts.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float, name: str = "cache"):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self.backend.set(
+            key, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+
+    def update(
+        self,
+        key: str,
+        func: Callable[[Optional[Any]], Any],
+        ttl_seconds: Optional[float] = None,
+    ) -> Any:
+        """
+        Replaces the value of key with `func(current value or None)` atomically,
+        also against other workers sharing a SQLite backend, and returns it.
+        """
+        return self.backend.update(
+            key, func, self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+def build_cache(
+    name: str,
+    backend: str,
+    ttl_seconds: float,
+    max_entries: int,
+    max_bytes: int,
+    sqlite_path: str,
+) -> Optional[TTLCache]:
+    """
+    Creates a TTLCache with the configured backend ('memory' or 'sqlite').
+    Returns None if caching is disabled ('none' or an empty value).
+    """
+    backend = (backend or "none").lower()
+    if backend == "memory":
+        store = MemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes)
+    elif backend == "sqlite":
+        store = SQLiteCacheBackend(
+            sqlite_path, max_entries=max_entries, max_bytes=max_bytes
+        )
+    elif backend == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown cache backend '{backend}' for {name}.")
+    return TTLCache(store, ttl_seconds=ttl_seconds, name=name)
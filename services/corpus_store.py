@@ -0,0 +1,255 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from services.retrieval import (
+    bm25_scores,
+    chunk_documents,
+    select_within_budget,
+    tokenize,
+)
+
+
+class CorpusNotFoundError(KeyError):
+    """
+    Raised when a query references a corpus ID that has not been registered.
+    """
+
+
+def compute_corpus_id(documents_list: List[str]) -> str:
+    """
+    Derives a stable corpus ID from the document contents, so registering the
+    same documents twice returns the same ID without re-indexing them.
+    """
+    digest = hashlib.sha256()
+    for document in documents_list:
+        encoded = document.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()[:32]
+
+
+class CorpusStore:
+    """
+    Stores registered document corpora in a local SQLite file together with a
+    chunk-level inverted index, so queries against a corpus only read the
+    postings of the query terms instead of re-uploading and re-chunking the
+    documents on every request.
+    """
+
+    def __init__(self, path: str, chunk_tokens: int, overlap_tokens: int):
+        self.path = path
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS corpora (
+                corpus_id TEXT PRIMARY KEY,
+                document_count INTEGER NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                average_length REAL NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                corpus_id TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                doc_index INTEGER NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (corpus_id, chunk_id)
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                corpus_id TEXT NOT NULL,
+                term TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                frequency INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (corpus_id, term);
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def add_corpus(self, documents_list: List[str]) -> Dict[str, object]:
+        """
+        Chunks, tokenizes and indexes a list of documents.
+
+        Args:
+            documents_list (List[str]): The documents to register.
+
+        Returns:
+            Dict[str, object]: The corpus metadata, including its 'corpus_id'.
+        """
+        corpus_id = compute_corpus_id(documents_list)
+        existing = self.get_corpus(corpus_id)
+        if existing is not None:
+            return existing
+
+        chunks = chunk_documents(
+            [Document(page_content=doc) for doc in documents_list],
+            self.chunk_tokens,
+            self.overlap_tokens,
+        )
+        chunk_rows = []
+        posting_rows = []
+        total_length = 0
+        for chunk_id, chunk in enumerate(chunks):
+            terms = tokenize(chunk.page_content)
+            frequencies: Dict[str, int] = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            posting_rows.extend(
+                (corpus_id, term, chunk_id, frequency)
+                for term, frequency in frequencies.items()
+            )
+            chunk_rows.append(
+                (
+                    corpus_id,
+                    chunk_id,
+                    chunk.metadata["doc_index"],
+                    chunk.metadata["chunk_index"],
+                    len(terms),
+                    chunk.page_content,
+                )
+            )
+            total_length += len(terms)
+
+        metadata = {
+            "corpus_id": corpus_id,
+            "document_count": len(documents_list),
+            "chunk_count": len(chunks),
+            "average_length": total_length / len(chunks) if chunks else 0.0,
+            "created_at": time.time(),
+        }
+        # The same documents may be registered concurrently (by another thread
+        # or worker process): check again and insert in one write transaction,
+        # and let the first registration win.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._select_corpus(corpus_id)
+                if existing is None:
+                    self._conn.executemany(
+                        "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", chunk_rows
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO postings VALUES (?, ?, ?, ?)", posting_rows
+                    )
+                    self._conn.execute(
+                        "INSERT INTO corpora VALUES (:corpus_id, :document_count, :chunk_count, "
+                        ":average_length, :created_at)",
+                        metadata,
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return existing if existing is not None else metadata
+
+    def get_corpus(self, corpus_id: str) -> Optional[Dict[str, object]]:
+        """
+        Returns the metadata of a registered corpus, or None if it does not exist.
+        """
+        with self._lock:
+            return self._select_corpus(corpus_id)
+
+    def _select_corpus(self, corpus_id: str) -> Optional[Dict[str, object]]:
+        row = self._conn.execute(
+            "SELECT corpus_id, document_count, chunk_count, average_length, created_at "
+            "FROM corpora WHERE corpus_id = ?",
+            (corpus_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("corpus_id", "document_count", "chunk_count", "average_length", "created_at")
+        return dict(zip(keys, row))
+
+    def delete_corpus(self, corpus_id: str) -> bool:
+        """
+        Removes a corpus and its index. Returns False if it did not exist.
+        """
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM corpora WHERE corpus_id = ?", (corpus_id,)
+            ).rowcount
+            self._conn.execute("DELETE FROM chunks WHERE corpus_id = ?", (corpus_id,))
+            self._conn.execute("DELETE FROM postings WHERE corpus_id = ?", (corpus_id,))
+            self._conn.commit()
+        return bool(deleted)
+
+    def search(
+        self, corpus_id: str, query: str, top_k: int, token_budget: int
+    ) -> List[Document]:
+        """
+        Ranks the chunks of a registered corpus against the query with BM25 and
+        returns the best top_k chunks that fit into token_budget, in document order.
+
+        Raises:
+            CorpusNotFoundError: If the corpus ID is unknown.
+        """
+        corpus = self.get_corpus(corpus_id)
+        if corpus is None:
+            raise CorpusNotFoundError(corpus_id)
+
+        terms = list(set(tokenize(query)))
+        query_postings: Dict[str, List[Tuple[int, int]]] = {}
+        chunk_lengths: Dict[int, int] = {}
+        with self._lock:
+            if terms:
+                placeholders = ", ".join("?" for _ in terms)
+                rows = self._conn.execute(
+                    "SELECT p.term, p.chunk_id, p.frequency, c.length FROM postings p "
+                    "JOIN chunks c ON c.corpus_id = p.corpus_id AND c.chunk_id = p.chunk_id "
+                    f"WHERE p.corpus_id = ? AND p.term IN ({placeholders})",
+                    (corpus_id, *terms),
+                ).fetchall()
+                for term, chunk_id, frequency, length in rows:
+                    query_postings.setdefault(term, []).append((chunk_id, frequency))
+                    chunk_lengths[chunk_id] = length
+
+        scores = bm25_scores(
+            query_postings,
+            chunk_lengths.__getitem__,
+            corpus["chunk_count"],
+            corpus["average_length"],
+        )
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        # Nothing matched: fall back to the leading chunks of the corpus.
+        candidate_ids = [chunk_id for chunk_id, _ in ranked] or list(range(top_k))
+        chunks = self._load_chunks(corpus_id, candidate_ids)
+        ranked_chunks = [chunks[chunk_id] for chunk_id in candidate_ids if chunk_id in chunks]
+        return select_within_budget(
+            ranked_chunks,
+            [(position, 0.0) for position in range(len(ranked_chunks))],
+            top_k,
+            token_budget,
+        )
+
+    def _load_chunks(self, corpus_id: str, chunk_ids: List[int]) -> Dict[int, Document]:
+        if not chunk_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in chunk_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, doc_index, chunk_index, text FROM chunks "
+                f"WHERE corpus_id = ? AND chunk_id IN ({placeholders})",
+                (corpus_id, *chunk_ids),
+            ).fetchall()
+        return {
+            chunk_id: Document(
+                page_content=text,
+                metadata={"doc_index": doc_index, "chunk_index": chunk_index},
+            )
+            for chunk_id, doc_index, chunk_index, text in rows
+        }
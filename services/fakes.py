@@ -0,0 +1,273 @@
+"""
+Deterministic local stand-ins for the OpenAI chat model and the Tavily search
+tool, selected with LLM_PROVIDER=fake and SEARCH_PROVIDER=fake. They let the
+whole service run (and be load-tested) offline without spending API quota.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field, PrivateAttr
+
+# Rough characters-per-token ratio, as in services.tokens.
+CHARS_PER_TOKEN = 4
+
+WORDS = (
+    "agent data model answer source search result document summary keyword "
+    "system request latency network service response context query value "
+    "signal update report market policy research energy health climate"
+).split()
+
+
+def parse_latency(spec: str, seed: Optional[int] = None) -> Callable[[], float]:
+    """
+    Parses a latency distribution into a sampler returning seconds.
+
+    Supported forms: "0.5" (fixed), "uniform:0.2,1.0", "normal:0.8,0.2" (mean,
+    standard deviation) and "lognormal:0.8,0.5" (median, sigma; long right tail,
+    the usual shape of LLM latencies). Samples are never negative.
+
+    Args:
+        spec (str): The distribution.
+        seed (Optional[int]): Seed for reproducible samples.
+
+    Returns:
+        Callable[[], float]: A function returning one latency sample.
+    """
+    rng = random.Random(seed)
+    kind, _, params = spec.strip().partition(":")
+    if not params:
+        fixed = float(kind or 0)
+        return lambda: fixed
+    values = [float(value) for value in params.split(",")]
+    kind = kind.lower()
+    if kind == "uniform":
+        low, high = values
+        return lambda: rng.uniform(low, high)
+    if kind == "normal":
+        mean, deviation = values
+        return lambda: max(0.0, rng.gauss(mean, deviation))
+    if kind == "lognormal":
+        median, sigma = values
+        mu = math.log(median) if median > 0 else 0.0
+        return lambda: rng.lognormvariate(mu, sigma) if median > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution '{spec}'.")
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def _fake_text(seed_text: str, words: int) -> str:
+    rng = random.Random(_digest(seed_text))
+    return " ".join(rng.choice(WORDS) for _ in range(max(1, words)))
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers after a latency sampled from `latency` with text
+    derived deterministically from the prompt, so identical prompts get
+    identical answers (and hit the LLM cache like real ones would).
+
+    - With tools bound (the router), it emits a tool call chosen from keywords in
+      the last user message: "summarize"/"summary" -> summarize_document,
+      "corpus" -> answer_query_from_corpus, "question:"/"context" ->
+      answer_query_from_documents, anything else -> search_internet.
+    - For the orchestrator's final-response prompt it answers in the expected
+      "**Answer:** ... **Justification for Tool Selection:** ..." format.
+    - Streaming yields one word per chunk, paced at `tokens_per_second`.
+    - Responses carry usage metadata (estimated from characters).
+    """
+
+    model_name: str = "fake-chat-model"
+    reply: Optional[str] = None
+    latency: str = "0"
+    output_tokens: int = 64
+    tokens_per_second: float = 0.0
+    seed: Optional[int] = None
+    calls: int = Field(default=0, exclude=True)
+    _sample_latency: Callable[[], float] = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._sample_latency = parse_latency(self.latency, self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _text_reply(self, prompt: str) -> str:
+        if self.reply is not None:
+            return self.reply
+        if "**Justification for Tool Selection:**" in prompt:
+            return (
+                f"**Answer:**\n{_fake_text(prompt, self.output_tokens)}\n\n"
+                "**Justification for Tool Selection:**\n"
+                "The tool matches the request."
+            )
+        return _fake_text(prompt, self.output_tokens)
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[list]) -> AIMessage:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if tools:
+            user_message = next(
+                (m.content for m in reversed(messages) if isinstance(m, HumanMessage)), ""
+            )
+            message = AIMessage(
+                content="The tool matches the request.",
+                tool_calls=[self._tool_call(user_message)],
+            )
+        else:
+            message = AIMessage(content=self._text_reply(prompt))
+        input_tokens = max(1, len(prompt) // CHARS_PER_TOKEN)
+        output_tokens = max(1, len(str(message.content)) // CHARS_PER_TOKEN)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return message
+
+    @staticmethod
+    def _tool_call(prompt: str) -> dict:
+        lowered = prompt.lower()
+        if "summarize" in lowered or "summary" in lowered:
+            name, args = "summarize_document", {"document_text": prompt}
+        elif "corpus" in lowered:
+            corpus_id = prompt.rsplit(None, 1)[-1] if prompt.split() else ""
+            name, args = "answer_query_from_corpus", {
+                "user_query": prompt,
+                "corpus_id": corpus_id,
+            }
+        elif "question:" in lowered or "context" in lowered:
+            name, args = "answer_query_from_documents", {
+                "user_query": prompt,
+                "documents_list": [prompt],
+            }
+        else:
+            name, args = "search_internet", {"user_query": prompt}
+        return {"name": name, "args": args, "id": f"call_{_digest(prompt) % 10**8}"}
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any):
+        self.calls += 1
+        time.sleep(self._sample_latency())
+        return ChatResult(
+            generations=[ChatGeneration(message=self._respond(messages, tools))]
+        )
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any
+    ):
+        self.calls += 1
+        await asyncio.sleep(self._sample_latency())
+        return ChatResult(
+            generations=[ChatGeneration(message=self._respond(messages, tools))]
+        )
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        await asyncio.sleep(self._sample_latency())
+        message = self._respond(messages, tools)
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=message.content,
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": index,
+                        }
+                        for index, call in enumerate(message.tool_calls)
+                    ],
+                    usage_metadata=message.usage_metadata,
+                )
+            )
+            return
+
+        words = message.content.split(" ")
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for index, word in enumerate(words):
+            if delay:
+                await asyncio.sleep(delay)
+            text = word if index == 0 else f" {word}"
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=text,
+                    usage_metadata=message.usage_metadata if index == 0 else None,
+                )
+            )
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+class FakeSearchTool:
+    """
+    Stand-in for TavilySearch: `ainvoke({"query": ...})` returns a response in
+    Tavily's shape after a latency sampled from `latency`. Results come from
+    `canned_results` when the query is found there (exact query, or "*" for
+    every query), otherwise they are generated deterministically from the query.
+    """
+
+    def __init__(
+        self,
+        latency: str = "0",
+        max_results: int = 5,
+        canned_results: Optional[Dict[str, List[dict]]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.max_results = max_results
+        self.canned_results = canned_results or {}
+        self.calls = 0
+        self._sample_latency = parse_latency(latency, seed)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "FakeSearchTool":
+        """
+        Loads canned results from a JSON file mapping queries to result lists.
+        """
+        with open(path, encoding="utf-8") as canned_file:
+            return cls(canned_results=json.load(canned_file), **kwargs)
+
+    def _results(self, query: str) -> List[dict]:
+        canned = self.canned_results.get(query, self.canned_results.get("*"))
+        if canned is not None:
+            return canned[: self.max_results]
+        return [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "url": f"https://example.com/{_digest(query) % 10**8}/{i + 1}",
+                "content": _fake_text(f"{query}:{i}", 40),
+                "score": round(1 - i / (self.max_results + 1), 3),
+            }
+            for i in range(self.max_results)
+        ]
+
+    async def ainvoke(self, tool_input: Dict[str, Any], *args: Any, **kwargs: Any) -> dict:
+        self.calls += 1
+        started = time.perf_counter()
+        await asyncio.sleep(self._sample_latency())
+        query = tool_input.get("query", "")
+        return {
+            "query": query,
+            "results": self._results(query),
+            "response_time": round(time.perf_counter() - started, 3),
+        }
+
+    def invoke(self, tool_input: Dict[str, Any], *args: Any, **kwargs: Any) -> dict:
+        return asyncio.run(self.ainvoke(tool_input))
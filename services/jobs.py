@@ -0,0 +1,489 @@
+"""
+Asynchronous jobs: long agent runs (large documents, multi-tool prompts) are
+submitted, get a job ID immediately and run on a bounded pool of background
+workers, so no HTTP connection is held open while they run.
+
+Jobs are stored in a local SQLite file shared by the worker processes of a host;
+store calls run in threads, so waiting for another process's lock on the file
+never blocks the event loop. Each worker process claims queued jobs from it and refreshes a heartbeat for the
+jobs it runs. A job whose heartbeat stops (its process died) is queued again,
+up to JOB_MAX_ATTEMPTS runs; jobs interrupted by a shutdown are queued again
+right away. Finished jobs are deleted after JOB_TTL_SECONDS.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from config import settings
+from services.lazy import lazy
+from services.llm_scheduler import llm_priority
+from services.log import request_id
+from services.metrics import current_route, job_queue_wait, jobs_finished
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFullError(Exception):
+    """
+    Raised when a job is submitted while JOB_MAX_QUEUED jobs are waiting.
+    """
+
+
+class JobStore:
+    """
+    Jobs in a local SQLite file: their request, status, partial output and
+    result.
+
+    Args:
+        path (str): The SQLite file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                route TEXT NOT NULL,
+                request TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                partial TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, route: str, request: Dict[str, Any], max_queued: int) -> str:
+        """
+        Stores a new queued job and returns its ID.
+
+        Raises:
+            JobQueueFullError: max_queued jobs are already waiting.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            queued = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+            if queued >= max_queued:
+                raise JobQueueFullError(f"{queued} jobs are already queued.")
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, route, request, status, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, route, json.dumps(request), time.time()),
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        """
+        Marks the oldest queued job as running for `owner` and returns it, or
+        returns None if no job is queued. Safe across processes.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                        (owner, now, now, row["job_id"]),
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return self._decode(row) if row is not None else None
+
+    # Updates by a job's runner only apply while it still owns the run: after
+    # recover() queued the job again, another worker may be running it.
+
+    def save_partial(self, job_id: str, owner: str, partial: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET partial = ? WHERE job_id = ? AND owner = ? "
+                "AND status = 'running'",
+                (json.dumps(partial), job_id, owner),
+            )
+            self._conn.commit()
+
+    def finish(
+        self,
+        job_id: str,
+        owner: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        """
+        Records the outcome of a run. Returns False if `owner` no longer owns
+        the job (nothing is changed then).
+        """
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner = NULL "
+                "WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                    owner,
+                ),
+            ).rowcount
+            self._conn.commit()
+        return bool(updated)
+
+    def requeue(self, job_id: str, owner: str) -> None:
+        """
+        Puts an interrupted job back in the queue, keeping its place.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE job_id = ? "
+                "AND owner = ? AND status = 'running'",
+                (job_id, owner),
+            )
+            self._conn.commit()
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancels a queued job at once and flags a running one for its worker.
+        Returns the job's status afterwards, or None if there is no such job.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'",
+                (job_id,),
+            )
+            self._conn.commit()
+            row = self._conn.execute(
+                "SELECT status FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row["status"] if row is not None else None
+
+    def heartbeat(self, owner: str, job_ids: List[str]) -> List[str]:
+        """
+        Refreshes the heartbeat of the jobs `owner` runs and returns those of them
+        to stop: jobs whose cancellation was requested and jobs it no longer owns.
+        """
+        if not job_ids:
+            return []
+        placeholders = ", ".join("?" * len(job_ids))
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running' "
+                f"AND job_id IN ({placeholders})",
+                (time.time(), owner, *job_ids),
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                f"SELECT job_id FROM jobs WHERE owner = ? AND status = 'running' "
+                f"AND cancel_requested = 0 AND job_id IN ({placeholders})",
+                (owner, *job_ids),
+            ).fetchall()
+        keep = {row["job_id"] for row in rows}
+        return [job_id for job_id in job_ids if job_id not in keep]
+
+    def recover(self, stale_before: float, max_attempts: int) -> int:
+        """
+        Queues running jobs whose heartbeat is older than stale_before again, or
+        fails them after max_attempts runs. Returns the number queued again.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', owner = NULL, finished_at = ?, "
+                "error = 'The job was interrupted too many times.' "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (time.time(), stale_before, max_attempts),
+            )
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (stale_before,),
+            ).rowcount
+            self._conn.commit()
+        return requeued
+
+    def delete_finished(self, finished_before: float) -> int:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') "
+                "AND finished_at < ?",
+                (finished_before,),
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["count"] for row in rows}
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for field in ("request", "partial", "result"):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+
+# Starts a job: receives the stored request and returns the agent's stream
+# events (see services.streaming.stream_graph_events).
+JobRunner = Callable[[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]
+
+
+class JobQueue:
+    """
+    Runs stored jobs on a fixed number of worker tasks in this process.
+
+    Partial output (LLM tokens per graph node and the nodes finished so far) is
+    saved while a job runs, at most every `partial_interval` seconds. LLM calls
+    of jobs are scheduled at "batch" priority.
+
+    Args:
+        store (JobStore): Where jobs are kept.
+        workers (int): Jobs run at the same time by this process.
+        timeout_seconds (float): Running time after which a job fails.
+        heartbeat_seconds (float): How often running jobs report that they are
+            alive; three missed heartbeats mark a job as orphaned.
+        max_attempts (int): Runs of an orphaned job before it fails.
+        ttl_seconds (float): How long finished jobs are kept.
+        partial_interval (float): Minimum seconds between partial output saves.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int,
+        timeout_seconds: float,
+        heartbeat_seconds: float,
+        max_attempts: int,
+        ttl_seconds: float,
+        partial_interval: float = 1.0,
+    ):
+        self.store = store
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.partial_interval = partial_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.runners: Dict[str, JobRunner] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, runner: JobRunner) -> None:
+        self.runners[kind] = runner
+
+    async def submit(self, kind: str, request: Dict[str, Any]) -> str:
+        """
+        Stores a job and wakes a worker. Returns the job ID.
+
+        Raises:
+            JobQueueFullError: Too many jobs are waiting.
+        """
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind '{kind}'.")
+        job_id = await asyncio.to_thread(
+            self.store.create, kind, current_route.get(), request, settings.JOB_MAX_QUEUED
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancels a job. Returns its status afterwards ("cancelled", or "running"
+        until its worker has stopped it), or None if there is no such job.
+        """
+        status = await asyncio.to_thread(self.store.request_cancel, job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return status
+
+    async def start(self) -> None:
+        """
+        Starts the workers and the maintenance loop (heartbeats, cancellation of
+        jobs running here, recovery of orphaned jobs, deletion of old ones).
+        """
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+        logger.info("Started %d job workers (%s).", self.workers, self.owner)
+
+    async def stop(self) -> None:
+        """
+        Stops the workers. Jobs they were running are queued again.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        llm_priority.set("batch")
+        while True:
+            self._wakeup.clear()
+            job = await asyncio.to_thread(self.store.claim, self.owner)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        request_id.set(job_id)
+        current_route.set(job["route"])
+        job_queue_wait.labels(job["kind"]).observe(time.time() - job["created_at"])
+        logger.info("Running job %s (%s, attempt %d).", job_id, job["kind"], job["attempts"] + 1)
+
+        task = asyncio.create_task(self._execute(job))
+        self._running[job_id] = task
+        try:
+            done, _ = await asyncio.wait({task}, timeout=self.timeout_seconds)
+        except asyncio.CancelledError:
+            # Shutdown: stop the job and leave it for the next start.
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.to_thread(self.store.requeue, job_id, self.owner)
+            raise
+        finally:
+            self._running.pop(job_id, None)
+
+        if not done:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            status, result, error = "failed", None, f"Timed out after {self.timeout_seconds}s."
+        elif task.cancelled():
+            status, result, error = "cancelled", None, None
+        elif task.exception() is not None:
+            logger.warning("Job %s failed: %s", job_id, task.exception())
+            status, result, error = "failed", None, str(task.exception())
+        elif "error" in task.result():
+            status, result, error = "failed", None, str(task.result()["error"])
+        else:
+            status, result, error = "succeeded", task.result(), None
+        owned = await asyncio.to_thread(
+            self.store.finish, job_id, self.owner, status, result, error
+        )
+        if not owned:
+            # Queued again by recover() (e.g. missed heartbeats) and now another
+            # worker's run; that run records the outcome.
+            logger.warning("Job %s was taken over by another worker; dropped this run.", job_id)
+            return
+        jobs_finished.labels(job["kind"], status).inc()
+        logger.info("Job %s %s.", job_id, status)
+
+    async def _execute(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        partial: Dict[str, Any] = {"nodes": [], "output": {}}
+        saved_at = time.monotonic()
+        async with aclosing(self.runners[job["kind"]](job["request"])) as events:
+            async for event in events:
+                data = event["data"]
+                if event["event"] == "result":
+                    return data
+                if event["event"] == "token":
+                    node = data["node"] or "-"
+                    partial["output"][node] = partial["output"].get(node, "") + data["content"]
+                elif event["event"] == "node_end":
+                    partial["nodes"].append(data["node"])
+                if (
+                    event["event"] == "node_end"
+                    or time.monotonic() - saved_at >= self.partial_interval
+                ):
+                    await asyncio.to_thread(
+                        self.store.save_partial, job["job_id"], self.owner, partial
+                    )
+                    saved_at = time.monotonic()
+        raise RuntimeError("The agent finished without a result.")
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                stop = await asyncio.to_thread(
+                    self.store.heartbeat, self.owner, list(self._running)
+                )
+                for job_id in stop:
+                    task = self._running.get(job_id)
+                    if task is not None:
+                        task.cancel()
+                now = time.time()
+                requeued = await asyncio.to_thread(
+                    self.store.recover, now - 3 * self.heartbeat_seconds, self.max_attempts
+                )
+                if requeued:
+                    self._wakeup.set()
+                await asyncio.to_thread(self.store.delete_finished, now - self.ttl_seconds)
+            except sqlite3.Error as e:
+                logger.warning("Job maintenance failed: %s", e)
+
+
+# The SQLite file is opened on first use (see services.lazy), not at import.
+@lazy
+def job_store():
+    return JobStore(settings.JOB_STORE_PATH)
+
+
+job_queue = JobQueue(
+    store=job_store,
+    workers=settings.JOB_WORKERS,
+    timeout_seconds=settings.JOB_TIMEOUT_SECONDS,
+    heartbeat_seconds=settings.JOB_HEARTBEAT_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    ttl_seconds=settings.JOB_TTL_SECONDS,
+)
@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class LazyObject:
+    """
+    Module-level object that is only built on first use. Attribute access is
+    forwarded to the built object, so `summary_chain.ainvoke(...)` works the same
+    whether summary_chain is a chain or a LazyObject that builds one. Used for
+    LLM clients, chains, tools and compiled graphs, which are slow to construct
+    and would otherwise add to the import (worker boot) time.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._name = f"{factory.__module__}.{factory.__name__}"
+        self._lock = threading.Lock()
+        self._wrapped = None
+        self._built = False
+        _registry.append(self)
+
+    def unwrap(self) -> Any:
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    started = time.perf_counter()
+                    self._wrapped = self._factory()
+                    self._built = True
+                    logger.debug(
+                        "Built %s in %.3fs", self._name, time.perf_counter() - started
+                    )
+        return self._wrapped
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.unwrap(), name)
+
+    def __repr__(self) -> str:
+        state = repr(self._wrapped) if self._built else "not built"
+        return f"<LazyObject {self._name}: {state}>"
+
+
+_registry: List[LazyObject] = []
+
+
+def lazy(factory: Callable[[], Any]) -> LazyObject:
+    """
+    Decorator turning a zero-argument factory function into a LazyObject of the
+    same name.
+    """
+    return LazyObject(factory)
+
+
+def warm_up() -> float:
+    """
+    Builds every LazyObject of the imported modules. Called from the application
+    lifespan so the first requests do not pay the construction cost.
+
+    Returns:
+        float: Seconds spent building.
+    """
+    started = time.perf_counter()
+    for lazy_object in list(_registry):
+        lazy_object.unwrap()
+    return time.perf_counter() - started
@@ -0,0 +1,119 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from config import settings
+from services.cache import TTLCache, build_cache
+from services.tokens import count_tokens
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain cache for chat model responses, keyed by a hash of the model
+    configuration (model name and invocation parameters, including bound tools)
+    and the rendered prompt. Several chains can share one store while keeping
+    their own TTL and their own hit/saved-token statistics.
+    """
+
+    def __init__(self, store: TTLCache, chain_name: str, ttl_seconds: float):
+        self.store = store
+        self.chain_name = chain_name
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        entry = self.store.get(self.make_key(prompt, llm_string))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_tokens += entry["tokens"]
+        return [
+            ChatGeneration(message=message)
+            for message in messages_from_dict(entry["messages"])
+        ]
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: Sequence[Generation]
+    ) -> None:
+        messages = [g.message for g in return_val if isinstance(g, ChatGeneration)]
+        if len(messages) != len(return_val):
+            return
+        tokens = 0
+        for message in messages:
+            usage = getattr(message, "usage_metadata", None) or {}
+            tokens += usage.get("total_tokens") or (
+                count_tokens(prompt) + count_tokens(str(message.content))
+            )
+        self.store.set(
+            self.make_key(prompt, llm_string),
+            {"messages": [message_to_dict(m) for m in messages], "tokens": tokens},
+            ttl_seconds=self.ttl_seconds,
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "chain": self.chain_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
+
+
+# One store shared by every opted-in chain; identical prompts to the same model
+# configuration hit the same entry whichever chain produced them.
+_shared_store = build_cache(
+    name="llm",
+    backend=settings.LLM_CACHE_BACKEND,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES,
+    sqlite_path=settings.LLM_CACHE_PATH,
+)
+_enabled_chains = {
+    name.strip() for name in settings.LLM_CACHE_CHAINS.split(",") if name.strip()
+}
+_chain_caches: Dict[str, LLMResponseCache] = {}
+
+
+def cached_llm(llm, chain_name: str):
+    """
+    Returns the LLM to use for a chain: a copy of llm with the shared response
+    cache attached if the chain is listed in LLM_CACHE_CHAINS, otherwise llm itself.
+
+    Args:
+        llm: The shared chat model (settings.llm).
+        chain_name (str): Name of the chain, e.g. "summary" or "router".
+    """
+    if _shared_store is None or chain_name not in _enabled_chains:
+        return llm
+    cache = _chain_caches.get(chain_name)
+    if cache is None:
+        cache = LLMResponseCache(
+            _shared_store,
+            chain_name,
+            settings.LLM_CACHE_CHAIN_TTLS.get(chain_name, settings.LLM_CACHE_TTL_SECONDS),
+        )
+        _chain_caches[chain_name] = cache
+    return llm.model_copy(update={"cache": cache})
+
+
+def llm_cache_stats() -> List[Dict[str, Any]]:
+    """
+    Returns the hit ratio and saved tokens of every chain with caching enabled.
+    """
+    return [cache.stats() for cache in _chain_caches.values()]
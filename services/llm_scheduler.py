@@ -0,0 +1,336 @@
+"""
+Scheduler in front of the shared chat model. Every LLM call waits for a slot:
+at most LLM_MAX_CONCURRENCY calls are in flight, and token buckets keep the
+request and token rates under LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE.
+Waiting calls are served by priority ("interactive" before "batch"), then in
+arrival order. Rate-limit and transient provider errors are retried with
+exponential backoff and jitter; a 429 also pauses dispatch for every caller, so
+a burst backs off together instead of retrying into the limit.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, List, Optional, Union
+
+from config import settings
+from services.lazy import lazy
+from services.metrics import llm_in_flight, llm_queue_wait, llm_retries
+from services.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Scheduling class of the LLM calls made by the current task. Batch routes set
+# "batch"; everything else is served as "interactive". Work shared by several
+# callers (services.singleflight) sets a callable instead, since its class can
+# change while it runs.
+llm_priority: ContextVar[Union[str, Callable[[], str]]] = ContextVar(
+    "llm_priority", default="interactive"
+)
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+def current_priority() -> str:
+    """
+    Returns the scheduling class of the LLM calls made by the current task.
+    """
+    priority = llm_priority.get()
+    return priority() if callable(priority) else priority
+
+# HTTP statuses worth retrying: rate limits, timeouts and server-side errors.
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "TimeoutError"}
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute, holding
+    at most a minute's worth. A non-positive rate means unlimited.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """
+        Seconds until `amount` tokens are available (0 if they are now).
+        Requests larger than the bucket only wait for a full bucket.
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.rate > 0:
+            self._refill()
+            self.tokens -= amount
+
+    def give_back(self, amount: float) -> None:
+        """
+        Returns over-reserved tokens, or charges extra ones if `amount` is negative.
+        """
+        if self.rate > 0:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LLMScheduler:
+    """
+    Admits LLM calls by priority under concurrency, request-rate and token-rate
+    limits.
+
+    Args:
+        max_concurrency (int): Maximum number of calls in flight.
+        requests_per_minute (float): Request rate limit (0 for none).
+        tokens_per_minute (float): Token rate limit (0 for none).
+    """
+
+    def __init__(
+        self, max_concurrency: int, requests_per_minute: float, tokens_per_minute: float
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _dispatch(self) -> None:
+        """
+        Admits waiting calls, highest priority first, while limits allow. When the
+        next call has to wait for the buckets or a pause, re-runs itself then.
+        """
+        self._timer = None
+        while self._waiting and self.in_flight < self.max_concurrency:
+            _, _, tokens, future = self._waiting[0]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self._waiting)
+                continue
+            delay = max(
+                self.paused_until - time.monotonic(),
+                self.requests.delay(1),
+                self.tokens.delay(tokens),
+            )
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiting)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            llm_in_flight.set(self.in_flight)
+            future.set_result(None)
+
+    def _wake(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    async def acquire(self, tokens: int, priority: str) -> None:
+        """
+        Waits until a call estimated at `tokens` tokens may start.
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiting,
+            (PRIORITIES.get(priority, 0), next(self._sequence), tokens, future),
+        )
+        started = time.perf_counter()
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            llm_queue_wait.labels(priority).observe(time.perf_counter() - started)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        llm_in_flight.set(self.in_flight)
+        self._wake()
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stops admitting calls for `seconds` (after the provider reported a rate limit).
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority: Optional[str] = None):
+        """
+        Holds one admitted call for the duration of the `async with` block.
+        """
+        await self.acquire(tokens, priority or current_priority())
+        try:
+            yield
+        finally:
+            self.release()
+
+
+@lazy
+def scheduler():
+    """
+    The scheduler shared by every chat model call, configured from settings.
+    """
+    return LLMScheduler(
+        settings.LLM_MAX_CONCURRENCY,
+        settings.LLM_REQUESTS_PER_MINUTE,
+        settings.LLM_TOKENS_PER_MINUTE,
+    )
+
+
+def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Returns how long to wait before retrying a failed call, or None if the error
+    is not retryable. Honours the provider's Retry-After header; otherwise uses
+    exponential backoff with full jitter.
+
+    Args:
+        error (Exception): The error raised by the provider client.
+        attempt (int): Number of attempts made so far, starting at 1.
+    """
+    status = getattr(error, "status_code", None)
+    if status not in RETRYABLE_STATUSES and type(error).__name__ not in RETRYABLE_ERRORS:
+        return None
+    backoff = min(
+        settings.LLM_RETRY_MAX_SECONDS,
+        settings.LLM_RETRY_BASE_SECONDS * 2 ** (attempt - 1),
+    )
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after", ""))
+    except ValueError:
+        retry_after = None
+    if retry_after is not None:
+        return retry_after + random.uniform(0, settings.LLM_RETRY_BASE_SECONDS)
+    return random.uniform(0, backoff)
+
+
+def estimate_tokens(messages) -> int:
+    """
+    Tokens to reserve for a call: the prompt plus LLM_EXPECTED_OUTPUT_TOKENS.
+    Reconciled with the reported usage once the call completes.
+    """
+    return (
+        sum(count_tokens(str(message.content)) for message in messages)
+        + settings.LLM_EXPECTED_OUTPUT_TOKENS
+    )
+
+
+def _backoff(error: Exception, attempt: int) -> Optional[float]:
+    if attempt > settings.LLM_MAX_RETRIES:
+        return None
+    delay = retry_delay(error, attempt)
+    if delay is None:
+        return None
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        scheduler.pause(delay)
+    llm_retries.labels(str(status or type(error).__name__)).inc()
+    logger.warning(
+        "LLM call failed (%s); retry %d/%d in %.2fs",
+        status or type(error).__name__,
+        attempt,
+        settings.LLM_MAX_RETRIES,
+        delay,
+    )
+    return delay
+
+
+def _usage_tokens(message) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+class ScheduledChatModelMixin:
+    """
+    Routes a chat model's async calls through the shared scheduler, with retries.
+    Mixed in ahead of the model class by `scheduled`; the provider client's own
+    retries should be disabled (max_retries=0) so that only one layer retries.
+    """
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        generate = super()._agenerate
+        reserved = estimate_tokens(messages)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with scheduler.slot(reserved):
+                    result = await generate(
+                        messages, stop=stop, run_manager=run_manager, **kwargs
+                    )
+            except Exception as e:
+                delay = _backoff(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            used = sum(
+                _usage_tokens(generation.message) or 0 for generation in result.generations
+            )
+            if used:
+                scheduler.tokens.give_back(reserved - used)
+            return result
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator:
+        stream = super()._astream
+        reserved = estimate_tokens(messages)
+        attempt = 0
+        while True:
+            attempt += 1
+            used = 0
+            yielded = False
+            try:
+                async with scheduler.slot(reserved):
+                    async for chunk in stream(
+                        messages, stop=stop, run_manager=run_manager, **kwargs
+                    ):
+                        used += _usage_tokens(chunk.message) or 0
+                        yielded = True
+                        yield chunk
+            except Exception as e:
+                # Chunks already sent cannot be taken back, so only retry before the first.
+                delay = None if yielded else _backoff(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            if used:
+                scheduler.tokens.give_back(reserved - used)
+            return
+
+
+@lru_cache(maxsize=None)
+def scheduled(model_class: type) -> type:
+    """
+    Returns a subclass of the given chat model class whose calls go through the
+    shared scheduler, e.g. `scheduled(ChatOpenAI)(model=...)`.
+    """
+    return type(
+        f"Scheduled{model_class.__name__}",
+        (ScheduledChatModelMixin, model_class),
+        {"__module__": __name__},
+    )
@@ -0,0 +1,181 @@
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from config import settings
+
+# ID of the HTTP request being served, set by RequestIdMiddleware and attached to
+# every record logged while serving it (including from tool and sub-agent tasks).
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+_listener: Optional[QueueListener] = None
+
+
+class Payload:
+    """
+    Lazily rendered log argument. The value is only serialized and truncated when
+    a handler actually formats the record, so payload logging costs nothing when
+    the level is disabled.
+    """
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: Optional[int] = None):
+        self.value = value
+        self.max_chars = settings.LOG_PAYLOAD_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self) -> str:
+        if isinstance(self.value, str):
+            text = self.value
+        else:
+            try:
+                text = json.dumps(self.value, ensure_ascii=False, default=str)
+            except (TypeError, ValueError):
+                text = repr(self.value)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [truncated {len(text) - self.max_chars} chars]"
+        return text
+
+
+def log_payload(logger: logging.Logger, label: str, value: Any) -> None:
+    """
+    Logs a (possibly large) payload at DEBUG level, truncated to
+    LOG_PAYLOAD_MAX_CHARS and sampled at LOG_PAYLOAD_SAMPLE_RATE.
+
+    Args:
+        logger (logging.Logger): The module logger.
+        label (str): Short description of the payload.
+        value (Any): The payload; strings are logged as is, anything else as JSON.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if settings.LOG_PAYLOAD_SAMPLE_RATE < 1 and random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.debug("%s: %s", label, Payload(value), stacklevel=2)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler for the event loop thread. Only the message is rendered on the
+    caller's side (log arguments may be mutated after the call); JSON encoding
+    and the write to stdout happen on the listener thread. When the queue is full
+    the record is dropped instead of blocking the caller.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def setup_logging() -> None:
+    """
+    Routes all application logging through a bounded queue to a background
+    thread that writes to stdout. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+        )
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    root_logger = logging.getLogger()
+    root_logger.handlers = [NonBlockingQueueHandler(log_queue)]
+    root_logger.setLevel(settings.LOG_LEVEL)
+    # Uvicorn installs its own handlers; send its records through the queue too.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Flushes pending records and stops the background logging thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware that assigns every HTTP request an ID (the incoming
+    X-Request-ID header, or a new one), exposes it to the loggers and returns it
+    in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id")
+        current_id = incoming.decode("latin-1")[:128] if incoming else uuid.uuid4().hex
+        token = request_id.set(current_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-request-id", current_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,265 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Gauge, Histogram, Info
+
+# Route template of the HTTP request being served (e.g. "/agent1/summarize").
+# Set per request by InstrumentedRoute and inherited by every task the request
+# spawns, so node, LLM and tool metrics can be labelled by route.
+current_route: ContextVar[str] = ContextVar("current_route", default="none")
+
+# Buckets spanning cache hits (milliseconds) to long multi-tool LLM runs (minutes).
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300
+)
+
+http_request_duration = Histogram(
+    "auraa_http_request_duration_seconds",
+    "Time spent in the route handler.",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+node_duration = Histogram(
+    "auraa_graph_node_duration_seconds",
+    "Wall time of a LangGraph node.",
+    ["route", "graph", "node", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+llm_request_duration = Histogram(
+    "auraa_llm_request_duration_seconds",
+    "Latency of a chat model call.",
+    ["route", "node", "model", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+llm_tokens = Counter(
+    "auraa_llm_tokens_total",
+    "Prompt and completion tokens reported by the chat model.",
+    ["route", "node", "model", "type"],
+)
+tool_duration = Histogram(
+    "auraa_tool_duration_seconds",
+    "Wall time of an orchestrator tool call.",
+    ["route", "tool", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+search_request_duration = Histogram(
+    "auraa_search_request_duration_seconds",
+    "Latency of an internet (Tavily) search call, excluding cache hits.",
+    ["route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+search_cache_lookups = Counter(
+    "auraa_search_cache_lookups_total",
+    "Internet search cache lookups.",
+    ["result"],
+)
+prompt_tokens = Histogram(
+    "auraa_prompt_tokens",
+    "Tokens of a budgeted prompt part before ('input') and after ('sent') budgeting.",
+    ["part", "route", "stage"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072),
+)
+prompt_compactions = Counter(
+    "auraa_prompt_compactions_total",
+    "Snippets deduplicated, truncated or dropped to keep a prompt part within its budget.",
+    ["part", "action"],
+)
+summary_chunks = Counter(
+    "auraa_summary_chunks_total",
+    "Chunks processed by incremental summarization: 'reused' from the chunk store or 'summarized' by the LLM.",
+    ["result"],
+)
+coalesced_requests = Counter(
+    "auraa_coalesced_requests_total",
+    "Agent runs by single-flight role: 'leader' executed, 'follower' shared a leader's in-flight result.",
+    ["name", "role"],
+)
+router_decisions = Counter(
+    "auraa_router_decisions_total",
+    "How /process_query requests were routed: locally (lexical rules or routing cache) or by the router LLM.",
+    ["source"],
+)
+router_agreement = Counter(
+    "auraa_router_agreement_total",
+    "Local routing decisions checked against the router LLM.",
+    ["source", "result"],
+)
+session_tool_results = Counter(
+    "auraa_session_tool_results_total",
+    "Tool calls in /process_query sessions: 'reused' an earlier turn's output or 'computed'.",
+    ["tool", "result"],
+)
+job_queue_wait = Histogram(
+    "auraa_job_queue_wait_seconds",
+    "Time an asynchronous job waited in the queue before a worker started it.",
+    ["kind"],
+    buckets=LATENCY_BUCKETS,
+)
+jobs_finished = Counter(
+    "auraa_jobs_finished_total",
+    "Asynchronous jobs finished, by kind and final status.",
+    ["kind", "status"],
+)
+llm_queue_wait = Histogram(
+    "auraa_llm_queue_wait_seconds",
+    "Time a chat model call waited in the LLM scheduler before being sent.",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+llm_in_flight = Gauge(
+    "auraa_llm_in_flight",
+    "Chat model calls currently admitted by the LLM scheduler.",
+)
+llm_retries = Counter(
+    "auraa_llm_retries_total",
+    "Chat model calls retried after a rate-limit or transient error.",
+    ["reason"],
+)
+# Identifies the worker process answering a scrape when several run behind one port.
+worker_info = Info("auraa_worker", "Worker process serving this scrape.")
+worker_info.info({"pid": str(os.getpid())})
+event_loop_lag = Histogram(
+    "auraa_event_loop_lag_seconds",
+    "How late the event loop resumed a sleeping task (time the loop was blocked).",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+async def monitor_event_loop_lag(
+    interval: float, observe: Callable[[float], None] = event_loop_lag.observe
+) -> None:
+    """
+    Sleeps for `interval` seconds in a loop and records how much later than
+    requested each sleep returned. Runs until cancelled.
+
+    Args:
+        interval (float): Seconds between probes.
+        observe (Callable[[float], None]): Receives each lag sample in seconds.
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        observe(max(0.0, time.perf_counter() - started - interval))
+
+
+def instrument_node(graph: str, node: str, func: Callable) -> Callable:
+    """
+    Wraps an async LangGraph node function so its wall time is recorded in
+    auraa_graph_node_duration_seconds.
+    """
+
+    @wraps(func)
+    async def wrapper(state):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await func(state)
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            node_duration.labels(current_route.get(), graph, node, status).observe(
+                time.perf_counter() - started
+            )
+
+    return wrapper
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Records latency and token usage of every chat model call. Attached to the
+    shared LLM, so all chains are covered. Runs inline (no executor hop) because
+    it only does a few dictionary operations per call.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._runs: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        self._runs[run_id] = (
+            time.perf_counter(),
+            current_route.get(),
+            metadata.get("langgraph_node", "none"),
+            metadata.get("ls_model_name", "unknown"),
+        )
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        started, route, node, model = run
+        llm_request_duration.labels(route, node, model, "ok").observe(
+            time.perf_counter() - started
+        )
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+        if prompt_tokens:
+            llm_tokens.labels(route, node, model, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            llm_tokens.labels(route, node, model, "completion").inc(completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        started, route, node, model = run
+        llm_request_duration.labels(route, node, model, "error").observe(
+            time.perf_counter() - started
+        )
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    FastAPI route class that records handler latency and publishes the route
+    template in current_route for the metrics recorded while serving it.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route_path = self.path
+
+        async def instrumented_handler(request):
+            current_route.set(route_path)
+            started = time.perf_counter()
+            status = "500"
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+                return response
+            except RequestValidationError:
+                status = "422"
+                raise
+            except Exception as e:
+                status = str(getattr(e, "status_code", 500))
+                raise
+            finally:
+                http_request_duration.labels(route_path, request.method, status).observe(
+                    time.perf_counter() - started
+                )
+
+        return instrumented_handler
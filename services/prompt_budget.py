@@ -0,0 +1,125 @@
+"""
+Token budgets for the variable parts of agent prompts (document context, search
+snippets, tool output). Tokens are counted locally (services.tokens), and every
+budgeted prompt part follows the same truncation policy:
+
+1. Snippets are taken in the order given, which is their priority order (e.g.
+   search results by rank, documents as sent).
+2. Duplicates are dropped: snippets equal to an earlier one after whitespace and
+   case normalization.
+3. Whole snippets are kept while they fit into the budget.
+4. The first snippet that does not fit is cut to the remaining budget, if at
+   least MIN_TRUNCATED_TOKENS remain, and marked with TRUNCATION_MARKER. All
+   later snippets are dropped.
+
+Budgets are set per prompt part in PROMPT_BUDGETS (PROMPT_BUDGET_TOKENS for
+parts not listed). Sizes before and after budgeting are recorded in
+auraa_prompt_tokens, labelled by prompt part and API route, to tune the budgets.
+"""
+
+import logging
+import re
+from typing import List, Set
+
+from config import settings
+from services.metrics import current_route, prompt_compactions, prompt_tokens
+from services.tokens import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Appended to a snippet that was cut to fit the budget.
+TRUNCATION_MARKER = " [...truncated]"
+
+# A snippet is only cut if at least this many tokens of it can be kept;
+# otherwise it is dropped.
+MIN_TRUNCATED_TOKENS = 50
+
+
+def budget_for(part: str) -> int:
+    """
+    Returns the token budget of a prompt part, e.g. "query_context".
+    """
+    return int(settings.PROMPT_BUDGETS.get(part, settings.PROMPT_BUDGET_TOKENS))
+
+
+def _normalize(snippet: str) -> str:
+    return re.sub(r"\s+", " ", snippet).strip().casefold()
+
+
+def dedupe_snippets(snippets: List[str]) -> List[str]:
+    """
+    Drops empty snippets and snippets that repeat an earlier one, keeping the
+    order of the rest.
+    """
+    kept: List[str] = []
+    seen: Set[str] = set()
+    for snippet in snippets:
+        normalized = _normalize(snippet)
+        if not normalized or normalized in seen:
+            continue
+        kept.append(snippet)
+        seen.add(normalized)
+    return kept
+
+
+def fit_snippets(snippets: List[str], part: str, separator: str = "\n\n") -> List[str]:
+    """
+    Applies the truncation policy (see the module docstring) to the snippets of
+    one prompt part and records its size.
+
+    Args:
+        snippets (List[str]): The snippets, most important first.
+        part (str): Name of the prompt part, which selects the budget.
+        separator (str): String the snippets will be joined with.
+
+    Returns:
+        List[str]: The snippets to put into the prompt.
+    """
+    budget = budget_for(part)
+    route = current_route.get()
+    input_tokens = sum(count_tokens(snippet) for snippet in snippets)
+    prompt_tokens.labels(part, route, "input").observe(input_tokens)
+
+    unique = dedupe_snippets(snippets)
+    if len(unique) < len(snippets):
+        prompt_compactions.labels(part, "deduplicated").inc(len(snippets) - len(unique))
+
+    kept: List[str] = []
+    used = 0
+    separator_tokens = count_tokens(separator)
+    for index, snippet in enumerate(unique):
+        cost = count_tokens(snippet) + (separator_tokens if kept else 0)
+        if used + cost <= budget:
+            kept.append(snippet)
+            used += cost
+            continue
+        remaining = budget - used - (separator_tokens if kept else 0)
+        remaining -= count_tokens(TRUNCATION_MARKER)
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            kept.append(truncate_tokens(snippet, remaining) + TRUNCATION_MARKER)
+            used = budget
+            prompt_compactions.labels(part, "truncated").inc()
+            dropped = len(unique) - index - 1
+        else:
+            dropped = len(unique) - index
+        if dropped:
+            prompt_compactions.labels(part, "dropped").inc(dropped)
+        logger.info(
+            "Prompt part '%s' over budget: %d tokens in, %d allowed, %d snippets dropped.",
+            part,
+            input_tokens,
+            budget,
+            dropped,
+        )
+        break
+
+    prompt_tokens.labels(part, route, "sent").observe(used)
+    return kept
+
+
+def fit_text(text: str, part: str) -> str:
+    """
+    Applies the budget of a prompt part to a single text (cut and marked if too long).
+    """
+    kept = fit_snippets([text], part)
+    return kept[0] if kept else ""
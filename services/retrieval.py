@@ -0,0 +1,203 @@
+import heapq
+import math
+import re
+from typing import Callable, Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from services.tokens import count_tokens, split_text
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Very common English words that carry no ranking signal.
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for from has have how i if in into is it its of on
+    or that the their there these this to was were what when where which who why
+    will with you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cases text and splits it into word terms, dropping stopwords.
+    """
+    return [
+        term
+        for term in TOKEN_PATTERN.findall(text.casefold())
+        if term not in STOPWORDS
+    ]
+
+
+def bm25_scores(
+    query_postings: Dict[str, List[Tuple[int, int]]],
+    chunk_length: Callable[[int], int],
+    chunk_count: int,
+    average_length: float,
+    k1: float = 1.5,
+    b: float = 0.75,
+) -> Dict[int, float]:
+    """
+    Computes Okapi BM25 scores from the postings of the query terms.
+
+    Args:
+        query_postings (Dict[str, List[Tuple[int, int]]]): For each query term, the
+            (chunk_id, term_frequency) pairs of the chunks containing it.
+        chunk_length (Callable[[int], int]): Returns the length in terms of a chunk.
+        chunk_count (int): Number of chunks in the collection.
+        average_length (float): Average chunk length in terms.
+
+    Returns:
+        Dict[int, float]: Score per chunk id, for chunks matching at least one term.
+    """
+    average_length = average_length or 1.0
+    scores: Dict[int, float] = {}
+    for postings in query_postings.values():
+        idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+        for chunk_id, frequency in postings:
+            length_norm = 1 - b + b * chunk_length(chunk_id) / average_length
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * (
+                frequency * (k1 + 1) / (frequency + k1 * length_norm)
+            )
+    return scores
+
+
+class BM25Index:
+    """
+    Okapi BM25 ranking over an in-memory inverted index.
+
+    Postings map each term to a list of (chunk_id, term_frequency) pairs, so a
+    query only touches the chunks that contain at least one of its terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.chunk_lengths: List[int] = []
+
+    def add(self, text: str) -> int:
+        """
+        Indexes one chunk of text and returns its chunk id.
+        """
+        chunk_id = len(self.chunk_lengths)
+        terms = tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, []).append((chunk_id, frequency))
+        self.chunk_lengths.append(len(terms))
+        return chunk_id
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Ranks indexed chunks against the query.
+
+        Args:
+            query (str): The user query.
+            top_k (int): Maximum number of results.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, score) pairs, best first. Chunks
+            sharing no terms with the query are never returned.
+        """
+        chunk_count = len(self.chunk_lengths)
+        if not chunk_count:
+            return []
+        average_length = sum(self.chunk_lengths) / chunk_count
+        query_postings = {
+            term: self.postings[term]
+            for term in set(tokenize(query))
+            if term in self.postings
+        }
+        scores = bm25_scores(
+            query_postings,
+            lambda chunk_id: self.chunk_lengths[chunk_id],
+            chunk_count,
+            average_length,
+            self.k1,
+            self.b,
+        )
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+def chunk_documents(
+    documents: List[Document], chunk_tokens: int, overlap_tokens: int
+) -> List[Document]:
+    """
+    Splits documents into token-bounded chunks. Each chunk records the position
+    of its source document and its own position in 'doc_index' and 'chunk_index'.
+    """
+    chunks = []
+    for doc_index, document in enumerate(documents):
+        for chunk_index, text in enumerate(
+            split_text(document.page_content, chunk_tokens, overlap_tokens)
+        ):
+            chunks.append(
+                Document(
+                    page_content=text,
+                    metadata={"doc_index": doc_index, "chunk_index": chunk_index},
+                )
+            )
+    return chunks
+
+
+def select_within_budget(
+    chunks: List[Document],
+    ranked: List[Tuple[int, float]],
+    top_k: int,
+    token_budget: int,
+) -> List[Document]:
+    """
+    Takes up to top_k ranked chunks best-first while they fit into the token budget, then returns
+    them in document order so the prompt reads in the same order as the corpus.
+    If nothing matched the query, the leading chunks are used instead.
+    """
+    chunk_ids = [chunk_id for chunk_id, _ in ranked] or list(range(len(chunks)))
+    chunk_ids = chunk_ids[:top_k]
+    selected = []
+    used_tokens = 0
+    for chunk_id in chunk_ids:
+        chunk_tokens = count_tokens(chunks[chunk_id].page_content)
+        if used_tokens + chunk_tokens > token_budget:
+            continue
+        selected.append(chunk_id)
+        used_tokens += chunk_tokens
+    return sorted(
+        (chunks[chunk_id] for chunk_id in selected),
+        key=lambda chunk: (chunk.metadata["doc_index"], chunk.metadata["chunk_index"]),
+    )
+
+
+def retrieve_context(
+    query: str,
+    documents: List[Document],
+    top_k: int,
+    token_budget: int,
+    chunk_tokens: int,
+    overlap_tokens: int = 0,
+) -> List[Document]:
+    """
+    Chunks the documents, ranks the chunks against the query with BM25, and
+    returns the best top_k chunks that fit into token_budget.
+
+    Args:
+        query (str): The user query.
+        documents (List[Document]): The documents sent by the client.
+        top_k (int): Maximum number of chunks to keep.
+        token_budget (int): Maximum total tokens of the kept chunks.
+        chunk_tokens (int): Maximum tokens per chunk.
+        overlap_tokens (int): Tokens shared between consecutive chunks.
+
+    Returns:
+        List[Document]: The selected chunks, in document order.
+    """
+    chunks = chunk_documents(documents, chunk_tokens, overlap_tokens)
+    index = BM25Index()
+    for chunk in chunks:
+        index.add(chunk.page_content)
+    return select_within_budget(
+        chunks, index.search(query, top_k), top_k, token_budget
+    )
@@ -0,0 +1,296 @@
+"""
+Local pre-routing for the orchestrator. Most /process_query prompts follow a few
+patterns ("summarize this: ...", "latest news on ...", a question plus context),
+so the tool can often be chosen without the router LLM:
+
+- Lexical rules recognize those patterns and extract the tool arguments.
+- A routing cache remembers the router LLM's past decisions per prompt shape
+  (leading words, markers such as "Question:" and a length bucket) and reuses a
+  decision once the LLM has made it consistently.
+
+Anything not decided confidently falls back to the router LLM. Decisions are
+counted by source, and local decisions can be checked against the LLM on a
+sample of requests to measure their accuracy.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, TypedDict
+
+from services.cache import TTLCache
+from services.metrics import router_agreement, router_decisions
+
+CORPUS_ID = re.compile(r"\b[0-9a-f]{32}\b")
+QUESTION_MARKER = re.compile(r"\bquestion\s*:\s*", re.IGNORECASE)
+CONTEXT_MARKER = re.compile(
+    r"\b(?:context|documents?|based on the following(?: \w+)?)\s*:\s*", re.IGNORECASE
+)
+SUMMARY_INSTRUCTION = re.compile(
+    r"^\W*([^.:\n]{0,120}?\b(?:summari[sz]e|summary|tl;?dr|key\s?words)\b[^.:\n]*[.:\n])\s*",
+    re.IGNORECASE,
+)
+# Explicit asks for fresh or searched information: enough to skip the router LLM.
+SEARCH_CUES = re.compile(
+    r"\b(?:latest|breaking|news|headlines|today(?:'s)?|tonight|tomorrow|yesterday|"
+    r"right now|as of|this (?:week|morning|evening)|weather|forecast|"
+    r"search (?:for|the web|online)|look up|google)\b",
+    re.IGNORECASE,
+)
+# Words that often, but not reliably, mean the answer is time-sensitive
+# ("the current ratio", "match the pattern"). Scored below the default
+# PREROUTER_MIN_CONFIDENCE, so these prompts still go to the router LLM.
+WEAK_SEARCH_CUES = re.compile(
+    r"\b(?:current(?:ly)?|now|recent(?:ly)?|price|stocks?|scores?|match|results?|"
+    r"won|elections?|live|updates?)\b",
+    re.IGNORECASE,
+)
+
+# Prompts longer than this are not sent to the internet search by the rules.
+MAX_SEARCH_WORDS = 40
+
+# Tools whose arguments are the prompt itself. A follow-up prompt in a session
+# ("and yesterday?") only makes sense with the earlier turns, so these are left
+# to the router LLM there.
+CONTEXT_DEPENDENT_TOOLS = {"search_internet"}
+
+
+class RouteDecision(TypedDict):
+    """
+    A tool call chosen without the router LLM.
+
+    Attributes:
+        tool (str): Name of the tool to call.
+        args (Dict[str, Any]): Arguments for the tool.
+        confidence (float): How sure the deciding component is (0 to 1).
+        source (str): "lexical" (rules) or "cache" (past router LLM decisions).
+    """
+
+    tool: str
+    args: Dict[str, Any]
+    confidence: float
+    source: str
+
+
+def prompt_shape(prompt: str) -> str:
+    """
+    Reduces a prompt to the features that decide its route: its first three
+    words (case-folded, digits and corpus IDs masked), the markers it contains
+    and a length bucket. Near-duplicate prompts share a shape.
+    """
+    words = re.findall(r"[a-z0-9']+", CORPUS_ID.sub("id", prompt).casefold())
+    lead = " ".join(re.sub(r"\d", "#", word) for word in words[:3])
+    markers = "".join(
+        flag
+        for flag, present in (
+            ("q", QUESTION_MARKER.search(prompt)),
+            ("c", CONTEXT_MARKER.search(prompt)),
+            ("k", CORPUS_ID.search(prompt)),
+        )
+        if present
+    )
+    length = "s" if len(words) <= 25 else "m" if len(words) <= 200 else "l"
+    return f"{lead}|{markers}|{length}"
+
+
+def extract_args(tool: str, prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    Builds the tool arguments for a prompt, or returns None if the prompt does
+    not contain what the tool needs (then the router LLM has to decide).
+    """
+    if tool == "summarize_document":
+        instruction = SUMMARY_INSTRUCTION.match(prompt)
+        document = prompt[instruction.end() :] if instruction else ""
+        if len(document.split()) < 20:
+            return None
+        return {"document_text": document.strip()}
+
+    if tool == "answer_query_from_documents":
+        markers = list(QUESTION_MARKER.finditer(prompt))
+        if not markers:
+            return None
+        question = prompt[markers[-1].end() :].strip()
+        context = prompt[: markers[-1].start()]
+        context_marker = CONTEXT_MARKER.search(context)
+        if context_marker:
+            context = context[context_marker.end() :]
+        context = context.strip()
+        if not question or len(context.split()) < 5:
+            return None
+        return {"user_query": question, "documents_list": [context]}
+
+    if tool == "answer_query_from_corpus":
+        corpus_id = CORPUS_ID.search(prompt)
+        if corpus_id is None:
+            return None
+        question = re.sub(r"\s+", " ", CORPUS_ID.sub("", prompt)).strip()
+        return {"user_query": question, "corpus_id": corpus_id.group(0)}
+
+    if tool == "search_internet":
+        if len(prompt.split()) > MAX_SEARCH_WORDS or QUESTION_MARKER.search(prompt):
+            return None
+        return {"user_query": prompt.strip()}
+
+    return None
+
+
+def classify(prompt: str) -> Optional[RouteDecision]:
+    """
+    Rule-based routing. Returns the most likely tool with its arguments and a
+    confidence, or None when no rule applies.
+    """
+    words = prompt.split()
+    lowered = prompt.casefold()
+    candidates = []
+    if CORPUS_ID.search(prompt) and "corpus" in lowered:
+        candidates.append(("answer_query_from_corpus", 0.97))
+    if QUESTION_MARKER.search(prompt):
+        candidates.append(
+            ("answer_query_from_documents", 0.95 if CONTEXT_MARKER.search(prompt) else 0.8)
+        )
+    if SUMMARY_INSTRUCTION.match(prompt):
+        candidates.append(("summarize_document", 0.95))
+    if len(words) <= 25 and not CONTEXT_MARKER.search(prompt):
+        if SEARCH_CUES.search(prompt):
+            confidence = 0.9
+        elif WEAK_SEARCH_CUES.search(prompt):
+            confidence = 0.75
+        else:
+            confidence = 0.6
+        candidates.append(("search_internet", confidence))
+
+    for tool, confidence in sorted(candidates, key=lambda item: -item[1]):
+        args = extract_args(tool, prompt)
+        if args is not None:
+            return {"tool": tool, "args": args, "confidence": confidence, "source": "lexical"}
+    return None
+
+
+class PreRouter:
+    """
+    Decides routes locally when confident and learns from the router LLM.
+    `route`, `observe`, `learn` and `stats` may read or write a SQLite routing
+    cache, so async callers run them in a worker thread.
+
+    Args:
+        cache (Optional[TTLCache]): Store of router LLM decisions per prompt shape
+            (None disables the routing cache).
+        min_confidence (float): Minimum rule confidence to skip the router LLM.
+        min_observations (int): Router LLM decisions needed for a shape before
+            the cache is used.
+        min_agreement (float): Share of those decisions that must agree.
+        enabled (bool): False always defers to the router LLM.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[TTLCache],
+        min_confidence: float,
+        min_observations: int,
+        min_agreement: float,
+        enabled: bool = True,
+    ):
+        self.cache = cache
+        self.min_confidence = min_confidence
+        self.min_observations = min_observations
+        self.min_agreement = min_agreement
+        self.enabled = enabled
+        self.decisions = {"lexical": 0, "cache": 0, "llm": 0}
+        self.checks: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def route(self, prompt: str, follow_up: bool = False) -> Optional[RouteDecision]:
+        """
+        Returns a local routing decision, or None to use the router LLM.
+        `follow_up` marks a prompt that continues a conversation.
+        """
+        if not self.enabled:
+            return None
+        decision = classify(prompt)
+        if decision is None or decision["confidence"] < self.min_confidence:
+            decision = self._from_cache(prompt)
+        if follow_up and decision is not None and decision["tool"] in CONTEXT_DEPENDENT_TOOLS:
+            decision = None
+        if decision is not None:
+            self._count(decision["source"])
+        return decision
+
+    def _from_cache(self, prompt: str) -> Optional[RouteDecision]:
+        if self.cache is None:
+            return None
+        counts = self.cache.get(prompt_shape(prompt))
+        if not counts:
+            return None
+        total = sum(counts.values())
+        tool, votes = max(counts.items(), key=lambda item: item[1])
+        if total < self.min_observations or votes / total < self.min_agreement:
+            return None
+        args = extract_args(tool, prompt)
+        if args is None:
+            return None
+        return {"tool": tool, "args": args, "confidence": votes / total, "source": "cache"}
+
+    def observe(self, prompt: str, llm_tools: List[str], follow_up: bool = False) -> None:
+        """
+        Records the router LLM's decision for a prompt it routed: counts it,
+        adds it to the routing cache and checks the rules' guess against it.
+        Decisions on follow-up prompts depend on the conversation, so they are
+        only counted.
+        """
+        self._count("llm")
+        if follow_up:
+            return
+        self.learn(prompt, llm_tools)
+        guess = classify(prompt)
+        if guess is not None:
+            self.check("lexical_below_threshold", guess["tool"], llm_tools)
+
+    def learn(self, prompt: str, llm_tools: List[str]) -> None:
+        """
+        Counts the router LLM's decision for the prompt's shape in the routing
+        cache, in one atomic update (the cache may be shared by workers).
+        """
+        if self.cache is None:
+            return
+        label = ", ".join(llm_tools)
+
+        def add_vote(counts: Optional[Dict[str, int]]) -> Dict[str, int]:
+            counts = dict(counts or {})
+            counts[label] = counts.get(label, 0) + 1
+            return counts
+
+        self.cache.update(prompt_shape(prompt), add_vote)
+
+    def check(self, source: str, tool: str, llm_tools: List[str]) -> None:
+        """
+        Records whether a local decision matched the router LLM's.
+        """
+        result = "agree" if llm_tools == [tool] else "disagree"
+        router_agreement.labels(source, result).inc()
+        with self._lock:
+            counts = self.checks.setdefault(source, {"agree": 0, "disagree": 0})
+            counts[result] += 1
+
+    def _count(self, source: str) -> None:
+        router_decisions.labels(source).inc()
+        with self._lock:
+            self.decisions[source] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the decisions per source, the share that skipped the router LLM
+        and the measured agreement of local decisions with it.
+        """
+        total = sum(self.decisions.values())
+        return {
+            "enabled": self.enabled,
+            "decisions": dict(self.decisions),
+            "bypass_rate": (total - self.decisions["llm"]) / total if total else 0.0,
+            "accuracy": {
+                source: {
+                    **counts,
+                    "accuracy": counts["agree"] / (counts["agree"] + counts["disagree"]),
+                }
+                for source, counts in self.checks.items()
+            },
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
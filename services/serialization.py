@@ -0,0 +1,17 @@
+import json
+from typing import Any
+
+
+def compact_json(value: Any) -> str:
+    """
+    Serializes a value as JSON without indentation or separator padding and with
+    non-ASCII characters kept as is. Used for everything that is sent to an LLM,
+    where every whitespace and escape sequence costs prompt tokens.
+
+    Args:
+        value (Any): A JSON-serializable value.
+
+    Returns:
+        str: The compact JSON text.
+    """
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,250 @@
+"""
+Conversation sessions for /process_query. The orchestrator state of a session
+(recent turns, a summary of older ones and recent tool outputs) is saved by a
+LangGraph checkpointer under the session ID, so follow-up questions can refer to
+earlier turns without resending documents or repeating searches.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+from config import settings
+from services.serialization import compact_json
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Owns the checkpointer that holds session state and expires idle sessions.
+
+    The checkpointer is created on first use, inside the running event loop
+    (the SQLite saver binds to it). Requests of one session are serialized with
+    `lock()`, so concurrent turns do not overwrite each other's state. The time
+    each session was last used is kept next to its checkpoints (in memory, or in
+    the session_last_used table of the SQLite file), so with the "sqlite" backend
+    every worker expires sessions from the same record.
+
+    Args:
+        backend (str): "memory" (per worker) or "sqlite" (shared by the workers
+            on one host and kept across restarts; needs langgraph-checkpoint-sqlite).
+        path (str): SQLite file for the "sqlite" backend.
+        ttl_seconds (float): Sessions idle for longer are deleted.
+        max_sessions (int): Sessions kept per store; the least recently used
+            ones beyond this are deleted.
+    """
+
+    def __init__(self, backend: str, path: str, ttl_seconds: float, max_sessions: int):
+        self.backend = backend
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._checkpointer: Optional[BaseCheckpointSaver] = None
+        self._table_ready = False
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()  # "memory" backend
+        self._locks: Dict[str, list] = {}  # session ID -> [lock, number of users]
+
+    def checkpointer(self) -> BaseCheckpointSaver:
+        """
+        Returns the checkpointer, creating it on first use.
+        """
+        if self._checkpointer is None:
+            if self.backend == "sqlite":
+                import aiosqlite
+                from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                # The connection is opened and the tables created on first access.
+                self._checkpointer = AsyncSqliteSaver(aiosqlite.connect(self.path))
+            else:
+                self._checkpointer = InMemorySaver()
+            logger.info("Session store opened (%s).", self.backend)
+        return self._checkpointer
+
+    async def close(self) -> None:
+        if self._checkpointer is not None and self.backend == "sqlite":
+            await self._checkpointer.conn.close()
+        self._checkpointer = None
+        self._table_ready = False
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        """
+        Holds the session for one turn and marks it as used. Checkpoints older
+        than the one the turn saved are pruned afterwards.
+        """
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self.touch(session_id)
+                yield
+                await self.prune(session_id)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[session_id]
+
+    async def touch(self, session_id: str) -> None:
+        """
+        Marks a session as used and deletes sessions that expired or exceed
+        max_sessions.
+        """
+        now = time.time()
+        if self.backend == "sqlite":
+            candidates = await self._touch_sqlite(session_id, now)
+        else:
+            candidates = self._touch_memory(session_id, now)
+        # Not while a turn of this worker is running.
+        expired = [other for other in candidates if other not in self._locks]
+        for other in expired:
+            await self.delete(other)
+        if expired:
+            logger.info("Expired %d sessions.", len(expired))
+
+    def _touch_memory(self, session_id: str, now: float) -> List[str]:
+        self._last_used[session_id] = now
+        self._last_used.move_to_end(session_id)
+        overflow = len(self._last_used) - self.max_sessions
+        candidates = []
+        for other, last_used in self._last_used.items():
+            if now - last_used <= self.ttl_seconds and overflow <= 0:
+                break
+            candidates.append(other)
+            overflow -= 1
+        return candidates
+
+    async def _touch_sqlite(self, session_id: str, now: float) -> List[str]:
+        saver = await self._sqlite_saver()
+        # The saver's lock keeps our statements out of its transactions on the
+        # shared connection.
+        async with saver.lock:
+            await saver.conn.execute(
+                "INSERT INTO session_last_used (session_id, last_used) VALUES (?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_used = excluded.last_used",
+                (session_id, now),
+            )
+            await saver.conn.commit()
+            async with saver.conn.execute(
+                "SELECT session_id FROM session_last_used WHERE last_used < ? "
+                "UNION SELECT session_id FROM ("
+                "SELECT session_id FROM session_last_used "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (now - self.ttl_seconds, self.max_sessions),
+            ) as cursor:
+                return [row[0] for row in await cursor.fetchall()]
+
+    async def _sqlite_saver(self) -> BaseCheckpointSaver:
+        """
+        Returns the SQLite checkpointer with its tables and session_last_used created.
+        """
+        saver = self.checkpointer()
+        await saver.setup()
+        if not self._table_ready:
+            async with saver.lock:
+                await saver.conn.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS session_last_used (
+                        session_id TEXT PRIMARY KEY,
+                        last_used REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_session_last_used
+                        ON session_last_used (last_used);
+                    """
+                )
+                await saver.conn.commit()
+            self._table_ready = True
+        return saver
+
+    async def prune(self, session_id: str) -> None:
+        """
+        Keeps only the latest checkpoint of a session. Each turn saves the full
+        state (recent turns and tool outputs, which can hold whole documents), and
+        sessions only ever resume from the latest one.
+        """
+        if self.backend == "sqlite":
+            saver = await self._sqlite_saver()
+            async with saver.lock:
+                for table in ("writes", "checkpoints"):
+                    await saver.conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < ("
+                        "SELECT MAX(latest.checkpoint_id) FROM checkpoints latest "
+                        f"WHERE latest.thread_id = {table}.thread_id "
+                        f"AND latest.checkpoint_ns = {table}.checkpoint_ns)",
+                        (session_id,),
+                    )
+                await saver.conn.commit()
+            return
+
+        saver = self.checkpointer()
+        kept_blobs = set()
+        namespaces = saver.storage.get(session_id, {})
+        for namespace, checkpoints in list(namespaces.items()):
+            if not checkpoints:  # Left behind by lookups of subgraph namespaces.
+                del namespaces[namespace]
+                continue
+            latest = max(checkpoints)
+            for checkpoint_id in [other for other in checkpoints if other != latest]:
+                del checkpoints[checkpoint_id]
+            checkpoint = saver.serde.loads_typed(checkpoints[latest][0])
+            kept_blobs.update(
+                (session_id, namespace, channel, version)
+                for channel, version in checkpoint["channel_versions"].items()
+            )
+            for key in [
+                key
+                for key in saver.writes
+                if key[:2] == (session_id, namespace) and key[2] != latest
+            ]:
+                del saver.writes[key]
+        for key in [key for key in saver.blobs if key[0] == session_id and key not in kept_blobs]:
+            del saver.blobs[key]
+
+    async def delete(self, session_id: str) -> None:
+        await self.checkpointer().adelete_thread(session_id)
+        if self.backend == "sqlite":
+            saver = await self._sqlite_saver()
+            async with saver.lock:
+                await saver.conn.execute(
+                    "DELETE FROM session_last_used WHERE session_id = ?", (session_id,)
+                )
+                await saver.conn.commit()
+        else:
+            self._last_used.pop(session_id, None)
+
+    async def stats(self) -> Dict[str, Any]:
+        if self.backend == "sqlite":
+            saver = await self._sqlite_saver()
+            async with saver.lock:
+                async with saver.conn.execute(
+                    "SELECT COUNT(*) FROM session_last_used"
+                ) as cursor:
+                    sessions = (await cursor.fetchone())[0]
+        else:
+            sessions = len(self._last_used)
+        return {"backend": self.backend, "sessions": sessions, "active": len(self._locks)}
+
+
+def tool_call_key(tool_name: str, tool_args: Dict[str, Any]) -> str:
+    """
+    Identifies a tool call by its name and arguments, to find the output of an
+    identical call earlier in the session.
+    """
+    return hashlib.sha256(compact_json([tool_name, tool_args]).encode("utf-8")).hexdigest()
+
+
+session_store = SessionStore(
+    backend=settings.SESSION_STORE_BACKEND,
+    path=settings.SESSION_STORE_PATH,
+    ttl_seconds=settings.SESSION_TTL_SECONDS,
+    max_sessions=settings.SESSION_MAX_SESSIONS,
+)
@@ -0,0 +1,144 @@
+"""
+Request coalescing ("single flight"): concurrent calls with the same key share
+one in-flight execution and all receive its result. When a news event breaks,
+dozens of identical questions arriving within a second then cost one search and
+one set of LLM calls instead of dozens.
+
+Only calls that overlap in time are coalesced; finished results are not kept
+(that is the job of the search and LLM caches).
+"""
+
+import asyncio
+import contextvars
+import copy
+import hashlib
+import logging
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+from services.llm_scheduler import PRIORITIES, current_priority, llm_priority
+from services.log import request_id
+from services.metrics import coalesced_requests, current_route
+from services.serialization import compact_json
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """
+    One shared execution and the scheduling classes of the callers waiting for it.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.priorities: List[str] = []
+
+    def priority(self) -> str:
+        """
+        The most urgent class among the waiting callers; the shared LLM calls
+        are scheduled with it.
+        """
+        return min(self.priorities, key=lambda name: PRIORITIES.get(name, 0), default="batch")
+
+
+class SingleFlight:
+    """
+    Runs at most one execution per key at a time.
+
+    A follower that is cancelled (e.g. its client disconnected) stops waiting
+    without affecting the others; the shared execution is cancelled only when
+    every caller waiting for it has gone.
+
+    The shared execution does not belong to the caller that started it: it runs
+    in a copy of that caller's context with its own request ID and route label,
+    and its LLM calls are scheduled at the highest priority of the callers
+    waiting at the time.
+
+    Args:
+        name (str): Label for the metrics, e.g. "internet".
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the result of `func()`, sharing the execution with every other
+        concurrent call for `key`. Each caller gets its own copy of the result.
+        """
+        call = self._calls.get(key)
+        role = "follower"
+        if call is None:
+            role = "leader"
+            call = self._calls[key] = _Call()
+            context = contextvars.copy_context()
+            context.run(self._isolate, key, call)
+            task = call.task = context.run(asyncio.ensure_future, func())
+            task.add_done_callback(lambda _: self._forget(key, task))
+        coalesced_requests.labels(self.name, role).inc()
+        logger.debug("Joined %s flight %s as %s.", self.name, key[:12], role)
+
+        task = call.task
+        priority = current_priority()
+        call.priorities.append(priority)
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and len(call.priorities) == 1:
+                task.cancel()
+            raise
+        finally:
+            call.priorities.remove(priority)
+        return copy.deepcopy(result)
+
+    def _isolate(self, key: str, call: _Call) -> None:
+        request_id.set(f"{self.name}-{key[:12]}")
+        current_route.set(f"single_flight:{self.name}")
+        llm_priority.set(call.priority)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+
+
+def single_flight(
+    name: str,
+    key: Optional[Callable[..., Any]] = None,
+    stamp: Optional[Callable[..., Any]] = None,
+):
+    """
+    Decorator coalescing concurrent calls of an async function with the same
+    arguments (or the same `key(*args, **kwargs)`). Disabled when
+    settings.SINGLE_FLIGHT_ENABLED is false.
+
+    Args:
+        name (str): Label for the metrics.
+        key (Optional[Callable]): Maps the call's arguments to the value that
+            identifies identical calls. Defaults to all arguments.
+        stamp (Optional[Callable]): `stamp(result, *args, **kwargs)` returns a
+            caller's copy of the result adjusted to its own arguments, for calls
+            coalesced by a `key` that ignores some of them.
+    """
+    flight = SingleFlight(name)
+
+    def decorate(func: Callable[..., Awaitable[Any]]):
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not settings.SINGLE_FLIGHT_ENABLED:
+                return await func(*args, **kwargs)
+            identity = key(*args, **kwargs) if key else [args, kwargs]
+            digest = hashlib.sha256(compact_json(identity).encode("utf-8")).hexdigest()
+            result = await flight.do(digest, lambda: func(*args, **kwargs))
+            return stamp(result, *args, **kwargs) if stamp else result
+
+        wrapper.single_flight = flight
+        return wrapper
+
+    return decorate
@@ -0,0 +1,61 @@
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from langchain_core.messages import AIMessageChunk
+
+
+async def stream_graph_events(
+    graph,
+    initial_state: Dict[str, Any],
+    format_result: Callable[[Dict[str, Any]], Dict[str, Any]],
+    config: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs a compiled LangGraph graph and yields progress events as they happen,
+    instead of waiting for the whole run to finish.
+
+    Events are dicts with an 'event' name and a JSON-serializable 'data' payload:
+        - "token": an LLM output token, with the graph node that produced it.
+          Tokens from sub-agents invoked inside a node are included as well.
+        - "node_end": a graph node finished.
+        - "result": the final output, built by format_result from the final state.
+
+    Args:
+        graph: The compiled graph to run.
+        initial_state (Dict[str, Any]): The initial graph state.
+        format_result (Callable): Turns the final graph state into the response payload.
+        config (Optional[Dict[str, Any]]): Run config, e.g. the thread_id of a
+            checkpointed graph (saved once, when the run finishes).
+
+    Yields:
+        Dict[str, Any]: The stream events, ending with a single "result" event.
+    """
+    final_state = initial_state
+    async for mode, chunk in graph.astream(
+        initial_state,
+        config,
+        stream_mode=["messages", "updates", "values"],
+        durability="exit" if config else None,
+    ):
+        if mode == "messages":
+            message, metadata = chunk
+            # Only streamed LLM output counts as a token; messages that nodes put
+            # into the state (e.g. the user's prompt) are skipped.
+            if (
+                isinstance(message, AIMessageChunk)
+                and isinstance(message.content, str)
+                and message.content
+            ):
+                yield {
+                    "event": "token",
+                    "data": {
+                        "node": metadata.get("langgraph_node"),
+                        "content": message.content,
+                    },
+                }
+        elif mode == "updates":
+            for node_name in chunk:
+                yield {"event": "node_end", "data": {"node": node_name}}
+        elif mode == "values":
+            final_state = chunk
+
+    yield {"event": "result", "data": format_result(final_state)}
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+from functools import lru_cache
+from typing import List
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tokenizer is available.
+CHARS_PER_TOKEN = 4
+
+# In split_stable, about one line in this many ends a chunk (once the chunk is
+# at least half full).
+BOUNDARY_ODDS = 4
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """
+    Loads the tiktoken encoding once. Returns None if tiktoken or its encoding
+    files are unavailable (e.g. in an offline container).
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(
+            "tiktoken encoding '%s' unavailable (%s). Falling back to a character-based estimate.",
+            settings.TOKENIZER_ENCODING,
+            e,
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens in a piece of text locally, without calling the LLM provider.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The number of tokens (or an estimate if no tokenizer is available).
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts text down to at most max_tokens tokens (an estimate if no tokenizer is
+    available). Text that already fits is returned unchanged.
+
+    Args:
+        text (str): The text to shorten.
+        max_tokens (int): Maximum number of tokens to keep.
+
+    Returns:
+        str: The leading max_tokens tokens of the text.
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def split_text(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Splits text into chunks of at most chunk_tokens tokens, preferring paragraph,
+    line and sentence boundaries.
+
+    Args:
+        text (str): The text to split.
+        chunk_tokens (int): Maximum number of tokens per chunk.
+        overlap_tokens (int): Number of tokens shared between consecutive chunks.
+
+    Returns:
+        List[str]: The text chunks, in document order.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=overlap_tokens,
+        length_function=count_tokens,
+    )
+    return splitter.split_text(text)
+
+
+def _is_boundary(line: str) -> bool:
+    """
+    Content-defined chunk boundary: blank lines, and lines whose hash selects them.
+    """
+    stripped = line.strip()
+    if not stripped:
+        return True
+    digest = hashlib.sha1(stripped.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % BOUNDARY_ODDS == 0
+
+
+def split_stable(text: str, chunk_tokens: int) -> List[str]:
+    """
+    Splits text into chunks of at most chunk_tokens tokens at content-defined
+    boundaries: a chunk ends after a line chosen by the line's own content (see
+    _is_boundary) once it holds half of chunk_tokens, or when the next line would
+    not fit. Appending to or editing a document therefore only changes the chunks
+    around the change; all other chunks come out identical, so work done on them
+    can be reused.
+
+    Args:
+        text (str): The text to split.
+        chunk_tokens (int): Maximum number of tokens per chunk.
+
+    Returns:
+        List[str]: The chunks, in document order. Joined, they give back the
+        text (except for lines longer than a chunk, which are split by split_text).
+    """
+    units = []
+    for line in text.splitlines(keepends=True):
+        line_tokens = count_tokens(line)
+        if line_tokens > chunk_tokens:
+            units.extend(
+                (piece, count_tokens(piece)) for piece in split_text(line, chunk_tokens)
+            )
+        else:
+            units.append((line, line_tokens))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for unit, unit_tokens in units:
+        if current and current_tokens + unit_tokens > chunk_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+        if current_tokens >= chunk_tokens // 2 and _is_boundary(unit):
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]